@@ -1,19 +1,22 @@
 import streamlit as st
 import os
-import json
 import time
-import base64
 import datetime
 import traceback
 from PIL import Image
 import io
 import hashlib
-import re
 import uuid
 import pandas as pd
 import numpy as np
 import random
 import zipfile  # ZIP 파일 생성을 위한 라이브러리 추가
+import storage
+import image_store
+import search_index
+import related_cards
+import duplicate_cards
+import card_components
 
 # 파일 경로 설정
 BASE_FOLDER = "flashcard_data"
@@ -21,6 +24,61 @@ USERS_FOLDER = os.path.join(BASE_FOLDER, "users")
 USER_DATA_FILE = os.path.join(USERS_FOLDER, "users.json")
 TEMP_IMAGE_FOLDER = os.path.join(BASE_FOLDER, "temp_images")
 
+# 플래시카드 저장소 백엔드 (json: 사용자별 flashcards.json, sqlite: 사용자별 flashcards.db)
+STORAGE_BACKEND = os.environ.get("FLASHCARD_STORAGE_BACKEND", "json")
+# 덱 파일 직렬화 형식 (json: 들여쓰기 JSON, compact: 공백 없는 JSON, msgpack: 바이너리)
+# 읽을 때는 파일 내용으로 형식을 자동 판별하므로 설정을 바꿔도 기존 파일을 그대로 읽을 수 있습니다
+STORAGE_SERIALIZATION = os.environ.get("FLASHCARD_SERIALIZATION", "json")
+
+# 카드 이미지는 기본적으로 Streamlit 정적 파일 서빙(.streamlit/config.toml의 server.enableStaticServing)으로
+# Streamlit 포트에서 바로 URL로 내려보냄 (앱의 static 폴더에 이미지 파일의 하드 링크를 둠)
+# 정적 파일 서빙을 끄거나 링크를 걸 수 없으면 이미지를 base64로 페이지에 포함
+STATIC_IMAGE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "card_images")
+STATIC_IMAGE_URL_PATH = "app/static/card_images"
+# 별도 포트의 카드 이미지 서버 (선택, 켜면 정적 파일 서빙 대신 사용)
+# 브라우저가 이미지 서버에 직접 접속하므로 기본값(auto)은 브라우저가 접속할 주소(FLASHCARD_IMAGE_BASE_URL)를
+# 지정했을 때만 사용합니다. on이면 주소가 없어도 http://localhost:포트로 켜며(앱과 같은 컴퓨터의 브라우저 전용), off면 끕니다.
+IMAGE_SERVER_MODE = os.environ.get("FLASHCARD_IMAGE_SERVER", "auto").lower()
+# 기본은 이 컴퓨터에서만 접속 가능 (리버스 프록시 없이 바로 열려면 0.0.0.0으로 지정)
+IMAGE_SERVER_HOST = os.environ.get("FLASHCARD_IMAGE_HOST", "127.0.0.1")
+IMAGE_SERVER_PORT = int(os.environ.get("FLASHCARD_IMAGE_PORT", "8502"))
+IMAGE_SERVER_BASE_URL = os.environ.get("FLASHCARD_IMAGE_BASE_URL")
+IMAGE_SERVER_ENABLED = (IMAGE_SERVER_MODE in ("on", "1", "true")
+                        or (IMAGE_SERVER_MODE == "auto" and bool(IMAGE_SERVER_BASE_URL)))
+IMAGE_SECRET_FILE = os.path.join(BASE_FOLDER, ".image_secret")
+# 이미지 URL을 쓸 수 없을 때 base64로 인코딩한 이미지를 담아 두는 프로세스 공용 캐시 크기 (MB)
+IMAGE_PAYLOAD_CACHE_MB = int(os.environ.get("FLASHCARD_IMAGE_CACHE_MB", "64"))
+# 전체 도메인 토픽 리스트의 페이지당 토픽 수와 펼친 토픽에서 한 번에 보여 줄 카드 수
+TOPIC_LIST_PAGE_SIZES = [20, 50, 100, 200]
+TOPIC_LIST_PAGE_SIZE = int(os.environ.get("FLASHCARD_TOPIC_PAGE_SIZE", "50"))
+if TOPIC_LIST_PAGE_SIZE not in TOPIC_LIST_PAGE_SIZES:
+    TOPIC_LIST_PAGE_SIZES = sorted(TOPIC_LIST_PAGE_SIZES + [TOPIC_LIST_PAGE_SIZE])
+TOPIC_LIST_CARD_BATCH = 20
+# 관리 화면 카드 요약에 보여 줄 내용 길이
+CARD_SUMMARY_CHARS = 120
+# 검색창 도움말
+SEARCH_HELP = ("단어 일부(예: 키텍)나 초성(예: ㅇㅍㅌ)으로도 토픽, 정의/개념, 핵심키워드, 두음을 찾을 수 있습니다. "
+               "영문 약어는 한 글자 오타(예: OWSAP)까지 찾습니다.")
+# 관리 화면 검색에서 카드 단위로 보여 줄 상위 결과 수
+SEARCH_RESULT_LIMIT = 10
+# 학습/퀴즈 모드에서 이미지를 미리 준비해 둘 다음 카드 수 (0이면 미리 읽지 않음)
+IMAGE_PREFETCH_CARDS = int(os.environ.get("FLASHCARD_PREFETCH_CARDS", "3"))
+# 학습 모드에서 현재 카드 옆에 보여 줄 관련 카드 수 (0이면 표시하지 않음)
+RELATED_CARD_COUNT = int(os.environ.get("FLASHCARD_RELATED_CARDS", "5"))
+# 학습/퀴즈 모드 화면 전환을 브라우저에서 처리 (off면 서버에서 그림)
+CLIENT_STUDY_ENABLED = os.environ.get("FLASHCARD_CLIENT_STUDY", "on").lower() not in ("off", "0", "false")
+# 브라우저 학습/퀴즈 화면에 관련 카드와 (이미지 URL을 쓸 수 없을 때의) 이미지를 한 번에 보내는 카드 수
+CLIENT_FEED_CHUNK = 50
+# 관리 화면에서 한 번에 보여 줄 중복 의심 카드 쌍 수
+DUPLICATE_PAIR_BATCH = 10
+# 덱에서 다시 만들 수 있어 백업에서 빼는 색인 파일
+DERIVED_DATA_FILES = (search_index.INDEX_FILE_NAME, related_cards.INDEX_FILE_NAME, duplicate_cards.INDEX_FILE_NAME)
+# 업로드 이미지 재인코딩 설정 (webp/jpeg/original), 긴 변 최대 길이(px, 0이면 제한 없음), 원본 보관 정책 (keep/discard)
+IMAGE_INGEST_FORMAT = os.environ.get("FLASHCARD_IMAGE_FORMAT", "webp").lower()
+IMAGE_MAX_EDGE = int(os.environ.get("FLASHCARD_IMAGE_MAX_EDGE", "2560"))
+IMAGE_QUALITY = int(os.environ.get("FLASHCARD_IMAGE_QUALITY", "85"))
+IMAGE_ORIGINAL_POLICY = os.environ.get("FLASHCARD_IMAGE_ORIGINALS", "keep").lower()
+
 # 사용자별 데이터/이미지 폴더 경로 지정 함수
 def get_user_data_folder(username):
     return os.path.join(USERS_FOLDER, username, "data")
@@ -28,8 +86,9 @@ def get_user_data_folder(username):
 def get_user_image_folder(username):
     return os.path.join(USERS_FOLDER, username, "images")
 
-def get_user_data_file(username):
-    return os.path.join(get_user_data_folder(username), "flashcards.json")
+# 현재 설정된 저장소 백엔드 가져오기
+def get_deck_storage():
+    return storage.get_deck_storage(STORAGE_BACKEND, USERS_FOLDER, STORAGE_SERIALIZATION)
 
 # 폴더 초기화 함수
 def initialize_folders():
@@ -39,9 +98,11 @@ def initialize_folders():
     os.makedirs(TEMP_IMAGE_FOLDER, exist_ok=True)
     
     # 사용자 데이터 파일 생성
-    if not os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump({}, f, ensure_ascii=False, indent=2)
+    get_user_store().ensure_file()
+
+# 사용자 목록 저장소 (프로세스 단위 캐시와 이름 색인, 파일 잠금 사용)
+def get_user_store():
+    return storage.get_user_store(USER_DATA_FILE)
 
 # 사용자 인증 함수들
 def hash_password(password):
@@ -50,28 +111,15 @@ def hash_password(password):
 def save_user(name, affiliation, username, password):
     initialize_folders()
     
-    # 사용자 데이터 로드
-    try:
-        with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-            users = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        users = {}
-    
-    # 이미 존재하는 사용자인지 확인
-    if username in users:
-        return False, "이미 사용 중인 아이디입니다."
-    
-    # 사용자 정보 저장
-    users[username] = {
+    # 사용자 정보 저장 (이미 존재하는 아이디면 실패)
+    added = get_user_store().add(username, {
         "name": name,
         "affiliation": affiliation,
         "password_hash": hash_password(password),
         "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    
-    # 사용자 정보 저장
-    with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+    })
+    if not added:
+        return False, "이미 사용 중인 아이디입니다."
     
     # 사용자 데이터 폴더 생성
     os.makedirs(get_user_data_folder(username), exist_ok=True)
@@ -84,13 +132,12 @@ def save_user(name, affiliation, username, password):
 
 def verify_user(username, password):
     try:
-        with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-            users = json.load(f)
+        user = get_user_store().get(username)
         
-        if username not in users:
+        if user is None:
             return False, "존재하지 않는 아이디입니다."
         
-        if users[username]["password_hash"] != hash_password(password):
+        if user["password_hash"] != hash_password(password):
             return False, "비밀번호가 일치하지 않습니다."
         
         return True, "로그인 성공"
@@ -99,13 +146,7 @@ def verify_user(username, password):
 
 def find_user_id(name):
     try:
-        with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-            users = json.load(f)
-        
-        found_users = []
-        for username, user_data in users.items():
-            if user_data["name"] == name:
-                found_users.append(username)
+        found_users = get_user_store().find_by_name(name)
         
         if not found_users:
             return False, "해당 이름으로 등록된 아이디가 없습니다."
@@ -116,21 +157,19 @@ def find_user_id(name):
 
 def reset_password(name, username):
     try:
-        with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-            users = json.load(f)
+        user_store = get_user_store()
+        user = user_store.get(username)
         
-        if username not in users:
+        if user is None:
             return False, "존재하지 않는 아이디입니다."
         
-        if users[username]["name"] != name:
+        if user["name"] != name:
             return False, "이름과 아이디가 일치하지 않습니다."
         
         # 임시 비밀번호 생성
         temp_password = str(uuid.uuid4())[:8]
-        users[username]["password_hash"] = hash_password(temp_password)
-        
-        with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
+        if not user_store.update(username, password_hash=hash_password(temp_password)):
+            return False, "존재하지 않는 아이디입니다."
         
         return True, temp_password
     except Exception as e:
@@ -138,22 +177,20 @@ def reset_password(name, username):
 
 def change_password(name, username, current_password, new_password):
     try:
-        with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-            users = json.load(f)
+        user_store = get_user_store()
+        user = user_store.get(username)
         
-        if username not in users:
+        if user is None:
             return False, "존재하지 않는 아이디입니다."
         
-        if users[username]["name"] != name:
+        if user["name"] != name:
             return False, "이름과 아이디가 일치하지 않습니다."
         
-        if users[username]["password_hash"] != hash_password(current_password):
+        if user["password_hash"] != hash_password(current_password):
             return False, "현재 비밀번호가 일치하지 않습니다."
         
-        users[username]["password_hash"] = hash_password(new_password)
-        
-        with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
+        if not user_store.update(username, password_hash=hash_password(new_password)):
+            return False, "존재하지 않는 아이디입니다."
         
         return True, "비밀번호가 성공적으로 변경되었습니다."
     except Exception as e:
@@ -161,20 +198,18 @@ def change_password(name, username, current_password, new_password):
 
 def delete_user(username, password):
     try:
-        with open(USER_DATA_FILE, "r", encoding="utf-8") as f:
-            users = json.load(f)
+        user_store = get_user_store()
+        user = user_store.get(username)
         
-        if username not in users:
+        if user is None:
             return False, "존재하지 않는 아이디입니다."
         
-        if users[username]["password_hash"] != hash_password(password):
+        if user["password_hash"] != hash_password(password):
             return False, "비밀번호가 일치하지 않습니다."
         
         # 사용자 정보 삭제
-        del users[username]
-        
-        with open(USER_DATA_FILE, "w", encoding="utf-8") as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
+        if not user_store.delete(username):
+            return False, "존재하지 않는 아이디입니다."
         
         # 사용자 데이터 폴더 삭제 (옵션)
         # import shutil
@@ -186,9 +221,9 @@ def delete_user(username, password):
 
 # 사용자별 데이터 초기화
 def initialize_user_data(username):
-    user_data_file = get_user_data_file(username)
+    deck_storage = get_deck_storage()
     
-    if not os.path.exists(user_data_file):
+    if not deck_storage.exists(username):
         domains = [
             "SW공학", "SW테스트", "IT경영/전력", "DB", 
             "빅데이터분석", "인공지능", "보안", "신기술", "법/제도"
@@ -196,29 +231,24 @@ def initialize_user_data(username):
         data = {domain: {} for domain in domains}
         
         # 사용자 데이터 저장
-        os.makedirs(os.path.dirname(user_data_file), exist_ok=True)
-        with open(user_data_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        deck_storage.save(username, data)
     
     return load_user_data(username)
 
-# 사용자 데이터 불러오기
+# 손상된 덱 파일 알림 (json/compact는 JSONDecodeError, msgpack은 storage.load_bytes가 ValueError로 바꿔 올림)
+# 새 덱으로 덮어쓰지 않고 빈 덱을 보여 주며, 파일은 백업에서 복원할 수 있도록 그대로 둠
+def report_deck_read_error(error):
+    st.error(f"플래시카드 데이터 파일을 읽을 수 없습니다: {error}")
+
+# 사용자 데이터 불러오기 (파일이 바뀌지 않았으면 프로세스 캐시 사용)
 def load_user_data(username):
-    user_data_file = get_user_data_file(username)
-    
     try:
-        with open(user_data_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        return get_deck_storage().load(username)
+    except FileNotFoundError:
         return initialize_user_data(username)
-
-# 사용자 데이터 저장
-def save_user_data(username, data):
-    user_data_file = get_user_data_file(username)
-    os.makedirs(os.path.dirname(user_data_file), exist_ok=True)
-    
-    with open(user_data_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    except ValueError as e:
+        report_deck_read_error(e)
+        return {}
 
 # 기존 함수들 수정 (사용자별 데이터 처리)
 def save_image(image_file, domain, topic, term):
@@ -254,25 +284,40 @@ def save_image(image_file, domain, topic, term):
         # 윈도우 파일 이름으로 사용할 수 없는 문자 제거 (\ / : * ? " < > |)
         safe_term = ''.join(c for c in term if c not in '\\/:*?"<>|')
         
-        # 현재 타임스탬프 가져오기
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # 현재 이미지 개수 확인하여 순번 지정
-        image_count = 1
-        # 같은 토픽과 타임스탬프를 가진 파일들 찾기
-        for file_name in os.listdir(topic_folder):
-            if os.path.isfile(os.path.join(topic_folder, file_name)) and safe_topic in file_name and timestamp in file_name:
-                image_count += 1
-        
-        # 파일명 생성 (토픽 이름_타임스탬프_순번.확장자 형식)
-        filename = f"{safe_topic}_{timestamp}_{image_count}{file_ext}"
-        file_path = os.path.join(topic_folder, filename)
-        
-        # 이미지 저장
-        with open(file_path, "wb") as f:
-            f.write(image_file.getbuffer())
-        
-        st.success(f"이미지가 저장되었습니다: {file_path}")
+        # 저장 전에 다시 인코딩 (EXIF 방향 반영, 메타데이터 제거, 긴 변 제한)
+        raw = bytes(image_file.getbuffer())
+        try:
+            payload, saved_ext = image_store.transcode_image(
+                raw, file_ext, IMAGE_INGEST_FORMAT, IMAGE_MAX_EDGE, IMAGE_QUALITY)
+        except Exception:
+            # 읽을 수 없는 이미지는 받은 그대로 저장
+            payload, saved_ext = raw, file_ext
+        
+        # 파일명 생성 (토픽 이름_타임스탬프_순번.확장자 형식, 순번은 매니페스트로 정함)
+        filename = image_store.new_image_name(topic_folder, saved_ext)
+        
+        # 이미지 저장: 내용은 해시 이름의 blob으로 한 번만 저장하고 토픽 폴더 매니페스트에는 참조만 추가
+        # (재인코딩했으면 정책에 따라 원본도 함께 보관)
+        original = None
+        if payload is not raw and IMAGE_ORIGINAL_POLICY == "keep":
+            original = (os.path.splitext(filename)[0] + file_ext, raw)
+        file_path = image_store.add_image(topic_folder, filename, payload, original)
+        
+        # 썸네일/표시용 이미지 미리 생성
+        image_store.create_derivatives(file_path)
+        
+        # 원본도 보관했으면 받은 그대로 저장했을 때보다 저장 공간을 더 쓰므로 실제로 쓴 크기로 알림
+        stored_bytes = len(payload) + (len(original[1]) if original else 0)
+        if payload is raw:
+            st.success(f"이미지가 저장되었습니다: {file_path}")
+        elif original:
+            st.success(f"이미지가 저장되었습니다: {file_path} "
+                       f"({image_store.format_bytes(len(raw))} → {image_store.format_bytes(len(payload))}, "
+                       f"원본도 보관해 {image_store.describe_size_change(len(raw), stored_bytes)})")
+        else:
+            st.success(f"이미지가 저장되었습니다: {file_path} "
+                       f"({image_store.format_bytes(len(raw))} → {image_store.format_bytes(len(payload))}, "
+                       f"{image_store.describe_size_change(len(raw), stored_bytes)})")
         return file_path
     except Exception as e:
         st.error(f"이미지 저장 중 오류 발생: {str(e)}")
@@ -282,8 +327,25 @@ def save_image(image_file, domain, topic, term):
 
 # 도메인 목록 가져오기 함수 추가
 def get_domains():
-    data = load_data()
-    return list(data.keys())
+    # 로그인한 경우 전체 덱을 읽지 않고 도메인 이름만 가져옵니다
+    username = _logged_in_username()
+    if username:
+        try:
+            return get_deck_storage().list_domains(username)
+        except ValueError as e:
+            report_deck_read_error(e)
+            return []
+    return list(load_data().keys())
+
+# 단일 도메인 데이터 가져오기 (학습/퀴즈/관리 화면은 선택한 도메인만 읽습니다)
+def load_domain_data(domain):
+    username = _logged_in_username()
+    if username:
+        try:
+            return get_deck_storage().load_domain(username, domain)
+        except ValueError as e:
+            report_deck_read_error(e)
+    return {}
 
 # 이미지 경로 가져오기 (단일 이미지 - 이전 버전과의 호환성 유지)
 def get_image_path(domain, topic, term):
@@ -334,25 +396,16 @@ def reorder_images(domain, topic, term, new_order):
         # 현재 타임스탬프 가져오기 - 모든 파일이 같은 타임스탬프 사용
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        # 임시 파일명 사용하여 충돌 방지
-        temp_files = []
-        for i, img_path in enumerate(new_order):
-            if not os.path.exists(img_path):
+        # 이미지 내용은 blob 저장소에 있으므로 매니페스트의 이름과 순서만 바꿈
+        current_paths = set(image_store.list_images(topic_folder))
+        renames = []
+        for img_path in new_order:
+            if img_path not in current_paths:
                 continue
-                
             _, ext = os.path.splitext(img_path)
-            temp_name = f"temp_{i}_{timestamp}{ext}"
-            temp_path = os.path.join(topic_folder, temp_name)
-            os.rename(img_path, temp_path)
-            temp_files.append((temp_path, ext))
-        
-        # 임시 파일을 최종 이름으로 변경
-        new_paths = []
-        for i, (temp_path, ext) in enumerate(temp_files):
-            new_name = f"{safe_topic}_{timestamp}_{i+1}{ext}"
-            new_path = os.path.join(topic_folder, new_name)
-            os.rename(temp_path, new_path)
-            new_paths.append(new_path)
+            new_name = f"{safe_topic}_{timestamp}_{len(renames)+1}{ext}"
+            renames.append((img_path, os.path.join(topic_folder, new_name)))
+        image_store.record_renames(topic_folder, renames)
         
         return True
     except Exception as e:
@@ -379,56 +432,293 @@ def get_all_image_paths(domain, topic, term):
         user_image_folder = get_user_image_folder(username)
         topic_folder = os.path.join(user_image_folder, safe_domain, safe_topic)
         
-        # 이하 기존 코드와 동일
-        # 해당 폴더가 없으면 빈 리스트 반환
-        if not os.path.exists(topic_folder):
-            return []
-        
-        # 이미지 파일 목록 저장할 리스트
-        image_paths = []
-        
-        # 폴더 내 모든 파일 검색
-        for file_name in os.listdir(topic_folder):
-            file_path = os.path.join(topic_folder, file_name)
-            if os.path.isfile(file_path):
-                # 이미지 파일 확장자인지 확인
-                file_ext = os.path.splitext(file_name)[1].lower()
-                if file_ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp']:
-                    # 새 형식(토픽명_타임스탬프_순번) 또는 기존 형식(용어명)
-                    # 특정 토픽과 관련된 모든 이미지 포함
-                    image_paths.append((file_path, file_name))
-        
-        # 이하 기존 코드와 동일
-        # 파일명에서 타임스탬프와 순번을 추출하여 정렬
-        def sort_key(item):
-            file_path, file_name = item
-            
-            # 새 형식: 토픽명_타임스탬프_순번.확장자
-            # 타임스탬프와 순번으로 정렬
-            import re
-            match = re.search(r'_(\d{8}_\d{6})_(\d+)', file_name)
-            if match:
-                timestamp = match.group(1)
-                number = int(match.group(2))
-                # 순번을 먼저, 타임스탬프를 나중에 정렬 기준으로 사용
-                return (number, timestamp)
-            
-            # 기존 형식: 파일 수정 시간으로 정렬
-            try:
-                file_time = os.path.getmtime(file_path)
-                return (99999, str(file_time))  # 기존 파일은 뒤로 정렬
-            except:
-                return (99999, "0")
-        
-        # 순번 기준으로 정렬 (오름차순)
-        image_paths.sort(key=sort_key)
-        
-        # 경로만 반환
-        return [path for path, _ in image_paths]
+        # 토픽 폴더의 매니페스트 순서대로 반환 (폴더가 바뀌지 않았으면 메모리 캐시 사용)
+        return image_store.list_images(topic_folder)
     except Exception as e:
         st.error(f"이미지 경로 검색 중 오류 발생: {str(e)}")
         return []
 
+# 카드/토픽 시각 표시 (분 단위, 시각이 없는 예전 카드는 "-")
+def format_timestamp(timestamp):
+    return timestamp[:16] if timestamp else "-"
+
+# 이미지 URL을 만드는 서버 가져오기 (url_for 제공)
+# 별도 이미지 서버를 켰고 시작했으면 그 서버, 아니면 Streamlit 정적 파일 서빙, 둘 다 쓸 수 없으면 None
+def get_image_server():
+    if IMAGE_SERVER_ENABLED:
+        image_server = image_store.get_image_server(USERS_FOLDER, IMAGE_SECRET_FILE, IMAGE_SERVER_HOST,
+                                                    IMAGE_SERVER_PORT, IMAGE_SERVER_BASE_URL)
+        if image_server is not None:
+            return image_server
+    if not st.get_option("server.enableStaticServing"):
+        return None
+    # 컴포넌트 iframe 안에서도 쓰므로 server.baseUrlPath를 포함한 절대 경로로 만듦
+    base_path = st.get_option("server.baseUrlPath").strip("/")
+    url_prefix = "/" + "/".join(part for part in (base_path, STATIC_IMAGE_URL_PATH) if part)
+    return image_store.get_static_publisher(USERS_FOLDER, IMAGE_SECRET_FILE, STATIC_IMAGE_FOLDER, url_prefix)
+
+# 카드 검색 (사용자별 검색 색인에서 찾으며, 덱이 바뀌었으면 바뀐 카드만 다시 색인)
+# [((도메인, 토픽, 정의/개념), 점수)]를 점수 내림차순으로 반환
+def search_cards(query, domains=None):
+    username = _logged_in_username()
+    if not username:
+        return []
+    return search_index.search(get_deck_storage(), username, query, domains)
+
+# 검색 결과에서 강조할 말 (질의 토큰과 오타를 허용해 찾은 말)
+def search_highlight_terms(query):
+    username = _logged_in_username()
+    if not username:
+        return []
+    return search_index.highlight_terms(get_deck_storage(), username, query)
+
+# 검색어를 <mark>로 강조한 HTML (width가 있으면 강조한 부분 근처만 발췌)
+def highlight_html(text, terms, width=None):
+    return search_index.highlight(text or "", terms, width).replace("\n", "<br>")
+
+# base64 이미지 캐시 (세션 사이에 공유)
+def get_payload_cache():
+    return image_store.get_payload_cache(IMAGE_PAYLOAD_CACHE_MB * 1024 * 1024)
+
+# 카드 이미지 표시
+# 이미지 서버(기본은 Streamlit 정적 파일 서빙)의 고정 URL을 사용하므로 rerun마다 이미지를 다시 보내지 않습니다.
+# 화면에는 표시용 크기(1200px)로 줄인 이미지를 쓰고, 원본은 클릭해서 크게 볼 때만 받습니다.
+# 이미지 URL을 쓸 수 없으면 기존처럼 base64로 포함합니다(이 경우 확대 보기도 표시용 크기).
+# base64 인코딩 결과는 (경로, mtime, 크기) 기준으로 캐시하므로 rerun마다 다시 인코딩하지 않습니다.
+def render_card_image(img_path):
+    display_path = image_store.get_derivative(img_path, "display")
+    image_url = full_url = None
+    image_server = get_image_server()
+    if image_server is not None and st.session_state.get("username"):
+        image_url = image_server.url_for(st.session_state.username, display_path)
+        full_url = image_server.url_for(st.session_state.username, img_path)
+    if image_url is None:
+        image_url = get_payload_cache().get_data_url(display_path)
+    st.markdown(f"""
+    <img src="{image_url}" data-full="{full_url or ''}" class="clickable-image" width="100%"
+        onclick="openImageModal(this.dataset.full || this.src)">
+    """, unsafe_allow_html=True)
+
+# 다음 카드 이미지 미리 준비
+# 카드 순서가 세션 상태에 정해져 있으므로 다음 카드들의 토픽 폴더를 백그라운드에서 읽어
+# 표시용 이미지를 만들고(이미지 서버를 쓰지 않으면 base64 인코딩까지) 다음 rerun에서는 캐시만 쓰게 합니다.
+# 이미지 서버를 쓰면 가장 가까운 카드의 이미지를 브라우저도 미리 받도록 prefetch 링크를 넣습니다.
+def prefetch_card_images(cards, current_index, domain=None, include_current=False, wrap=True):
+    """
+    Parameters:
+    -----------
+    cards : list
+        세션에 정해진 카드 순서 (각 카드에 'topic', 전체 도메인 모드는 'domain'도 있음)
+    current_index : int
+        현재 카드 위치
+    domain : str
+        카드에 'domain'이 없을 때 사용할 도메인
+    include_current : bool
+        현재 카드도 포함 (퀴즈처럼 이미지를 나중에 펼치는 경우)
+    wrap : bool
+        마지막 카드 다음에 처음 카드로 돌아가는지 여부
+    """
+    username = _logged_in_username()
+    if not username or not cards or IMAGE_PREFETCH_CARDS <= 0:
+        return
+    image_root = get_user_image_folder(username)
+    topic_folders = []
+    for offset in range(0 if include_current else 1, IMAGE_PREFETCH_CARDS + 1):
+        index = current_index + offset
+        if wrap:
+            index %= len(cards)
+        if index < len(cards):
+            card = cards[index]
+            topic_folders.append(image_store.get_topic_folder(image_root, card.get("domain", domain), card["topic"]))
+    if not topic_folders:
+        return
+    
+    image_server = get_image_server()
+    image_store.prefetch(topic_folders, get_payload_cache() if image_server is None else None)
+    
+    if image_server is not None:
+        # 이미 만들어진 표시용 이미지만 링크 (만드는 일은 백그라운드 작업에 맡김)
+        hints = []
+        for img_path in image_store.list_images(topic_folders[0]):
+            display_path = image_store.get_derivative(img_path, "display", create=False)
+            image_url = display_path and image_server.url_for(username, display_path)
+            if image_url:
+                hints.append(f'<link rel="prefetch" as="image" href="{image_url}">')
+        if hints:
+            st.markdown("".join(hints), unsafe_allow_html=True)
+
+# 현재 카드와 내용이 비슷한 카드 표시 (학습 모드)
+# 다음 카드들의 관련 카드도 같은 행렬 곱으로 함께 구해 두므로 "다음"을 누르면 다시 계산하지 않습니다.
+def render_related_cards(cards, current_index, domain=None):
+    username = _logged_in_username()
+    if not username or not cards or RELATED_CARD_COUNT <= 0:
+        return
+    keys = []
+    for offset in range(IMAGE_PREFETCH_CARDS + 1):
+        card = cards[(current_index + offset) % len(cards)]
+        keys.append((card.get("domain", domain), card["topic"], card["term"]))
+    hits = related_cards.related(get_deck_storage(), username, keys, RELATED_CARD_COUNT)[keys[0]]
+    if not hits:
+        return
+    
+    st.markdown("#### 🔗 관련 카드")
+    for (hit_domain, hit_topic, hit_term), score in hits:
+        st.markdown(f"- {hit_domain} › {hit_topic} › **{hit_term}** <span style='color: #718096;'>({score:.0%})</span>",
+                    unsafe_allow_html=True)
+
+# 브라우저 학습/퀴즈 화면 사용 여부
+# 이미지 URL을 쓸 수 없어도 묶음마다 이미지를 data URL로 따로 보내므로(build_feed_images) 설정만 봄
+def use_client_study():
+    return CLIENT_STUDY_ENABLED and _logged_in_username() is not None
+
+# 브라우저로 보낼 카드 덱 만들기
+# 섞은 순서와 덱 버전이 같으면 세션에 만들어 둔 것을 그대로 쓰므로 위치를 동기화하는 rerun에서는 다시 만들지 않습니다.
+# 학습 화면과 퀴즈 화면은 state_key를 달리해 서로의 덱을 밀어내지 않게 합니다.
+def build_client_deck(cards, domain=None, state_key="client_deck"):
+    username = _logged_in_username()
+    keys = [(card.get("domain", domain), card["topic"], card["term"]) for card in cards]
+    deck = card_components.deck_id(keys)
+    cache_key = (deck, get_deck_storage().get_version(username))
+    cached = st.session_state.get(state_key)
+    if cached and cached[0] == cache_key:
+        return deck, keys, cached[1]
+    
+    # 이미지는 토픽 폴더 단위이므로 토픽마다 한 번만 URL을 만듦
+    # 이미지 URL을 쓸 수 없으면 자리만 두고 이미지는 묶음마다 deck_feed로 보냄 (덱에 넣으면 덱이 너무 커짐)
+    image_server = get_image_server()
+    image_root = get_user_image_folder(username)
+    topic_images = {}
+    for card_domain, topic, _ in keys:
+        if (card_domain, topic) in topic_images:
+            continue
+        urls = []
+        for img_path in get_all_image_paths(card_domain, topic, ""):
+            # 표시용 이미지가 아직 없으면 원본을 쓰고, 표시용 이미지는 백그라운드에서 만듦
+            if image_server is None:
+                urls.append([None, None])
+                continue
+            display_path = image_store.get_derivative(img_path, "display", create=False) or img_path
+            urls.append([image_server.url_for(username, display_path), image_server.url_for(username, img_path)])
+        topic_images[(card_domain, topic)] = urls
+    image_store.prefetch([image_store.get_topic_folder(image_root, card_domain, topic) for card_domain, topic in topic_images])
+    
+    payload = []
+    for (card_domain, topic, term), card in zip(keys, cards):
+        card_data = card["card_data"]
+        payload.append([card_domain, topic, term, card_data.get("keyword", ""), card_data.get("rhyming", ""),
+                        card_data.get("content", ""), topic_images[(card_domain, topic)]])
+    st.session_state[state_key] = (cache_key, payload)
+    return deck, keys, payload
+
+# 이미지 URL을 쓸 수 없을 때 브라우저 학습/퀴즈 화면에 묶음마다 보낼 이미지
+# 묶음에 든 토픽의 표시용 이미지를 data URL로 만들며, 인코딩 결과는 base64 이미지 캐시를 함께 씀
+def build_feed_images(keys):
+    if get_image_server() is not None:
+        return {}
+    images = {}
+    for card_domain, topic, _ in keys:
+        topic_key = f"{card_domain}\x1f{topic}"
+        if topic_key in images:
+            continue
+        images[topic_key] = [get_payload_cache().get_data_url(image_store.get_derivative(img_path, "display"))
+                             for img_path in get_all_image_paths(card_domain, topic, "")]
+    return {topic_key: urls for topic_key, urls in images.items() if urls}
+
+# 브라우저 학습 화면 (이전/다음, 가리기/보기를 브라우저에서 처리하고 위치와 보기 상태만 돌려받음)
+def render_client_study(cards, index_key, show_prefix, domain=None):
+    """
+    Parameters:
+    -----------
+    cards : list
+        세션에 정해진 카드 순서
+    index_key : str
+        현재 카드 위치를 담는 세션 상태 키 (current_card_index / all_current_card_index)
+    show_prefix : str
+        보기 상태 세션 키 접두어 (study_show_ / all_study_show_)
+    domain : str
+        카드에 'domain'이 없을 때 사용할 도메인 (None이면 전체 도메인 학습으로 보고 도메인도 표시)
+    """
+    if not cards:
+        return
+    deck, keys, payload = build_client_deck(cards, domain)
+    position = st.session_state[index_key] % len(cards)
+    show = {field: st.session_state[f"{show_prefix}{field}"] for field in ("keyword", "rhyming", "content")}
+    # 시작 위치/보기 상태는 덱이 바뀔 때만 새로 정함
+    # 인자가 그대로여야 Streamlit이 덱을 브라우저로 다시 보내지 않음 (이어 보기는 브라우저가 sessionStorage로 처리)
+    start = st.session_state.get(f"{index_key}_start")
+    if not start or start[0] != deck:
+        start = st.session_state[f"{index_key}_start"] = (deck, position, show)
+    
+    event = card_components.study_deck(deck, payload, start[1], start[2], show_domain=domain is None,
+                                       key=f"{index_key}_deck")
+    
+    # 브라우저가 새로 보낸 위치만 반영 (섞기 전 덱에서 온 값은 무시)
+    if event and event.get("deck") == deck and event.get("seq") != st.session_state.get(f"{index_key}_seq"):
+        st.session_state[f"{index_key}_seq"] = event["seq"]
+        st.session_state[f"{index_key}_viewed"] = event.get("viewed", 0)
+        st.session_state[index_key] = event["position"] % len(cards)
+        for field, visible in event.get("show", {}).items():
+            if field in show:
+                st.session_state[f"{show_prefix}{field}"] = bool(visible)
+    
+    # 관련 카드와 (이미지 URL을 쓸 수 없을 때의) 이미지는 CLIENT_FEED_CHUNK장 묶음 단위로 구해 덱과 따로 작은 컴포넌트로 보냄
+    # (묶음이 바뀌어도 카드 덱 인자는 그대로여서 덱 전체를 다시 보내지 않음)
+    # 브라우저가 방금 보낸 위치 기준이며, 앞뒤로 동기화 간격만큼 더 구해 두므로 다음 동기화 전에 브라우저가 넘길 수 있는 카드는 모두 포함됨
+    position = st.session_state[index_key] % len(cards)
+    chunk_start = position - position % CLIENT_FEED_CHUNK
+    window = sorted({(chunk_start + offset) % len(cards)
+                     for offset in range(-card_components.SYNC_EVERY, CLIENT_FEED_CHUNK + card_components.SYNC_EVERY)})
+    related = {}
+    if RELATED_CARD_COUNT > 0:
+        hits = related_cards.related(get_deck_storage(), _logged_in_username(), [keys[i] for i in window],
+                                     RELATED_CARD_COUNT)
+        # 덱에 있는 카드는 덱 위치만, 덱 밖의 카드(다른 분야 등)만 분야/토픽/용어를 보냄
+        positions = st.session_state.get(f"{index_key}_positions")
+        if not positions or positions[0] != deck:
+            positions = st.session_state[f"{index_key}_positions"] = (deck, {key: i for i, key in enumerate(keys)})
+        for i in window:
+            if hits.get(keys[i]):
+                related[i] = [[positions[1][tuple(hit_key)], round(score, 3)] if tuple(hit_key) in positions[1]
+                              else [*hit_key, round(score, 3)] for hit_key, score in hits[keys[i]]]
+    card_components.deck_feed(deck, related, build_feed_images([keys[i] for i in window]), key=f"{index_key}_feed")
+
+# 브라우저 퀴즈 화면 (힌트, 정답 확인, 자가 채점을 브라우저에서 처리하고 채점 결과만 묶어서 돌려받음)
+def render_client_quiz(prefix, domain=None):
+    """
+    Parameters:
+    -----------
+    prefix : str
+        퀴즈 세션 상태 키 접두어 ("" / "all_")
+    domain : str
+        카드에 'domain'이 없을 때 사용할 도메인
+    """
+    quiz_cards = st.session_state[f"{prefix}quiz_cards"]
+    total = st.session_state[f"{prefix}quiz_total"]
+    _, keys, questions = build_client_deck(quiz_cards[:total], domain, "client_quiz_deck")
+    # 섞기/새 퀴즈 시작/다시 풀기는 카드 목록을 새로 만들므로 목록이 바뀌면 새 식별자를 붙임
+    # (한 문제짜리 퀴즈처럼 문제 순서가 같아도 브라우저가 지난 퀴즈의 채점 결과를 이어 쓰지 않도록)
+    quiz = st.session_state.get(f"{prefix}client_quiz")
+    if not quiz or quiz[0] is not quiz_cards:
+        quiz = st.session_state[f"{prefix}client_quiz"] = (quiz_cards, uuid.uuid4().hex[:16])
+    
+    event = card_components.quiz_runner(quiz[1], questions, key=f"{prefix}quiz_runner")
+    # 브라우저는 지금까지의 채점 결과 전체를 보내므로 점수와 위치를 그대로 다시 계산
+    if event and event.get("quiz") == quiz[1] and event.get("seq") != st.session_state.get(f"{prefix}quiz_seq"):
+        st.session_state[f"{prefix}quiz_seq"] = event["seq"]
+        answers = event.get("answers", [])[:total]
+        st.session_state[f"{prefix}quiz_score"] = sum(answers)
+        st.session_state[f"{prefix}current_quiz_index"] = min(len(answers), total - 1)
+        if event.get("done"):
+            st.session_state[f"{prefix}quiz_completed"] = True
+            st.rerun()
+    
+    # 이미지 URL을 쓸 수 없으면 이미지는 CLIENT_FEED_CHUNK문제 묶음 단위로 따로 보냄
+    # (브라우저가 방금 보낸 위치 기준이며, 다음 채점 결과를 보내기 전에 풀 수 있는 문제까지 포함)
+    index = st.session_state[f"{prefix}current_quiz_index"]
+    chunk_start = index - index % CLIENT_FEED_CHUNK
+    window = keys[chunk_start:chunk_start + CLIENT_FEED_CHUNK + card_components.QUIZ_SYNC_EVERY]
+    card_components.deck_feed(quiz[1], images=build_feed_images(window), key=f"{prefix}quiz_feed")
+
 # 기존 초기화 함수 수정
 def initialize_data():
     # 세션 상태 초기화
@@ -460,11 +750,43 @@ def load_data():
     ]
     return {domain: {} for domain in domains}
 
-# 기존 데이터 저장 함수 수정
-def save_data(data):
-    # 로그인한 경우 해당 사용자의 데이터 저장
+# 세분화된 데이터 변경 함수들
+# 전체 덱을 다시 저장하지 않고, 저장소 백엔드가 해당 카드/토픽/도메인만 갱신합니다.
+# 불러 둔 검색/관련 카드/중복 색인에도 같은 연산을 바로 반영해 다음 조회 때 덱 전체를 다시 읽지 않습니다.
+def _logged_in_username():
     if st.session_state.logged_in and st.session_state.username:
-        save_user_data(st.session_state.username, data)
+        return st.session_state.username
+    return None
+
+def _apply_deck_op(op, **args):
+    username = _logged_in_username()
+    if username:
+        deck_storage = get_deck_storage()
+        base_version = deck_storage.get_version(username)
+        getattr(deck_storage, op)(username, **args)
+        search_index.apply_op(deck_storage, username, base_version, op, **args)
+
+def save_card(domain, topic, term, card_data):
+    _apply_deck_op("save_card", domain=domain, topic=topic, term=term, card_data=card_data)
+
+def move_card(domain, topic, term, new_topic, new_term, card_data):
+    _apply_deck_op("move_card", domain=domain, topic=topic, term=term,
+                   new_topic=new_topic, new_term=new_term, card_data=card_data)
+
+def delete_card(domain, topic, term):
+    _apply_deck_op("delete_card", domain=domain, topic=topic, term=term)
+
+def delete_topic(domain, topic):
+    _apply_deck_op("delete_topic", domain=domain, topic=topic)
+
+def add_domain(domain):
+    _apply_deck_op("add_domain", domain=domain)
+
+def rename_domain(old_domain, new_domain):
+    _apply_deck_op("rename_domain", old_domain=old_domain, new_domain=new_domain)
+
+def delete_domain(domain):
+    _apply_deck_op("delete_domain", domain=domain)
 
 # 로그인 화면 표시 함수
 def login_page():
@@ -732,8 +1054,7 @@ def sidebar():
     st.sidebar.divider()
     
     # 도메인 선택
-    data = load_data()
-    domains = list(data.keys())
+    domains = get_domains()
     
     if "selected_domain" not in st.session_state:
         st.session_state.selected_domain = domains[0] if domains else None
@@ -774,8 +1095,8 @@ def sidebar():
         new_domain = st.text_input("새 도메인 이름", key=f"new_domain_input_{st.session_state.domain_add_counter}")
         
         if st.button("도메인 추가") and new_domain and new_domain not in domains:
-            data[new_domain] = {}
-            save_data(data)
+            domains.append(new_domain)
+            add_domain(new_domain)
             st.success(f"'{new_domain}' 도메인이 추가되었습니다!")
             # 성공 플래그 설정
             st.session_state.domain_add_success = True
@@ -812,9 +1133,8 @@ def sidebar():
                     st.error(f"'{new_domain_name}' 도메인이 이미 존재합니다. 다른 이름을 사용하세요.")
                 else:
                     # 도메인 이름 변경
-                    data[new_domain_name] = data[domain_to_edit]
-                    del data[domain_to_edit]
-                    save_data(data)
+                    domains[domains.index(domain_to_edit)] = new_domain_name
+                    rename_domain(domain_to_edit, new_domain_name)
                     
                     # 이미지 폴더 이름도 변경 (사용자별 폴더 경로 사용)
                     if st.session_state.username:
@@ -823,23 +1143,8 @@ def sidebar():
                         
                         if os.path.exists(old_folder):
                             try:
-                                # 새 폴더가 이미 존재하면 병합, 아니면 이름 변경
-                                if os.path.exists(new_folder):
-                                    import shutil
-                                    # 파일 복사
-                                    for item in os.listdir(old_folder):
-                                        s = os.path.join(old_folder, item)
-                                        d = os.path.join(new_folder, item)
-                                        if os.path.isdir(s):
-                                            if not os.path.exists(d):
-                                                shutil.copytree(s, d)
-                                        else:
-                                            shutil.copy2(s, d)
-                                    # 기존 폴더 삭제
-                                    shutil.rmtree(old_folder)
-                                else:
-                                    # 단순 이름 변경
-                                    os.rename(old_folder, new_folder)
+                                # 새 폴더가 이미 존재하면 토픽별로 병합, 아니면 이름 변경 (매니페스트만 옮김)
+                                image_store.move_domain_folder(old_folder, new_folder)
                             except Exception as e:
                                 st.error(f"폴더 이름 변경 중 오류 발생: {str(e)}")
                     
@@ -882,22 +1187,22 @@ def sidebar():
                 # 확인 대화상자 대신 직접 삭제 처리
                 try:
                     # 데이터에서 도메인 삭제
-                    del data[domain_to_delete]
-                    save_data(data)
+                    domains.remove(domain_to_delete)
+                    delete_domain(domain_to_delete)
                     
                     # 이미지 폴더도 삭제 (사용자별 폴더 경로 사용)
                     if st.session_state.username:
                         domain_folder = os.path.join(get_user_image_folder(st.session_state.username), domain_to_delete)
                         if os.path.exists(domain_folder):
                             try:
-                                import shutil
-                                shutil.rmtree(domain_folder)
+                                # 참조를 빼고 폴더 삭제 (다른 도메인에서 쓰지 않는 파일만 지워짐)
+                                image_store.remove_folder(domain_folder)
                             except Exception as e:
                                 st.error(f"도메인 폴더 삭제 중 오류 발생: {str(e)}")
                     
                     # 세션 상태의 선택된 도메인도 업데이트
                     if st.session_state.selected_domain == domain_to_delete:
-                        remaining_domains = list(data.keys())
+                        remaining_domains = list(domains)
                         st.session_state.selected_domain = remaining_domains[0] if remaining_domains else None
                     
                     # 성공 플래그 설정
@@ -1564,7 +1869,7 @@ def main():
                 rhyming = st.text_area("두음법 입력", height=100, key="add_mnemonic_input")
                 
                 # 일반 이미지 업로드
-                uploaded_file = st.file_uploader("이미지 파일 업로드", type=["png", "jpg", "jpeg"], key="add_file_uploader")
+                uploaded_file = st.file_uploader("이미지 파일 업로드", type=["png", "jpg", "jpeg", "webp"], key="add_file_uploader")
                 
                 if st.button("카드 추가", key="add_card_button"):
                     # 기본 검증
@@ -1600,7 +1905,7 @@ def main():
                             
                             # 카드 데이터 저장
                             data[domain][topic][term] = card_data
-                            save_data(data)
+                            save_card(domain, topic, term, card_data)
                             
                             # 이미지 저장 처리
                             image_saved = False
@@ -1633,6 +1938,10 @@ def main():
                 st.sidebar.write(f"사용자 데이터 경로: {os.path.abspath(user_data_folder)}")
                 st.sidebar.write(f"사용자 이미지 경로: {os.path.abspath(user_image_folder)}")
             st.sidebar.write(f"임시 이미지 폴더 경로: {os.path.abspath(TEMP_IMAGE_FOLDER)}")
+            cache_stats = get_payload_cache().stats()
+            st.sidebar.write(f"이미지 캐시: 적중 {cache_stats['hits']}회, 누락 {cache_stats['misses']}회, "
+                             f"{cache_stats['items']}개 ({image_store.format_bytes(cache_stats['bytes'])}"
+                             f" / {image_store.format_bytes(cache_stats['max_bytes'])})")
             
             # 이미지 폴더 내용 확인
             if st.session_state.username and os.path.exists(user_image_folder):
@@ -1650,6 +1959,422 @@ def main():
             st.sidebar.write(f"- 클립보드 이미지: {'있음' if st.session_state.get('clipboard_image') else '없음'}")
             st.sidebar.write(f"- 클립보드 이력: {len(st.session_state.get('clipboard_history', []))}개 항목")
 
+# 카드 하나의 수정 폼 (이미지 정리/추가, 필드 수정, 삭제)
+# 관리 화면에서 수정하기로 선택한 카드 하나에만 그림
+def render_card_editor(data, domain, topic_name, term, card_data):
+    st.markdown(f"### 정의/개념 : {term}")
+    
+    # 수정 가능한 입력 필드
+    edit_col1, edit_col2 = st.columns([1, 3])
+    
+    with edit_col1:
+        # 이미지 표시
+        image_paths = get_all_image_paths(domain, topic_name, term)
+        if image_paths:
+            # 이미지 수가 2개 이상일 때만 순서 변경 버튼 표시
+            if len(image_paths) >= 2:
+                # 이미지 순서 변경 모드 확인
+                container_key = f"reorder_{domain}_{topic_name}_{term}"
+                if container_key not in st.session_state:
+                    st.session_state[container_key] = False
+                
+                # 순서 변경 모드 토글 버튼
+                btn_label = "이미지 정리 종료" if st.session_state[container_key] else "이미지 정리"
+                if st.button(btn_label, key=f"toggle_reorder_{topic_name}_{term}"):
+                    st.session_state[container_key] = not st.session_state[container_key]
+                    st.rerun()
+                
+                # 순서 변경 모드일 때
+                if st.session_state[container_key]:
+                    # 현재 순서 저장
+                    reorder_key = f"reorder_list_{domain}_{topic_name}_{term}"
+                    if reorder_key not in st.session_state:
+                        st.session_state[reorder_key] = image_paths.copy()
+                    
+                    # 이미지 표시 및 순서 변경 UI
+                    st.write("이미지를 각각 정리할 수 있습니다. 순서 변경은 ↑↓ 버튼, 삭제는 X 버튼을 사용하세요.")
+                    
+                    # 이미지 리스트가 비었는지 확인
+                    if not st.session_state[reorder_key]:
+                        st.warning("모든 이미지가 삭제되었습니다.")
+                    else:
+                        # 현재 이미지 목록에서 선택하여 위/아래로 이동 또는 삭제
+                        for i, img_path in enumerate(st.session_state[reorder_key].copy()):
+                            col1, col2, col3, col4 = st.columns([5, 1, 1, 1])
+                            
+                            # 이미지 표시
+                            with col1:
+                                try:
+                                    # 원본 대신 150px 썸네일 표시
+                                    with open(image_store.get_derivative(img_path, "thumb"), "rb") as img_file:
+                                        img_bytes = img_file.read()
+                                        st.image(img_bytes, caption=f"순서: {i+1}", width=150)
+                                except Exception as e:
+                                    st.error(f"이미지 로드 오류: {str(e)}")
+                            
+                            # 위로 이동 버튼
+                            with col2:
+                                if i > 0:  # 첫 번째 이미지가 아닌 경우에만
+                                    if st.button("↑", key=f"up_{topic_name}_{term}_{i}"):
+                                        # 이미지 순서 위로 이동
+                                        current_list = st.session_state[reorder_key]
+                                        current_list[i], current_list[i-1] = current_list[i-1], current_list[i]
+                                        st.session_state[reorder_key] = current_list
+                                        st.rerun()
+                            
+                            # 아래로 이동 버튼
+                            with col3:
+                                if i < len(st.session_state[reorder_key]) - 1:  # 마지막 이미지가 아닌 경우에만
+                                    if st.button("↓", key=f"down_{topic_name}_{term}_{i}"):
+                                        # 이미지 순서 아래로 이동
+                                        current_list = st.session_state[reorder_key]
+                                        current_list[i], current_list[i+1] = current_list[i+1], current_list[i]
+                                        st.session_state[reorder_key] = current_list
+                                        st.rerun()
+                            
+                            # 삭제 버튼 추가
+                            with col4:
+                                if st.button("❌", key=f"delete_img_{topic_name}_{term}_{i}"):
+                                    # 이미지 삭제
+                                    current_list = st.session_state[reorder_key]
+                                    removed_path = current_list.pop(i)
+                                    st.session_state[reorder_key] = current_list
+                                    # 파일 시스템에서 바로 삭제하지 않고, 변경 저장 시에만 적용
+                                    st.success(f"이미지가 목록에서 제거되었습니다. '변경 저장하기' 클릭 시 실제로 삭제됩니다.")
+                                    st.rerun()
+                    
+                    # 변경 저장 및 취소 버튼
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        if st.button("변경 저장하기", key=f"save_order_{topic_name}_{term}"):
+                            # 삭제된 이미지 처리
+                            deleted_images = []
+                            for img_path in image_paths:
+                                if img_path not in st.session_state[reorder_key]:
+                                    deleted_images.append(img_path)
+                            
+                            # 매니페스트에서 삭제 (다른 곳에서 쓰지 않는 파일만 지워짐)
+                            if deleted_images:
+                                try:
+                                    image_store.delete_images(deleted_images)
+                                except Exception as e:
+                                    st.error(f"이미지 삭제 중 오류 발생: {e}")
+                            
+                            # 남은 이미지 순서 변경 저장
+                            if st.session_state[reorder_key]:
+                                success = reorder_images(
+                                    domain,
+                                    topic_name,
+                                    term,
+                                    st.session_state[reorder_key]
+                                )
+                                
+                                if success:
+                                    if deleted_images:
+                                        st.success(f"{len(deleted_images)}개 이미지가 삭제되고 순서가 변경되었습니다.")
+                                    else:
+                                        st.success("이미지 순서가 변경되었습니다.")
+                            else:
+                                st.success("모든 이미지가 삭제되었습니다.")
+                            
+                            # 순서 변경 모드 종료 및 세션 상태 초기화
+                            st.session_state[container_key] = False
+                            if reorder_key in st.session_state:
+                                del st.session_state[reorder_key]
+                            time.sleep(1)
+                            st.rerun()
+                    
+                    with col2:
+                        if st.button("취소", key=f"cancel_order_{topic_name}_{term}"):
+                            # 순서 변경 모드 종료 및 세션 상태 초기화
+                            st.session_state[container_key] = False
+                            if reorder_key in st.session_state:
+                                del st.session_state[reorder_key]
+                            st.rerun()
+            
+            # 일반 모드에서 이미지 표시
+            container_key = f"reorder_{domain}_{topic_name}_{term}"
+            if not st.session_state.get(container_key, False):
+                # 이미지 표시
+                for img_path in image_paths:
+                    try:
+                        # 이미지 서버 URL로 표시 (브라우저가 한 번 받아 캐시)
+                        render_card_image(img_path)
+                    except Exception as e:
+                        st.error(f"이미지 로드 중 오류: {str(e)}")
+            
+            # 이미지 삭제 버튼
+            if st.button("모든 이미지 삭제", key=f"del_img_{topic_name}_{term}", type="secondary"):
+                # 모든 이미지 삭제
+                deleted = 0
+                try:
+                    deleted = image_store.delete_images(image_paths)
+                except Exception as e:
+                    st.error(f"이미지 삭제 중 오류 발생: {e}")
+                
+                if deleted > 0:
+                    st.success(f"{deleted}개 이미지가 삭제되었습니다!")
+                    time.sleep(1)
+                    st.rerun()
+            
+            # 이미지 추가 영역
+            st.markdown("#### 이미지 추가")
+            additional_images = st.file_uploader("새 이미지 업로드 (여러 이미지 선택 가능)", 
+                                                type=["png", "jpg", "jpeg", "gif", "webp"], 
+                                                accept_multiple_files=True,
+                                                key=f"update_images_{topic_name}_{term}")
+            if additional_images:
+                for img in additional_images:
+                    try:
+                        # 이미지 파일을 바이트로 읽고 PIL Image로 변환
+                        image_bytes = img.getvalue()
+                        image = Image.open(io.BytesIO(image_bytes))
+                        # 변환된 이미지를 표시
+                        st.image(image, caption=f"업로드할 이미지: {img.name}")
+                    except Exception as e:
+                        st.error(f"이미지 표시 중 오류 발생: {str(e)}")
+                
+                if st.button("이미지 추가", key=f"add_additional_img_{topic_name}_{term}"):
+                    images_saved = 0
+                    for img in additional_images:
+                        try:
+                            image_path = save_image(img, domain, topic_name, term)
+                            if image_path:
+                                images_saved += 1
+                        except Exception as e:
+                            st.error(f"이미지 추가 중 오류: {str(e)}")
+                            
+                    if images_saved > 0:
+                        st.success(f"{images_saved}개 이미지가 추가되었습니다!")
+                        time.sleep(1)
+                        st.rerun()
+        else:
+            # 이미지 추가 기능
+            st.markdown("#### 이미지 추가")
+            new_images = st.file_uploader(f"이미지 ({term}) - 여러 이미지 선택 가능", 
+                                      type=["png", "jpg", "jpeg", "gif", "webp"], 
+                                      accept_multiple_files=True,
+                                      key=f"add_img_{topic_name}_{term}")
+            if new_images:
+                for img in new_images:
+                    try:
+                        # 이미지 파일을 바이트로 읽고 PIL Image로 변환
+                        image_bytes = img.getvalue()
+                        image = Image.open(io.BytesIO(image_bytes))
+                        # 변환된 이미지를 표시
+                        st.image(image, caption=f"추가할 이미지: {img.name}")
+                    except Exception as e:
+                        st.error(f"이미지 표시 중 오류 발생: {str(e)}")
+                
+                if st.button("이미지 추가", key=f"add_img_btn_{topic_name}_{term}"):
+                    images_saved = 0
+                    for img in new_images:
+                        try:
+                            image_path = save_image(img, domain, topic_name, term)
+                            if image_path:
+                                images_saved += 1
+                        except Exception as e:
+                            st.error(f"이미지 추가 중 오류: {str(e)}")
+                            
+                    if images_saved > 0:
+                        st.success(f"{images_saved}개 이미지가 추가되었습니다!")
+                        time.sleep(1)
+                        st.rerun()
+    
+    with edit_col2:
+        # 토픽 이름 변경 기능 추가
+        new_topic_name = st.text_input("토픽 이름", value=topic_name, key=f"edit_topic_{topic_name}_{term}")
+        
+        # 정의/개념 변경 기능 추가
+        new_term = st.text_input("정의/개념", value=term, key=f"edit_term_{topic_name}_{term}")
+        
+        # 편집 가능한 필드들
+        new_keyword = st.text_input("핵심키워드", value=card_data.get("keyword", ""), key=f"edit_keyword_{topic_name}_{term}")
+        new_rhyming = st.text_input("두음", value=card_data.get("rhyming", ""), key=f"edit_rhyming_{topic_name}_{term}")
+        new_content = st.text_area("내용", value=card_data.get("content", ""), height=150, key=f"edit_content_{topic_name}_{term}")
+        
+        # 변경 저장 버튼
+        col_save, col_del = st.columns(2)
+        with col_save:
+            if st.button("변경 저장", key=f"save_edit_{topic_name}_{term}"):
+                topic_changed = new_topic_name != topic_name
+                term_changed = new_term != term
+                
+                # 토픽 이름 또는 용어가 변경된 경우
+                if topic_changed or term_changed:
+                    # 새 토픽 확인 및 생성
+                    if new_topic_name not in data[domain]:
+                        data[domain][new_topic_name] = {}
+                    
+                    # 같은 토픽/용어 조합이 이미 존재하는지 확인
+                    if term_changed and new_term in data[domain][new_topic_name]:
+                        st.error(f"'{new_topic_name}' 토픽에 '{new_term}' 정의/개념이 이미 존재합니다.")
+                    else:
+                        # 이미지 경로 저장
+                        old_image_paths = get_all_image_paths(domain, topic_name, term)
+                        has_images = old_image_paths and len(old_image_paths) > 0
+                        
+                        # 카드 데이터 업데이트
+                        updated_card_data = {
+                            "subject": new_term,
+                            "keyword": new_keyword,
+                            "rhyming": new_rhyming,
+                            "content": new_content
+                        }
+                        
+                        # 새 위치에 카드 추가
+                        data[domain][new_topic_name][new_term] = updated_card_data
+                        
+                        # 원래 카드 삭제
+                        del data[domain][topic_name][term]
+                        
+                        # 원래 토픽이 비어있으면 삭제
+                        if not data[domain][topic_name]:
+                            del data[domain][topic_name]
+                        
+                        # 이미지 이동 처리
+                        if has_images and st.session_state.username:
+                            try:
+                                # 사용자별 이미지 폴더
+                                user_image_folder = get_user_image_folder(st.session_state.username)
+                                
+                                # 새 토픽 폴더로 이미지 이동 (파일은 복사하지 않고 매니페스트의 참조만 옮김)
+                                new_topic_folder = os.path.join(user_image_folder, domain, new_topic_name)
+                                image_store.move_images(old_image_paths, new_topic_folder)
+                            except Exception as e:
+                                st.error(f"이미지 이동 중 오류 발생: {str(e)}")
+                        
+                        # 데이터 저장 (이동한 카드만 갱신)
+                        move_card(domain, topic_name, term, new_topic_name, new_term, updated_card_data)
+                        st.success(f"카드가 '{new_topic_name}' 토픽의 '{new_term}'으로 업데이트되었습니다!")
+                        # 옮긴 카드가 있는 토픽을 펼치고 수정 폼은 닫음
+                        st.session_state.manage_open_topic = (domain, new_topic_name)
+                        st.session_state.manage_editing = None
+                        time.sleep(1)
+                        st.rerun()
+                else:
+                    # 카드 데이터만 업데이트
+                    card_data["keyword"] = new_keyword
+                    card_data["rhyming"] = new_rhyming
+                    card_data["content"] = new_content
+                    data[domain][topic_name][term] = card_data
+                    
+                    # 데이터 저장 및 페이지 새로고침
+                    save_card(domain, topic_name, term, card_data)
+                    st.success(f"'{term}' 카드가 업데이트되었습니다!")
+                    st.session_state.manage_editing = None
+                    time.sleep(1)
+                    st.rerun()
+        
+        with col_del:
+            if st.button("카드 삭제", key=f"del_{topic_name}_{term}"):
+                # 연결된 이미지 삭제
+                image_paths = get_all_image_paths(domain, topic_name, term)
+                deleted_count = 0
+                try:
+                    deleted_count = image_store.delete_images(image_paths)
+                except Exception as e:
+                    st.error(f"이미지 삭제 중 오류 발생: {e}")
+                
+                if deleted_count > 0:
+                    st.success(f"{deleted_count}개 이미지가 삭제되었습니다!")
+                
+                del data[domain][topic_name][term]
+                if not data[domain][topic_name]:  # 토픽에 카드가 없으면 토픽도 삭제
+                    del data[domain][topic_name]
+                delete_card(domain, topic_name, term)
+                st.success(f"'{term}' 카드가 삭제되었습니다!")
+                st.session_state.manage_editing = None
+                time.sleep(1)
+                st.rerun()
+
+# 중복 의심 카드 합치기
+# 남길 카드의 비어 있는 필드는 지울 카드의 값으로 채웁니다.
+# 이미지는 토픽 단위로 저장되므로, 지울 카드가 토픽의 마지막 카드일 때만 그 토픽 이미지를 남길 카드의 토픽 폴더로
+# 옮기고 빈 토픽 폴더를 지웁니다. 토픽에 다른 카드가 남아 있으면 그 카드들이 쓰도록 이미지를 그대로 둡니다.
+def merge_duplicate_cards(deck, keep_key, remove_key):
+    """
+    Parameters:
+    -----------
+    deck : dict
+        전체 덱
+    keep_key, remove_key : tuple
+        (도메인, 토픽, 정의/개념)
+
+    Returns:
+    --------
+    tuple
+        (옮긴 이미지 수, 같은 이미지가 있어 건너뛴 수, 토픽에 남겨 둔 이미지 수)
+    """
+    keep_domain, keep_topic, keep_term = keep_key
+    remove_domain, remove_topic, remove_term = remove_key
+    keep_card = deck[keep_domain][keep_topic][keep_term]
+    merged = duplicate_cards.merge_card_data(keep_card, deck[remove_domain][remove_topic][remove_term])
+    if merged != keep_card:
+        save_card(keep_domain, keep_topic, keep_term, merged)
+    
+    added, skipped, left = 0, 0, 0
+    if (remove_domain, remove_topic) != (keep_domain, keep_topic):
+        image_root = get_user_image_folder(st.session_state.username)
+        remove_folder = image_store.get_topic_folder(image_root, remove_domain, remove_topic)
+        if len(deck[remove_domain][remove_topic]) > 1:
+            left = len(image_store.list_images(remove_folder))
+        else:
+            added, skipped = image_store.merge_folders(
+                remove_folder, image_store.get_topic_folder(image_root, keep_domain, keep_topic))
+    
+    delete_card(remove_domain, remove_topic, remove_term)
+    return added, skipped, left
+
+# 중복 의심 카드 목록 (이 도메인의 카드가 들어 있는 쌍, 다른 도메인의 카드와의 쌍 포함)
+def render_duplicate_candidates(domain):
+    username = _logged_in_username()
+    if not username:
+        return
+    pairs = [pair for pair in duplicate_cards.find_duplicates(get_deck_storage(), username)
+             if domain in (pair[0][0], pair[1][0])]
+    if not pairs:
+        st.info(f"{domain} 도메인에서 중복 의심 카드를 찾지 못했습니다.")
+        return
+    
+    deck = load_data()
+    st.write(f"중복 의심 카드: {len(pairs)}쌍 (내용 유사도 {duplicate_cards.DUPLICATE_THRESHOLD:.0%} 이상)")
+    pair_limit = st.session_state.get("duplicate_pair_limit", DUPLICATE_PAIR_BATCH)
+    for first_key, second_key, similarity in pairs[:pair_limit]:
+        with st.container(border=True):
+            st.caption(f"유사도 {similarity:.0%}")
+            columns = st.columns(2)
+            for column, keep_key, remove_key in ((columns[0], first_key, second_key), (columns[1], second_key, first_key)):
+                keep_domain, keep_topic, keep_term = keep_key
+                card_data = deck.get(keep_domain, {}).get(keep_topic, {}).get(keep_term)
+                if card_data is None:
+                    continue
+                with column:
+                    content = card_data.get("content", "")
+                    if len(content) > CARD_SUMMARY_CHARS:
+                        content = content[:CARD_SUMMARY_CHARS] + "…"
+                    st.markdown(f"{keep_domain} › {keep_topic} › **{keep_term}**")
+                    st.caption(f"핵심키워드: {card_data.get('keyword', '') or '-'} · 두음: {card_data.get('rhyming', '') or '-'} · "
+                               f"이미지 {len(get_all_image_paths(keep_domain, keep_topic, keep_term))}개 · "
+                               f"수정: {format_timestamp(card_data.get('updated_at'))}")
+                    st.text(content)
+                    if st.button("이 카드로 합치기", key=f"merge_dup_{'/'.join(keep_key)}_{'/'.join(remove_key)}",
+                                 help="이 카드를 남기고 다른 카드를 지웁니다. 비어 있는 필드는 다른 카드에서 가져오고, 다른 카드가 토픽의 마지막 카드이면 그 토픽 이미지도 가져옵니다."):
+                        added, skipped, left = merge_duplicate_cards(deck, keep_key, remove_key)
+                        if left:
+                            image_note = f"'{remove_key[1]}' 토픽의 다른 카드가 있어 토픽 이미지 {left}개는 그대로 두었습니다"
+                        else:
+                            image_note = f"이미지 {added}개 이동, 같은 이미지 {skipped}개 생략"
+                        st.success(f"'{remove_key[2]}' 카드를 '{keep_term}' 카드로 합쳤습니다! ({image_note})")
+                        st.session_state.manage_editing = None
+                        time.sleep(1)
+                        st.rerun()
+    
+    if len(pairs) > pair_limit:
+        if st.button(f"중복 의심 카드 더 보기 ({pair_limit}/{len(pairs)})", key=f"duplicate_more_{domain}"):
+            st.session_state.duplicate_pair_limit = pair_limit + DUPLICATE_PAIR_BATCH
+            st.rerun()
+
 # 플래시카드 관리 화면
 def manage_flashcards(domain):
     # 도메인 헤더 강조
@@ -1661,11 +2386,8 @@ def manage_flashcards(domain):
     </div>
     """, unsafe_allow_html=True)
     
-    data = load_data()
-    
-    # domain이 data에 없으면 빈 딕셔너리 추가
-    if domain not in data:
-        data[domain] = {}
+    # 선택한 도메인만 불러옵니다. 도메인이 없으면 빈 딕셔너리가 됩니다.
+    data = {domain: load_domain_data(domain)}
         
     # 토픽 가져오기
     topics = data[domain]
@@ -1695,7 +2417,7 @@ def manage_flashcards(domain):
         content = st.text_area("내용", key=f"new_content_{st.session_state.flashcard_add_counter}")
         
         # 이미지 업로드 (여러 이미지 가능)
-        uploaded_images = st.file_uploader("이미지 업로드 (여러 이미지 선택 가능)", type=["png", "jpg", "jpeg", "gif"], accept_multiple_files=True, key=f"new_image_files_{st.session_state.flashcard_add_counter}")
+        uploaded_images = st.file_uploader("이미지 업로드 (여러 이미지 선택 가능)", type=["png", "jpg", "jpeg", "gif", "webp"], accept_multiple_files=True, key=f"new_image_files_{st.session_state.flashcard_add_counter}")
         if uploaded_images:
             for img in uploaded_images:
                 try:
@@ -1733,7 +2455,7 @@ def manage_flashcards(domain):
                     st.error(f"'{topic_name}' 토픽에 '{term}' 정의/개념이 이미 존재합니다. 다른 이름을 사용하거나 아래에서 기존 카드를 수정하세요.")
                 else:
                     topics[topic_name][term] = card_data
-                    save_data(data)
+                    save_card(domain, topic_name, term, card_data)
                     
                     # 이미지 저장 처리
                     images_saved = 0
@@ -1768,73 +2490,48 @@ def manage_flashcards(domain):
         # 검색 및 정렬 기능 추가
         col1, col2 = st.columns([3, 1])
         with col1:
-            search_term = st.text_input("🔍 토픽 또는 용어 검색", key=f"search_{domain}")
+            search_term = st.text_input("🔍 토픽 또는 용어 검색", key=f"search_{domain}", help=SEARCH_HELP)
         
         with col2:
-            sort_options = ["알파벳순", "카드개수순", "최근 수정순"]
+            # 검색 중에는 관련도순(점수가 높은 토픽부터)을 기본으로 함
+            sort_options = (["관련도순"] if search_term else []) + ["알파벳순", "카드개수순", "최근 수정순"]
             sort_option = st.selectbox("정렬", options=sort_options, key=f"sort_{domain}")
         
         sort_direction = st.radio("정렬 방향", ["오름차순", "내림차순"], horizontal=True, key=f"sort_dir_{domain}")
         
-        # 토픽 정보 수집 및 정렬
+        # 검색어가 있으면 검색 색인에서 이 도메인의 카드를 찾아 토픽별로 묶음 (점수 내림차순)
+        topic_hits = {}
+        card_hits = []
+        highlight_terms = []
+        if search_term:
+            for (_, hit_topic, hit_term), score in search_cards(search_term, [domain]):
+                if hit_topic in topics and hit_term in topics[hit_topic]:
+                    topic_hits.setdefault(hit_topic, []).append((hit_term, score))
+                    card_hits.append((hit_topic, hit_term))
+            highlight_terms = search_highlight_terms(search_term)
+        
+        # 토픽 정보 수집 및 정렬 (카드 수와 최종 수정 시각은 카드에 저장된 값으로 계산)
         topic_info = []
         for topic_name, cards in topics.items():
-            # 카드 개수
-            card_count = len(cards)
-            
-            # 최종 수정일 계산
-            try:
-                if st.session_state.username:
-                    topic_folder = os.path.join(get_user_image_folder(st.session_state.username), domain, topic_name)
-                    if os.path.exists(topic_folder):
-                        modified_time = datetime.datetime.fromtimestamp(os.path.getmtime(topic_folder))
-                    else:
-                        modified_time = datetime.datetime.now()
-                else:
-                    modified_time = datetime.datetime.now()
-            except:
-                modified_time = datetime.datetime.now()
+            if search_term and topic_name not in topic_hits:
+                continue
             
-            # 검색어 필터링
-            if search_term:
-                search_term_lower = search_term.lower()
-                # 토픽 이름에 검색어가 포함되어 있는지 확인
-                if search_term_lower in topic_name.lower():
-                    topic_info.append({
-                        "name": topic_name,
-                        "cards": cards,
-                        "card_count": card_count,
-                        "modified_time": modified_time
-                    })
-                    continue
-                
-                # 토픽 내의 카드 중에 검색어가 포함된 카드가 있는지 확인
-                for term, card_data in cards.items():
-                    if (search_term_lower in term.lower() or 
-                        search_term_lower in card_data.get("keyword", "").lower() or 
-                        search_term_lower in card_data.get("content", "").lower()):
-                        topic_info.append({
-                            "name": topic_name,
-                            "cards": cards,
-                            "card_count": card_count,
-                            "modified_time": modified_time
-                        })
-                        break
-            else:
-                topic_info.append({
-                    "name": topic_name,
-                    "cards": cards,
-                    "card_count": card_count,
-                    "modified_time": modified_time
-                })
-        
-        # 정렬
-        if sort_option == "알파벳순":
+            topic_info.append({
+                "name": topic_name,
+                "cards": cards,
+                "score": topic_hits[topic_name][0][1] if search_term else 0,
+                **storage.summarize_topic(cards)
+            })
+        
+        # 정렬 (관련도순은 순위 기준이라 오름차순이 점수가 높은 토픽부터)
+        if sort_option == "관련도순":
+            topic_info.sort(key=lambda x: -x["score"])
+        elif sort_option == "알파벳순":
             topic_info.sort(key=lambda x: x["name"])
         elif sort_option == "카드개수순":
             topic_info.sort(key=lambda x: x["card_count"])
         elif sort_option == "최근 수정순":
-            topic_info.sort(key=lambda x: x["modified_time"])
+            topic_info.sort(key=lambda x: x["updated_at"] or "")
         
         # 내림차순이면 리스트 뒤집기
         if sort_direction == "내림차순":
@@ -1842,402 +2539,173 @@ def manage_flashcards(domain):
         
         # 필터링 결과 메시지
         if search_term:
-            st.write(f"검색 결과: {len(topic_info)}개 토픽")
+            st.write(f"검색 결과: {len(topic_info)}개 토픽, {sum(len(hits) for hits in topic_hits.values())}개 카드")
             if len(topic_info) == 0:
                 st.info(f"'{search_term}'에 대한 검색 결과가 없습니다.")
         
+        # 카드 단위 상위 검색 결과 (검색어를 강조한 발췌와 함께, 열기를 누르면 해당 카드의 수정 폼으로 이동)
+        if card_hits:
+            st.markdown("#### 상위 검색 결과")
+            topic_order = [topic_item["name"] for topic_item in topic_info]
+            for hit_topic, hit_term in card_hits[:SEARCH_RESULT_LIMIT]:
+                hit_card = topics[hit_topic][hit_term]
+                hit_col, open_col = st.columns([6, 1])
+                with hit_col:
+                    st.markdown(f"<div>{highlight_html(hit_topic, highlight_terms)} › "
+                                f"<b>{highlight_html(hit_term, highlight_terms)}</b></div>", unsafe_allow_html=True)
+                    st.caption(f"핵심키워드: {highlight_html(hit_card.get('keyword', ''), highlight_terms) or '-'} · "
+                               f"두음: {highlight_html(hit_card.get('rhyming', ''), highlight_terms) or '-'}",
+                               unsafe_allow_html=True)
+                    st.markdown(f"<div>{highlight_html(hit_card.get('content', ''), highlight_terms, CARD_SUMMARY_CHARS)}</div>",
+                                unsafe_allow_html=True)
+                with open_col:
+                    if st.button("열기", key=f"search_hit_{hit_topic}_{hit_term}"):
+                        # 토픽이 있는 페이지로 이동해 토픽을 펼치고 카드 수정 폼을 엶
+                        page_size = st.session_state.get(f"manage_page_size_{domain}", TOPIC_LIST_PAGE_SIZE)
+                        st.session_state.manage_page = topic_order.index(hit_topic) // page_size + 1
+                        st.session_state.manage_open_topic = (domain, hit_topic)
+                        st.session_state.manage_card_limit = max(TOPIC_LIST_CARD_BATCH,
+                                                                 [term for term, _ in topic_hits[hit_topic]].index(hit_term) + 1)
+                        st.session_state.manage_editing = (domain, hit_topic, hit_term)
+                        st.rerun()
+            st.markdown("---")
+        
+        # 페이지 나누기: 한 번에 한 페이지의 토픽만 그리고, 카드는 펼친 토픽 하나만 요약으로 그림
+        # 수정 폼과 이미지는 수정하기로 선택한 카드 하나에만 그림
+        page_size = st.selectbox("페이지당 토픽 수", TOPIC_LIST_PAGE_SIZES,
+                                 index=TOPIC_LIST_PAGE_SIZES.index(TOPIC_LIST_PAGE_SIZE), key=f"manage_page_size_{domain}")
+        
+        # 도메인/정렬/검색 조건이 바뀌면 첫 페이지로 이동
+        list_signature = (domain, sort_option, sort_direction, search_term, page_size)
+        if st.session_state.get("manage_signature") != list_signature:
+            st.session_state.manage_signature = list_signature
+            st.session_state.manage_page = 1
+        
+        page_count = max(1, (len(topic_info) + page_size - 1) // page_size)
+        page = min(st.session_state.manage_page, page_count)
+        
+        if page_count > 1:
+            nav_prev, nav_info, nav_next = st.columns([1, 3, 1])
+            with nav_prev:
+                if st.button("◀ 이전", key=f"manage_prev_{domain}", disabled=page <= 1):
+                    st.session_state.manage_page = page - 1
+                    st.rerun()
+            with nav_info:
+                st.markdown(f"<div style='text-align: center; padding-top: 6px;'>{page} / {page_count} 페이지</div>",
+                            unsafe_allow_html=True)
+            with nav_next:
+                if st.button("다음 ▶", key=f"manage_next_{domain}", disabled=page >= page_count):
+                    st.session_state.manage_page = page + 1
+                    st.rerun()
+        
         # 토픽 목록 표시
-        for topic_item in topic_info:
+        for topic_item in topic_info[(page - 1) * page_size:page * page_size]:
             topic_name = topic_item["name"]
             cards = topic_item["cards"]
             card_count = topic_item["card_count"]
-            modified_time = topic_item["modified_time"].strftime("%Y-%m-%d %H:%M")
+            modified_time = format_timestamp(topic_item["updated_at"])
+            is_open = st.session_state.get("manage_open_topic") == (domain, topic_name)
             
-            with st.expander(f"토픽: {topic_name} ({len(cards)}개) - 최종 수정: {modified_time}"):
-                # 토픽 제목과 삭제 버튼 레이아웃 변경
-                col1, col2 = st.columns([5, 1])
-                
-                with col1:
-                    st.markdown(f"""
-                    <div style="margin-bottom: 15px;">
-                        <span style="font-size: 22px; font-weight: 600; color: #1E3A8A; background-color: #e8f0fe; padding: 5px 10px; border-radius: 5px; border-left: 4px solid #4263EB;">
-                            도메인: <b>{domain}</b> / 토픽: <b>{topic_name}</b>
-                        </span>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    # 토픽 삭제 버튼을 오른쪽으로 이동
-                    if st.button(f"🗑️ 토픽 삭제", key=f"del_topic_{topic_name}", type="secondary"):
-                        # 해당 토픽의 이미지 폴더 삭제
-                        if st.session_state.username:
-                            topic_folder = os.path.join(get_user_image_folder(st.session_state.username), domain, topic_name)
-                            if os.path.exists(topic_folder):
-                                try:
-                                    for filename in os.listdir(topic_folder):
-                                        file_path = os.path.join(topic_folder, filename)
-                                        if os.path.isfile(file_path):
-                                            os.unlink(file_path)
-                                    os.rmdir(topic_folder)
-                                except Exception as e:
-                                    st.error(f"이미지 폴더 삭제 중 오류 발생: {e}")
-                        
-                        del data[domain][topic_name]
-                        save_data(data)
-                        st.success(f"'{topic_name}' 토픽이 삭제되었습니다!")
-                        time.sleep(1)
-                        st.rerun()
-                
-                # 카드 목록
-                for term, card_data in cards.items():
-                    st.markdown("---")
-                    st.markdown(f"### 정의/개념 : {term}")
+            # 토픽 제목과 펼치기/삭제 버튼
+            col1, col2, col3 = st.columns([6, 1, 1])
+            
+            with col1:
+                st.markdown(f"""
+                <div style="margin-bottom: 15px;">
+                    <span style="font-size: 18px; font-weight: 600; color: #1E3A8A; background-color: #e8f0fe; padding: 5px 10px; border-radius: 5px; border-left: 4px solid #4263EB;">
+                        토픽: <b>{topic_name}</b>
+                    </span>
+                    <span style="font-size: 14px; color: #4a5568; margin-left: 8px;">
+                        ({card_count}개) - 최종 수정: {modified_time}
+                    </span>
+                </div>
+                """, unsafe_allow_html=True)
+            
+            with col2:
+                # 한 번에 한 토픽만 펼침
+                if st.button("접기" if is_open else "펼치기", key=f"manage_open_{topic_name}"):
+                    st.session_state.manage_open_topic = None if is_open else (domain, topic_name)
+                    st.session_state.manage_card_limit = TOPIC_LIST_CARD_BATCH
+                    st.session_state.manage_editing = None
+                    st.rerun()
+            
+            with col3:
+                if st.button(f"🗑️ 토픽 삭제", key=f"del_topic_{topic_name}", type="secondary"):
+                    # 해당 토픽의 이미지 폴더 삭제
+                    if st.session_state.username:
+                        topic_folder = os.path.join(get_user_image_folder(st.session_state.username), domain, topic_name)
+                        if os.path.exists(topic_folder):
+                            try:
+                                # 매니페스트의 참조를 빼고 폴더 삭제 (다른 토픽에서 쓰지 않는 파일만 지워짐)
+                                image_store.remove_folder(topic_folder)
+                            except Exception as e:
+                                st.error(f"이미지 폴더 삭제 중 오류 발생: {e}")
                     
-                    # 수정 가능한 입력 필드
-                    edit_col1, edit_col2 = st.columns([1, 3])
+                    del data[domain][topic_name]
+                    delete_topic(domain, topic_name)
+                    st.success(f"'{topic_name}' 토픽이 삭제되었습니다!")
+                    time.sleep(1)
+                    st.rerun()
+            
+            if not is_open:
+                continue
+            
+            # 펼친 토픽의 카드 요약 (카드가 많으면 나누어 표시, 검색 중에는 찾은 카드만 점수 순으로)
+            if search_term:
+                card_items = [(term, cards[term]) for term, _ in topic_hits[topic_name]]
+            else:
+                card_items = list(cards.items())
+            card_limit = st.session_state.get("manage_card_limit", TOPIC_LIST_CARD_BATCH)
+            editing = st.session_state.get("manage_editing")
+            
+            with st.container(border=True):
+                for term, card_data in card_items[:card_limit]:
+                    if editing == (domain, topic_name, term):
+                        render_card_editor(data, domain, topic_name, term, card_data)
+                        if st.button("수정 닫기", key=f"close_edit_{topic_name}_{term}"):
+                            st.session_state.manage_editing = None
+                            st.rerun()
+                        st.markdown("---")
+                        continue
                     
-                    with edit_col1:
-                        # 이미지 표시
-                        image_paths = get_all_image_paths(domain, topic_name, term)
-                        if image_paths:
-                            # 이미지 수가 2개 이상일 때만 순서 변경 버튼 표시
-                            if len(image_paths) >= 2:
-                                # 이미지 순서 변경 모드 확인
-                                container_key = f"reorder_{domain}_{topic_name}_{term}"
-                                if container_key not in st.session_state:
-                                    st.session_state[container_key] = False
-                                
-                                # 순서 변경 모드 토글 버튼
-                                btn_label = "이미지 정리 종료" if st.session_state[container_key] else "이미지 정리"
-                                if st.button(btn_label, key=f"toggle_reorder_{topic_name}_{term}"):
-                                    st.session_state[container_key] = not st.session_state[container_key]
-                                    st.rerun()
-                                
-                                # 순서 변경 모드일 때
-                                if st.session_state[container_key]:
-                                    # 현재 순서 저장
-                                    reorder_key = f"reorder_list_{domain}_{topic_name}_{term}"
-                                    if reorder_key not in st.session_state:
-                                        st.session_state[reorder_key] = image_paths.copy()
-                                    
-                                    # 이미지 표시 및 순서 변경 UI
-                                    st.write("이미지를 각각 정리할 수 있습니다. 순서 변경은 ↑↓ 버튼, 삭제는 X 버튼을 사용하세요.")
-                                    
-                                    # 이미지 리스트가 비었는지 확인
-                                    if not st.session_state[reorder_key]:
-                                        st.warning("모든 이미지가 삭제되었습니다.")
-                                    else:
-                                        # 현재 이미지 목록에서 선택하여 위/아래로 이동 또는 삭제
-                                        for i, img_path in enumerate(st.session_state[reorder_key].copy()):
-                                            col1, col2, col3, col4 = st.columns([5, 1, 1, 1])
-                                            
-                                            # 이미지 표시
-                                            with col1:
-                                                try:
-                                                    with open(img_path, "rb") as img_file:
-                                                        img_bytes = img_file.read()
-                                                        st.image(img_bytes, caption=f"순서: {i+1}", width=150)
-                                                except Exception as e:
-                                                    st.error(f"이미지 로드 오류: {str(e)}")
-                                            
-                                            # 위로 이동 버튼
-                                            with col2:
-                                                if i > 0:  # 첫 번째 이미지가 아닌 경우에만
-                                                    if st.button("↑", key=f"up_{topic_name}_{term}_{i}"):
-                                                        # 이미지 순서 위로 이동
-                                                        current_list = st.session_state[reorder_key]
-                                                        current_list[i], current_list[i-1] = current_list[i-1], current_list[i]
-                                                        st.session_state[reorder_key] = current_list
-                                                        st.rerun()
-                                            
-                                            # 아래로 이동 버튼
-                                            with col3:
-                                                if i < len(st.session_state[reorder_key]) - 1:  # 마지막 이미지가 아닌 경우에만
-                                                    if st.button("↓", key=f"down_{topic_name}_{term}_{i}"):
-                                                        # 이미지 순서 아래로 이동
-                                                        current_list = st.session_state[reorder_key]
-                                                        current_list[i], current_list[i+1] = current_list[i+1], current_list[i]
-                                                        st.session_state[reorder_key] = current_list
-                                                        st.rerun()
-                                            
-                                            # 삭제 버튼 추가
-                                            with col4:
-                                                if st.button("❌", key=f"delete_img_{topic_name}_{term}_{i}"):
-                                                    # 이미지 삭제
-                                                    current_list = st.session_state[reorder_key]
-                                                    removed_path = current_list.pop(i)
-                                                    st.session_state[reorder_key] = current_list
-                                                    # 파일 시스템에서 바로 삭제하지 않고, 변경 저장 시에만 적용
-                                                    st.success(f"이미지가 목록에서 제거되었습니다. '변경 저장하기' 클릭 시 실제로 삭제됩니다.")
-                                                    st.rerun()
-                                    
-                                    # 변경 저장 및 취소 버튼
-                                    col1, col2 = st.columns(2)
-                                    with col1:
-                                        if st.button("변경 저장하기", key=f"save_order_{topic_name}_{term}"):
-                                            # 삭제된 이미지 처리
-                                            deleted_images = []
-                                            for img_path in image_paths:
-                                                if img_path not in st.session_state[reorder_key]:
-                                                    deleted_images.append(img_path)
-                                            
-                                            # 파일 시스템에서 삭제
-                                            for img_path in deleted_images:
-                                                if os.path.exists(img_path):
-                                                    try:
-                                                        os.unlink(img_path)
-                                                    except Exception as e:
-                                                        st.error(f"이미지 삭제 중 오류 발생: {e}")
-                                            
-                                            # 남은 이미지 순서 변경 저장
-                                            if st.session_state[reorder_key]:
-                                                success = reorder_images(
-                                                    domain,
-                                                    topic_name,
-                                                    term,
-                                                    st.session_state[reorder_key]
-                                                )
-                                                
-                                                if success:
-                                                    if deleted_images:
-                                                        st.success(f"{len(deleted_images)}개 이미지가 삭제되고 순서가 변경되었습니다.")
-                                                    else:
-                                                        st.success("이미지 순서가 변경되었습니다.")
-                                            else:
-                                                st.success("모든 이미지가 삭제되었습니다.")
-                                            
-                                            # 순서 변경 모드 종료 및 세션 상태 초기화
-                                            st.session_state[container_key] = False
-                                            if reorder_key in st.session_state:
-                                                del st.session_state[reorder_key]
-                                            time.sleep(1)
-                                            st.rerun()
-                                    
-                                    with col2:
-                                        if st.button("취소", key=f"cancel_order_{topic_name}_{term}"):
-                                            # 순서 변경 모드 종료 및 세션 상태 초기화
-                                            st.session_state[container_key] = False
-                                            if reorder_key in st.session_state:
-                                                del st.session_state[reorder_key]
-                                            st.rerun()
-                            
-                            # 일반 모드에서 이미지 표시
-                            container_key = f"reorder_{domain}_{topic_name}_{term}"
-                            if not st.session_state.get(container_key, False):
-                                # 이미지 표시
-                                for img_path in image_paths:
-                                    try:
-                                        # 이미지를 base64로 인코딩하여 HTML로 표시
-                                        with open(img_path, "rb") as img_file:
-                                            encoded_img = base64.b64encode(img_file.read()).decode()
-                                            st.markdown(f"""
-                                            <img src="data:image/png;base64,{encoded_img}" class="clickable-image" width="100%"
-                                                onclick="openImageModal(this.src)">
-                                            """, unsafe_allow_html=True)
-                                    except Exception as e:
-                                        st.error(f"이미지 로드 중 오류: {str(e)}")
-                            
-                            # 이미지 삭제 버튼
-                            if st.button("모든 이미지 삭제", key=f"del_img_{topic_name}_{term}", type="secondary"):
-                                # 모든 이미지 삭제
-                                deleted = 0
-                                for img_path in image_paths:
-                                    if os.path.exists(img_path):
-                                        try:
-                                            os.unlink(img_path)
-                                            deleted += 1
-                                        except Exception as e:
-                                            st.error(f"이미지 삭제 중 오류 발생: {e}")
-                                
-                                if deleted > 0:
-                                    st.success(f"{deleted}개 이미지가 삭제되었습니다!")
-                                    time.sleep(1)
-                                    st.rerun()
-                            
-                            # 이미지 추가 영역
-                            st.markdown("#### 이미지 추가")
-                            additional_images = st.file_uploader("새 이미지 업로드 (여러 이미지 선택 가능)", 
-                                                                type=["png", "jpg", "jpeg", "gif"], 
-                                                                accept_multiple_files=True,
-                                                                key=f"update_images_{topic_name}_{term}")
-                            if additional_images:
-                                for img in additional_images:
-                                    try:
-                                        # 이미지 파일을 바이트로 읽고 PIL Image로 변환
-                                        image_bytes = img.getvalue()
-                                        image = Image.open(io.BytesIO(image_bytes))
-                                        # 변환된 이미지를 표시
-                                        st.image(image, caption=f"업로드할 이미지: {img.name}")
-                                    except Exception as e:
-                                        st.error(f"이미지 표시 중 오류 발생: {str(e)}")
-                                
-                                if st.button("이미지 추가", key=f"add_additional_img_{topic_name}_{term}"):
-                                    images_saved = 0
-                                    for img in additional_images:
-                                        try:
-                                            image_path = save_image(img, domain, topic_name, term)
-                                            if image_path:
-                                                images_saved += 1
-                                        except Exception as e:
-                                            st.error(f"이미지 추가 중 오류: {str(e)}")
-                                            
-                                    if images_saved > 0:
-                                        st.success(f"{images_saved}개 이미지가 추가되었습니다!")
-                                        time.sleep(1)
-                                        st.rerun()
+                    summary_col, button_col = st.columns([6, 1])
+                    
+                    with summary_col:
+                        image_count = len(get_all_image_paths(domain, topic_name, term))
+                        if search_term:
+                            # 검색 중에는 검색어를 강조하고 내용은 검색어 근처를 발췌
+                            st.markdown(f"<div><b>{highlight_html(term, highlight_terms)}</b></div>", unsafe_allow_html=True)
+                            st.caption(f"핵심키워드: {highlight_html(card_data.get('keyword', ''), highlight_terms) or '-'} · "
+                                       f"두음: {highlight_html(card_data.get('rhyming', ''), highlight_terms) or '-'} · "
+                                       f"이미지 {image_count}개 · 수정: {format_timestamp(card_data.get('updated_at'))}",
+                                       unsafe_allow_html=True)
+                            st.markdown(f"<div>{highlight_html(card_data.get('content', ''), highlight_terms, CARD_SUMMARY_CHARS)}</div>",
+                                        unsafe_allow_html=True)
                         else:
-                            # 이미지 추가 기능
-                            st.markdown("#### 이미지 추가")
-                            new_images = st.file_uploader(f"이미지 ({term}) - 여러 이미지 선택 가능", 
-                                                      type=["png", "jpg", "jpeg", "gif"], 
-                                                      accept_multiple_files=True,
-                                                      key=f"add_img_{topic_name}_{term}")
-                            if new_images:
-                                for img in new_images:
-                                    try:
-                                        # 이미지 파일을 바이트로 읽고 PIL Image로 변환
-                                        image_bytes = img.getvalue()
-                                        image = Image.open(io.BytesIO(image_bytes))
-                                        # 변환된 이미지를 표시
-                                        st.image(image, caption=f"추가할 이미지: {img.name}")
-                                    except Exception as e:
-                                        st.error(f"이미지 표시 중 오류 발생: {str(e)}")
-                                
-                                if st.button("이미지 추가", key=f"add_img_btn_{topic_name}_{term}"):
-                                    images_saved = 0
-                                    for img in new_images:
-                                        try:
-                                            image_path = save_image(img, domain, topic_name, term)
-                                            if image_path:
-                                                images_saved += 1
-                                        except Exception as e:
-                                            st.error(f"이미지 추가 중 오류: {str(e)}")
-                                            
-                                    if images_saved > 0:
-                                        st.success(f"{images_saved}개 이미지가 추가되었습니다!")
-                                        time.sleep(1)
-                                        st.rerun()
+                            content = card_data.get("content", "")
+                            if len(content) > CARD_SUMMARY_CHARS:
+                                content = content[:CARD_SUMMARY_CHARS] + "…"
+                            st.markdown(f"**{term}**")
+                            st.caption(f"핵심키워드: {card_data.get('keyword', '') or '-'} · 두음: {card_data.get('rhyming', '') or '-'} · "
+                                       f"이미지 {image_count}개 · 수정: {format_timestamp(card_data.get('updated_at'))}")
+                            st.text(content)
                     
-                    with edit_col2:
-                        # 토픽 이름 변경 기능 추가
-                        new_topic_name = st.text_input("토픽 이름", value=topic_name, key=f"edit_topic_{topic_name}_{term}")
-                        
-                        # 정의/개념 변경 기능 추가
-                        new_term = st.text_input("정의/개념", value=term, key=f"edit_term_{topic_name}_{term}")
-                        
-                        # 편집 가능한 필드들
-                        new_keyword = st.text_input("핵심키워드", value=card_data.get("keyword", ""), key=f"edit_keyword_{topic_name}_{term}")
-                        new_rhyming = st.text_input("두음", value=card_data.get("rhyming", ""), key=f"edit_rhyming_{topic_name}_{term}")
-                        new_content = st.text_area("내용", value=card_data.get("content", ""), height=150, key=f"edit_content_{topic_name}_{term}")
-                        
-                        # 변경 저장 버튼
-                        col_save, col_del = st.columns(2)
-                        with col_save:
-                            if st.button("변경 저장", key=f"save_edit_{topic_name}_{term}"):
-                                topic_changed = new_topic_name != topic_name
-                                term_changed = new_term != term
-                                
-                                # 토픽 이름 또는 용어가 변경된 경우
-                                if topic_changed or term_changed:
-                                    # 새 토픽 확인 및 생성
-                                    if new_topic_name not in data[domain]:
-                                        data[domain][new_topic_name] = {}
-                                    
-                                    # 같은 토픽/용어 조합이 이미 존재하는지 확인
-                                    if term_changed and new_term in data[domain][new_topic_name]:
-                                        st.error(f"'{new_topic_name}' 토픽에 '{new_term}' 정의/개념이 이미 존재합니다.")
-                                    else:
-                                        # 이미지 경로 저장
-                                        old_image_paths = get_all_image_paths(domain, topic_name, term)
-                                        has_images = old_image_paths and len(old_image_paths) > 0
-                                        
-                                        # 카드 데이터 업데이트
-                                        updated_card_data = {
-                                            "subject": new_term,
-                                            "keyword": new_keyword,
-                                            "rhyming": new_rhyming,
-                                            "content": new_content
-                                        }
-                                        
-                                        # 새 위치에 카드 추가
-                                        data[domain][new_topic_name][new_term] = updated_card_data
-                                        
-                                        # 원래 카드 삭제
-                                        del data[domain][topic_name][term]
-                                        
-                                        # 원래 토픽이 비어있으면 삭제
-                                        if not data[domain][topic_name]:
-                                            del data[domain][topic_name]
-                                        
-                                        # 이미지 이동 처리
-                                        if has_images and st.session_state.username:
-                                            try:
-                                                # 사용자별 이미지 폴더
-                                                user_image_folder = get_user_image_folder(st.session_state.username)
-                                                
-                                                # 새 폴더 확인 및 생성
-                                                new_topic_folder = os.path.join(user_image_folder, domain, new_topic_name)
-                                                if not os.path.exists(new_topic_folder):
-                                                    os.makedirs(new_topic_folder)
-                                                
-                                                # 이미지 파일 이동
-                                                import shutil
-                                                for old_image_path in old_image_paths:
-                                                    # 파일 확장자 가져오기
-                                                    _, ext = os.path.splitext(old_image_path)
-                                                    
-                                                    # 새 이미지 파일명 생성
-                                                    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-                                                    count = 1
-                                                    new_image_path = os.path.join(new_topic_folder, f"{new_topic_name}_{timestamp}_{count}{ext}")
-                                                    
-                                                    # 파일 복사 후 원본 삭제
-                                                    shutil.copy2(old_image_path, new_image_path)
-                                                    os.unlink(old_image_path)
-                                            except Exception as e:
-                                                st.error(f"이미지 이동 중 오류 발생: {str(e)}")
-                                        
-                                        # 데이터 저장
-                                        save_data(data)
-                                        st.success(f"카드가 '{new_topic_name}' 토픽의 '{new_term}'으로 업데이트되었습니다!")
-                                        time.sleep(1)
-                                        st.rerun()
-                                else:
-                                    # 카드 데이터만 업데이트
-                                    card_data["keyword"] = new_keyword
-                                    card_data["rhyming"] = new_rhyming
-                                    card_data["content"] = new_content
-                                    data[domain][topic_name][term] = card_data
-                                    
-                                    # 데이터 저장 및 페이지 새로고침
-                                    save_data(data)
-                                    st.success(f"'{term}' 카드가 업데이트되었습니다!")
-                                    time.sleep(1)
-                                    st.rerun()
-                        
-                        with col_del:
-                            if st.button("카드 삭제", key=f"del_{topic_name}_{term}"):
-                                # 연결된 이미지 삭제
-                                image_paths = get_all_image_paths(domain, topic_name, term)
-                                deleted_count = 0
-                                for img_path in image_paths:
-                                    if os.path.exists(img_path):
-                                        try:
-                                            os.unlink(img_path)
-                                            deleted_count += 1
-                                        except Exception as e:
-                                            st.error(f"이미지 삭제 중 오류 발생: {e}")
-                                
-                                if deleted_count > 0:
-                                    st.success(f"{deleted_count}개 이미지가 삭제되었습니다!")
-                                
-                                del data[domain][topic_name][term]
-                                if not data[domain][topic_name]:  # 토픽에 카드가 없으면 토픽도 삭제
-                                    del data[domain][topic_name]
-                                save_data(data)
-                                st.success(f"'{term}' 카드가 삭제되었습니다!")
-                                time.sleep(1)
-                                st.rerun()
+                    with button_col:
+                        if st.button("수정", key=f"edit_btn_{topic_name}_{term}"):
+                            st.session_state.manage_editing = (domain, topic_name, term)
+                            st.rerun()
+                    st.markdown("---")
+                
+                if len(card_items) > card_limit:
+                    if st.button(f"카드 더 보기 ({card_limit}/{len(card_items)})", key=f"manage_more_{topic_name}"):
+                        st.session_state.manage_card_limit = card_limit + TOPIC_LIST_CARD_BATCH
+                        st.rerun()
+        
+        # 중복 의심 카드 (켰을 때만 찾음)
+        st.markdown("---")
+        if st.toggle("🧬 중복 의심 카드 찾기", key=f"duplicate_toggle_{domain}",
+                     help="내용이 거의 같은 카드를 다른 토픽/도메인까지 찾아 합칠 수 있습니다."):
+            render_duplicate_candidates(domain)
     
     else:
         st.info(f"{domain} 도메인에 아직 플래시카드가 없습니다. 새 플래시카드를 추가해보세요!")
@@ -2254,8 +2722,7 @@ def study_mode(domain):
     </div>
     """, unsafe_allow_html=True)
     
-    data = load_data()
-    topics = data[domain]
+    topics = load_domain_data(domain)
     
     if not topics:
         st.info(f"{domain} 도메인에 아직 플래시카드가 없습니다. 플래시카드를 추가한 후 학습해보세요!")
@@ -2353,33 +2820,36 @@ def study_mode(domain):
             st.session_state.study_show_rhyming = True
     
     # 네비게이션 및 컨트롤 버튼
+    # 브라우저 학습 화면에서는 이전/다음/가리기/보기를 브라우저에서 처리하므로 섞기 버튼만 서버에 둠
+    client_study = use_client_study()
     nav_col1, nav_col2, nav_col3, nav_col4, nav_col5 = st.columns(5)
     
-    with nav_col1:
-        if st.button("이전", key="prev_card"):
-            st.session_state.current_card_index = (st.session_state.current_card_index - 1) % len(st.session_state.study_cards)
-            # 이전 카드로 이동해도 보기 상태 유지
-            st.rerun()
+    if not client_study:
+        with nav_col1:
+            if st.button("이전", key="prev_card"):
+                st.session_state.current_card_index = (st.session_state.current_card_index - 1) % len(st.session_state.study_cards)
+                # 이전 카드로 이동해도 보기 상태 유지
+                st.rerun()
     
-    with nav_col2:
-        if st.button("모두 가리기", key="hide_all"):
-            st.session_state.study_show_content = False
-            st.session_state.study_show_keyword = False
-            st.session_state.study_show_rhyming = False
-            st.rerun()
+        with nav_col2:
+            if st.button("모두 가리기", key="hide_all"):
+                st.session_state.study_show_content = False
+                st.session_state.study_show_keyword = False
+                st.session_state.study_show_rhyming = False
+                st.rerun()
     
-    with nav_col3:
-        if st.button("모두 보기", key="show_all"):
-            st.session_state.study_show_content = True
-            st.session_state.study_show_keyword = True
-            st.session_state.study_show_rhyming = True
-            st.rerun()
+        with nav_col3:
+            if st.button("모두 보기", key="show_all"):
+                st.session_state.study_show_content = True
+                st.session_state.study_show_keyword = True
+                st.session_state.study_show_rhyming = True
+                st.rerun()
     
-    with nav_col4:
-        if st.button("다음", key="next_card"):
-            st.session_state.current_card_index = (st.session_state.current_card_index + 1) % len(st.session_state.study_cards)
-            # 다음 카드로 이동해도 보기 상태 유지
-            st.rerun()
+        with nav_col4:
+            if st.button("다음", key="next_card"):
+                st.session_state.current_card_index = (st.session_state.current_card_index + 1) % len(st.session_state.study_cards)
+                # 다음 카드로 이동해도 보기 상태 유지
+                st.rerun()
             
     with nav_col5:
         # 카드 섞기 버튼
@@ -2398,6 +2868,10 @@ def study_mode(domain):
             st.success("카드가 섞였습니다!")
             st.rerun()
     
+    if client_study:
+        render_client_study(st.session_state.study_cards, "current_card_index", "study_show_", domain)
+        return
+    
     # 플래시카드 보여주기
     if st.session_state.study_cards:
         current_card = st.session_state.study_cards[st.session_state.current_card_index]
@@ -2476,17 +2950,19 @@ def study_mode(domain):
             if image_paths:
                 for img_path in image_paths:
                     try:
-                        # 이미지를 base64로 인코딩하여 HTML로 표시
-                        with open(img_path, "rb") as img_file:
-                            encoded_img = base64.b64encode(img_file.read()).decode()
-                            st.markdown(f"""
-                            <img src="data:image/png;base64,{encoded_img}" class="clickable-image" width="100%"
-                                onclick="openImageModal(this.src)">
-                            """, unsafe_allow_html=True)
+                        # 이미지 서버 URL로 표시 (브라우저가 한 번 받아 캐시)
+                        render_card_image(img_path)
                     except Exception as e:
                         st.error(f"이미지 로드 중 오류: {str(e)}")
             else:
                 st.info("이 카드에는 이미지가 없습니다.")
+            
+            # 다음 카드들의 이미지를 미리 준비
+            prefetch_card_images(st.session_state.study_cards, st.session_state.current_card_index, domain)
+        
+        # 현재 카드와 비슷한 카드
+        with text_col:
+            render_related_cards(st.session_state.study_cards, st.session_state.current_card_index, domain)
 
 # 퀴즈 모드 화면
 def quiz_mode(domain):
@@ -2500,8 +2976,7 @@ def quiz_mode(domain):
     </div>
     """, unsafe_allow_html=True)
     
-    data = load_data()
-    topics = data[domain]
+    topics = load_domain_data(domain)
     
     if not topics:
         st.info(f"{domain} 도메인에 아직 플래시카드가 없습니다. 플래시카드를 추가한 후 퀴즈를 풀어보세요!")
@@ -2591,6 +3066,10 @@ def quiz_mode(domain):
             st.rerun()
         return
     
+    if use_client_study():
+        render_client_quiz("", domain)
+        return
+    
     # 현재 퀴즈 카드
     current_card = st.session_state.quiz_cards[st.session_state.current_quiz_index]
     
@@ -2808,17 +3287,16 @@ def quiz_mode(domain):
             if image_paths:
                 for img_path in image_paths:
                     try:
-                        # 이미지를 base64로 인코딩하여 HTML로 표시
-                        with open(img_path, "rb") as img_file:
-                            encoded_img = base64.b64encode(img_file.read()).decode()
-                            st.markdown(f"""
-                            <img src="data:image/png;base64,{encoded_img}" class="clickable-image" width="100%"
-                                onclick="openImageModal(this.src)">
-                            """, unsafe_allow_html=True)
+                        # 이미지 서버 URL로 표시 (브라우저가 한 번 받아 캐시)
+                        render_card_image(img_path)
                     except Exception as e:
                         st.error(f"이미지 로드 중 오류: {str(e)}")
             else:
                 st.info("이 카드에는 이미지가 없습니다.")
+        
+        # 이미지 보기를 누르거나 다음 문제로 넘어갈 때를 대비해 현재/다음 카드 이미지를 미리 준비
+        prefetch_card_images(st.session_state.quiz_cards, st.session_state.current_quiz_index, domain,
+                             include_current=True, wrap=False)
 
 # 전체 도메인 학습 모드
 def all_domains_study_mode():
@@ -2999,33 +3477,36 @@ def all_domains_study_mode():
             st.session_state.all_study_show_rhyming = True
     
     # 네비게이션 및 컨트롤 버튼
+    # 브라우저 학습 화면에서는 이전/다음/가리기/보기를 브라우저에서 처리하므로 섞기 버튼만 서버에 둠
+    client_study = use_client_study()
     nav_col1, nav_col2, nav_col3, nav_col4, nav_col5 = st.columns(5)
     
-    with nav_col1:
-        if st.button("이전", key="prev_all_card"):
-            st.session_state.all_current_card_index = (st.session_state.all_current_card_index - 1) % len(st.session_state.all_study_cards)
-            # 이전 카드로 이동해도 보기 상태 유지
-            st.rerun()
+    if not client_study:
+        with nav_col1:
+            if st.button("이전", key="prev_all_card"):
+                st.session_state.all_current_card_index = (st.session_state.all_current_card_index - 1) % len(st.session_state.all_study_cards)
+                # 이전 카드로 이동해도 보기 상태 유지
+                st.rerun()
     
-    with nav_col2:
-        if st.button("모두 가리기", key="hide_all_all"):
-            st.session_state.all_study_show_content = False
-            st.session_state.all_study_show_keyword = False
-            st.session_state.all_study_show_rhyming = False
-            st.rerun()
+        with nav_col2:
+            if st.button("모두 가리기", key="hide_all_all"):
+                st.session_state.all_study_show_content = False
+                st.session_state.all_study_show_keyword = False
+                st.session_state.all_study_show_rhyming = False
+                st.rerun()
     
-    with nav_col3:
-        if st.button("모두 보기", key="show_all_all"):
-            st.session_state.all_study_show_content = True
-            st.session_state.all_study_show_keyword = True
-            st.session_state.all_study_show_rhyming = True
-            st.rerun()
+        with nav_col3:
+            if st.button("모두 보기", key="show_all_all"):
+                st.session_state.all_study_show_content = True
+                st.session_state.all_study_show_keyword = True
+                st.session_state.all_study_show_rhyming = True
+                st.rerun()
     
-    with nav_col4:
-        if st.button("다음", key="next_all_card"):
-            st.session_state.all_current_card_index = (st.session_state.all_current_card_index + 1) % len(st.session_state.all_study_cards)
-            # 다음 카드로 이동해도 보기 상태 유지
-            st.rerun()
+        with nav_col4:
+            if st.button("다음", key="next_all_card"):
+                st.session_state.all_current_card_index = (st.session_state.all_current_card_index + 1) % len(st.session_state.all_study_cards)
+                # 다음 카드로 이동해도 보기 상태 유지
+                st.rerun()
             
     with nav_col5:
         # 카드 섞기 버튼
@@ -3044,6 +3525,10 @@ def all_domains_study_mode():
             st.success("카드가 섞였습니다!")
             st.rerun()
     
+    if client_study:
+        render_client_study(st.session_state.all_study_cards, "all_current_card_index", "all_study_show_")
+        return
+    
     # 플래시카드 보여주기
     if st.session_state.all_study_cards:
         current_card = st.session_state.all_study_cards[st.session_state.all_current_card_index]
@@ -3126,17 +3611,19 @@ def all_domains_study_mode():
             if image_paths:
                 for img_path in image_paths:
                     try:
-                        # 이미지를 base64로 인코딩하여 HTML로 표시
-                        with open(img_path, "rb") as img_file:
-                            encoded_img = base64.b64encode(img_file.read()).decode()
-                            st.markdown(f"""
-                            <img src="data:image/png;base64,{encoded_img}" class="clickable-image" width="100%"
-                                onclick="openImageModal(this.src)">
-                            """, unsafe_allow_html=True)
+                        # 이미지 서버 URL로 표시 (브라우저가 한 번 받아 캐시)
+                        render_card_image(img_path)
                     except Exception as e:
                         st.error(f"이미지 로드 중 오류: {str(e)}")
             else:
                 st.info("이 카드에는 이미지가 없습니다.")
+            
+            # 다음 카드들의 이미지를 미리 준비
+            prefetch_card_images(st.session_state.all_study_cards, st.session_state.all_current_card_index)
+        
+        # 현재 카드와 비슷한 카드
+        with text_col:
+            render_related_cards(st.session_state.all_study_cards, st.session_state.all_current_card_index)
 
 # 전체 도메인 퀴즈 모드
 def all_domains_quiz_mode():
@@ -3269,6 +3756,10 @@ def all_domains_quiz_mode():
             st.rerun()
         return
     
+    if use_client_study():
+        render_client_quiz("all_")
+        return
+    
     # 현재 퀴즈 카드
     current_card = st.session_state.all_quiz_cards[st.session_state.all_current_quiz_index]
     
@@ -3485,17 +3976,16 @@ def all_domains_quiz_mode():
             if image_paths:
                 for img_path in image_paths:
                     try:
-                        # 이미지를 base64로 인코딩하여 HTML로 표시
-                        with open(img_path, "rb") as img_file:
-                            encoded_img = base64.b64encode(img_file.read()).decode()
-                            st.markdown(f"""
-                            <img src="data:image/png;base64,{encoded_img}" class="clickable-image" width="100%"
-                                onclick="openImageModal(this.src)">
-                            """, unsafe_allow_html=True)
+                        # 이미지 서버 URL로 표시 (브라우저가 한 번 받아 캐시)
+                        render_card_image(img_path)
                     except Exception as e:
                         st.error(f"이미지 로드 중 오류: {str(e)}")
             else:
                 st.info("이 카드에는 이미지가 없습니다.")
+        
+        # 이미지 보기를 누르거나 다음 문제로 넘어갈 때를 대비해 현재/다음 카드 이미지를 미리 준비
+        prefetch_card_images(st.session_state.all_quiz_cards, st.session_state.all_current_quiz_index,
+                             include_current=True, wrap=False)
 
 # 전체 도메인 토픽 리스트 화면
 def all_domains_topic_list():
@@ -3523,133 +4013,147 @@ def all_domains_topic_list():
         st.warning("도메인을 선택해주세요.")
         return
     
-    # 모든 도메인과 토픽 정보 수집
+    # 검색 기능 (도메인/토픽 이름, 또는 검색 색인에서 찾은 카드가 있는 토픽)
+    search_term = st.text_input("검색어", "", help=SEARCH_HELP)
+    topic_scores = {}
+    if search_term:
+        for (hit_domain, hit_topic, _), score in search_cards(search_term, selected_domains):
+            topic_scores.setdefault((hit_domain, hit_topic), score)
+    
+    # 정렬 옵션 (검색 중에는 관련도순을 기본으로 함)
+    sort_options = (["관련도순"] if search_term else []) + ["도메인명순", "토픽명순", "카드개수순", "최근 수정순"]
+    sort_option = st.radio("정렬 방식", sort_options, horizontal=True)
+    
+    # 정렬 방향
+    sort_direction = st.radio("정렬 방향", ["오름차순", "내림차순"], horizontal=True)
+    
+    # 모든 도메인과 토픽 정보 수집 (카드 수와 최종 수정 시각은 카드에 저장된 값으로 계산)
     all_domain_topics = []
+    search_term_lower = search_term.lower()
     for domain in selected_domains:
         topics = data[domain]
         for topic_name, terms in topics.items():
-            # 각 토픽의 카드 개수
-            card_count = len(terms)
-            
-            # 최종 수정일 계산 (여기서는 현재 시간으로 대체, 실제로는 파일 수정 시간 등을 사용할 수 있음)
-            # 사용자 폴더에서 해당 토픽 폴더의 최종 수정 시간 가져오기
-            try:
-                if st.session_state.username:
-                    topic_folder = os.path.join(get_user_image_folder(st.session_state.username), domain, topic_name)
-                    if os.path.exists(topic_folder):
-                        modified_time = datetime.datetime.fromtimestamp(os.path.getmtime(topic_folder))
-                    else:
-                        modified_time = datetime.datetime.now()
-                else:
-                    modified_time = datetime.datetime.now()
-            except:
-                modified_time = datetime.datetime.now()
-            
+            score = topic_scores.get((domain, topic_name), 0)
+            if (search_term and not score and search_term_lower not in domain.lower()
+                    and search_term_lower not in topic_name.lower()):
+                continue
             # 도메인:토픽 형태로 저장
             all_domain_topics.append({
                 "domain": domain,
                 "topic": topic_name,
                 "display": f"{domain}:{topic_name}",
-                "card_count": card_count,
-                "modified_time": modified_time
+                "score": score,
+                **storage.summarize_topic(terms)
             })
     
-    # 정렬 옵션
-    sort_options = ["도메인명순", "토픽명순", "카드개수순", "최근 수정순"]
-    sort_option = st.radio("정렬 방식", sort_options, horizontal=True)
-    
-    # 정렬 방향
-    sort_direction = st.radio("정렬 방향", ["오름차순", "내림차순"], horizontal=True)
-    
-    # 정렬 기준 설정
-    if sort_option == "도메인명순":
+    # 정렬 기준 설정 (관련도순은 순위 기준이라 오름차순이 점수가 높은 토픽부터)
+    if sort_option == "관련도순":
+        all_domain_topics.sort(key=lambda x: -x["score"])
+    elif sort_option == "도메인명순":
         all_domain_topics.sort(key=lambda x: x["domain"])
     elif sort_option == "토픽명순":
         all_domain_topics.sort(key=lambda x: x["topic"])
     elif sort_option == "카드개수순":
         all_domain_topics.sort(key=lambda x: x["card_count"])
     elif sort_option == "최근 수정순":
-        all_domain_topics.sort(key=lambda x: x["modified_time"])
+        all_domain_topics.sort(key=lambda x: x["updated_at"] or "")
     
     # 내림차순이면 리스트 뒤집기
     if sort_direction == "내림차순":
         all_domain_topics.reverse()
     
-    # 검색 기능
-    search_term = st.text_input("검색어", "")
-    if search_term:
-        search_term = search_term.lower()
-        all_domain_topics = [
-            item for item in all_domain_topics 
-            if search_term in item["domain"].lower() or search_term in item["topic"].lower()
-        ]
-    
     # 전체 도메인:토픽 목록 표시
     st.subheader(f"전체 플래시카드 목록 ({len(all_domain_topics)}개)")
     
-    # expander 스타일을 추가하여 텍스트 잘림 방지
-    st.markdown("""
-    <style>
-    .streamlit-expanderHeader {
-        white-space: normal !important;
-        overflow-wrap: break-word !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+    # 페이지 나누기: 한 번에 한 페이지의 토픽만 그리고, 카드와 이미지는 펼친 토픽 하나만 그림
+    page_size = st.selectbox("페이지당 토픽 수", TOPIC_LIST_PAGE_SIZES,
+                             index=TOPIC_LIST_PAGE_SIZES.index(TOPIC_LIST_PAGE_SIZE), key="topic_list_page_size")
+    
+    # 필터/정렬/검색 조건이 바뀌면 첫 페이지로 이동
+    list_signature = (tuple(selected_domains), sort_option, sort_direction, search_term, page_size)
+    if st.session_state.get("topic_list_signature") != list_signature:
+        st.session_state.topic_list_signature = list_signature
+        st.session_state.topic_list_page = 1
+    
+    page_count = max(1, (len(all_domain_topics) + page_size - 1) // page_size)
+    page = min(st.session_state.topic_list_page, page_count)
+    
+    nav_prev, nav_info, nav_next = st.columns([1, 3, 1])
+    with nav_prev:
+        if st.button("◀ 이전", key="topic_list_prev", disabled=page <= 1):
+            st.session_state.topic_list_page = page - 1
+            st.rerun()
+    with nav_info:
+        st.markdown(f"<div style='text-align: center; padding-top: 6px;'>{page} / {page_count} 페이지</div>",
+                    unsafe_allow_html=True)
+    with nav_next:
+        if st.button("다음 ▶", key="topic_list_next", disabled=page >= page_count):
+            st.session_state.topic_list_page = page + 1
+            st.rerun()
+    
+    page_items = all_domain_topics[(page - 1) * page_size:page * page_size]
     
-    # 각 도메인:토픽 항목에 학습 모드 버튼 추가
-    for idx, item in enumerate(all_domain_topics):
+    # 각 도메인:토픽 항목에 펼치기/학습 모드 버튼 추가
+    for item in page_items:
         domain = item["domain"]
         topic = item["topic"]
         card_count = item["card_count"]
-        modified_time = item["modified_time"].strftime("%Y-%m-%d %H:%M")
+        modified_time = format_timestamp(item["updated_at"])
+        is_open = st.session_state.get("topic_list_open") == item["display"]
         
-        # 각 도메인:토픽 표시를 강조
-        expander_label = f"{domain}:{topic} ({card_count}개) - 최종 수정: {modified_time}"
+        # 도메인:토픽 강조 표시와 펼치기/학습 버튼
+        col1, col2, col3 = st.columns([6, 1, 1])
         
-        with st.expander(expander_label, expanded=False):
-            # 도메인:토픽 강조 표시와 학습 버튼
-            col1, col2 = st.columns([4, 1])
-            
-            with col1:
-                st.markdown(f"""
-                <div style="margin-bottom: 15px;">
-                    <span style="font-size: 18px; font-weight: 600;">
-                        <span style="color: #1E3A8A; background-color: #edf2ff; padding: 3px 8px; border-radius: 4px; margin-right: 5px;">
-                            {domain}
-                        </span>:
-                        <span style="color: #2a4a7f; background-color: #f0f7ff; padding: 3px 8px; border-radius: 4px;">
-                            {topic}
-                        </span>
-                        <span style="font-size: 14px; color: #4a5568; margin-left: 8px;">
-                            ({card_count}개) - 최종 수정: {modified_time}
-                        </span>
+        with col1:
+            st.markdown(f"""
+            <div style="margin-bottom: 15px;">
+                <span style="font-size: 18px; font-weight: 600;">
+                    <span style="color: #1E3A8A; background-color: #edf2ff; padding: 3px 8px; border-radius: 4px; margin-right: 5px;">
+                        {domain}
+                    </span>:
+                    <span style="color: #2a4a7f; background-color: #f0f7ff; padding: 3px 8px; border-radius: 4px;">
+                        {topic}
                     </span>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                # 이 토픽만 학습하기 버튼
-                if st.button("학습하기", key=f"study_btn_{domain}_{topic}"):
-                    # 세션 상태에 선택한 도메인:토픽 정보 저장
-                    st.session_state.mode = "전체 학습"
-                    st.session_state.study_selected_domain_topic = f"{domain}:{topic}"
-                    
-                    # 학습 세션 상태 초기화
-                    if "all_study_cards" in st.session_state:
-                        del st.session_state.all_study_cards
-                        del st.session_state.all_current_card_index
-                        del st.session_state.all_study_show_content
-                        del st.session_state.all_study_show_keyword
-                        del st.session_state.all_study_show_rhyming
-                    
-                    st.rerun()
-            
-            # 해당 토픽의 모든 카드 표시
-            cards = data[domain][topic]
-            
-            for term, card_data in cards.items():
-                st.markdown("---")
+                    <span style="font-size: 14px; color: #4a5568; margin-left: 8px;">
+                        ({card_count}개) - 최종 수정: {modified_time}
+                    </span>
+                </span>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with col2:
+            # 한 번에 한 토픽만 펼침
+            if st.button("접기" if is_open else "펼치기", key=f"open_btn_{domain}_{topic}"):
+                st.session_state.topic_list_open = None if is_open else item["display"]
+                st.session_state.topic_list_card_limit = TOPIC_LIST_CARD_BATCH
+                st.rerun()
+        
+        with col3:
+            # 이 토픽만 학습하기 버튼
+            if st.button("학습하기", key=f"study_btn_{domain}_{topic}"):
+                # 세션 상태에 선택한 도메인:토픽 정보 저장
+                st.session_state.mode = "전체 학습"
+                st.session_state.study_selected_domain_topic = f"{domain}:{topic}"
+                
+                # 학습 세션 상태 초기화
+                if "all_study_cards" in st.session_state:
+                    del st.session_state.all_study_cards
+                    del st.session_state.all_current_card_index
+                    del st.session_state.all_study_show_content
+                    del st.session_state.all_study_show_keyword
+                    del st.session_state.all_study_show_rhyming
+                
+                st.rerun()
+        
+        if not is_open:
+            continue
+        
+        # 펼친 토픽의 카드 표시 (카드가 많으면 나누어 표시)
+        cards = list(data[domain][topic].items())
+        card_limit = st.session_state.get("topic_list_card_limit", TOPIC_LIST_CARD_BATCH)
+        
+        with st.container(border=True):
+            for term, card_data in cards[:card_limit]:
                 st.markdown(f"### 정의/개념 : {term}")
                 
                 # 컨텐츠 열 분할 (내용 / 이미지)
@@ -3667,17 +4171,18 @@ def all_domains_topic_list():
                     if image_paths:
                         for img_path in image_paths:
                             try:
-                                # 이미지를 base64로 인코딩하여 HTML로 표시
-                                with open(img_path, "rb") as img_file:
-                                    encoded_img = base64.b64encode(img_file.read()).decode()
-                                    st.markdown(f"""
-                                    <img src="data:image/png;base64,{encoded_img}" class="clickable-image" width="100%"
-                                        onclick="openImageModal(this.src)">
-                                    """, unsafe_allow_html=True)
+                                # 이미지 서버 URL로 표시 (브라우저가 한 번 받아 캐시)
+                                render_card_image(img_path)
                             except Exception as e:
                                 st.error(f"이미지 로드 중 오류: {str(e)}")
                     else:
                         st.info("이미지가 없습니다.")
+                st.markdown("---")
+            
+            if len(cards) > card_limit:
+                if st.button(f"카드 더 보기 ({card_limit}/{len(cards)})", key=f"more_cards_{domain}_{topic}"):
+                    st.session_state.topic_list_card_limit = card_limit + TOPIC_LIST_CARD_BATCH
+                    st.rerun()
 
 # 백업 함수 추가 (기존 helper 함수들 근처에 추가)
 def create_backup_zip(username):
@@ -3696,6 +4201,9 @@ def create_backup_zip(username):
         압축된 ZIP 파일의 바이트 데이터
     """
     try:
+        # 아직 디스크에 쓰지 않은 저장이 있으면 먼저 씀
+        storage.flush_all()
+        
         # 임시 ZIP 파일 경로
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         
@@ -3710,7 +4218,12 @@ def create_backup_zip(username):
             # ZIP 파일 생성 - 전체 users 폴더 압축
             with zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
                 for root, dirs, files in os.walk(users_folder):
+                    # 파생 이미지는 다시 만들 수 있으므로 제외 (이미지 원본은 blob으로 한 번씩만 들어감)
+                    dirs[:] = [d for d in dirs if d != image_store.DERIVED_FOLDER_NAME]
                     for file in files:
+                        # 검색/관련 카드 색인은 덱에서 다시 만들 수 있으므로 제외
+                        if file in DERIVED_DATA_FILES:
+                            continue
                         file_path = os.path.join(root, file)
                         # BASE_FOLDER 기준 상대 경로 계산 (flashcard_data)
                         # users 폴더부터의 경로를 유지하기 위해
@@ -3736,6 +4249,9 @@ def create_backup_zip(username):
                 if os.path.exists(data_folder):
                     for root, dirs, files in os.walk(data_folder):
                         for file in files:
+                            # 검색/관련 카드 색인은 덱에서 다시 만들 수 있으므로 제외
+                            if file in DERIVED_DATA_FILES:
+                                continue
                             file_path = os.path.join(root, file)
                             arcname = os.path.relpath(file_path, user_folder)
                             zipf.write(file_path, arcname)
@@ -3743,6 +4259,8 @@ def create_backup_zip(username):
                 # images 폴더 압축
                 if os.path.exists(images_folder):
                     for root, dirs, files in os.walk(images_folder):
+                        # 파생 이미지는 다시 만들 수 있으므로 제외 (이미지 원본은 blob으로 한 번씩만 들어감)
+                        dirs[:] = [d for d in dirs if d != image_store.DERIVED_FOLDER_NAME]
                         for file in files:
                             file_path = os.path.join(root, file)
                             arcname = os.path.relpath(file_path, user_folder)
@@ -3782,6 +4300,9 @@ def import_backup_zip(username, zip_file):
         성공 여부 및 메시지
     """
     try:
+        # 미뤄 둔 저장이 임포트한 파일을 덮어쓰지 않도록 먼저 씀
+        get_deck_storage().flush(username)
+        
         # 사용자 폴더 경로
         user_folder = os.path.join(USERS_FOLDER, username)
         data_folder = os.path.join(user_folder, "data")
@@ -3835,7 +4356,10 @@ def import_backup_zip(username, zip_file):
                     import shutil
                     shutil.copy2(src_path, dest_path)
                     import_count["data"] += 1
-        
+
+            # copy2는 원본의 수정 시간을 유지하므로 캐시를 명시적으로 비움
+            get_deck_storage().invalidate(username)
+
         # images 디렉토리 처리
         temp_images_folder = os.path.join(temp_extract_folder, "images")
         if os.path.exists(temp_images_folder):
@@ -3854,6 +4378,10 @@ def import_backup_zip(username, zip_file):
                     import shutil
                     shutil.copy2(src_path, dest_path)
                     import_count["images"] += 1
+            
+            # 덮어쓴 매니페스트 기준으로 blob 참조 수를 다시 셈 (이전 형식 백업의 이미지 파일은 blob으로 옮김)
+            image_store.forget(images_folder)
+            image_store.rebuild_manifests(images_folder)
         
         # 임시 파일 정리
         try:
@@ -3998,8 +4526,7 @@ def sidebar():
     st.sidebar.divider()
     
     # 도메인 선택
-    data = load_data()
-    domains = list(data.keys())
+    domains = get_domains()
     
     if "selected_domain" not in st.session_state:
         st.session_state.selected_domain = domains[0] if domains else None
@@ -4040,8 +4567,8 @@ def sidebar():
         new_domain = st.text_input("새 도메인 이름", key=f"new_domain_input_{st.session_state.domain_add_counter}")
         
         if st.button("도메인 추가") and new_domain and new_domain not in domains:
-            data[new_domain] = {}
-            save_data(data)
+            domains.append(new_domain)
+            add_domain(new_domain)
             st.success(f"'{new_domain}' 도메인이 추가되었습니다!")
             # 성공 플래그 설정
             st.session_state.domain_add_success = True
@@ -4078,9 +4605,8 @@ def sidebar():
                     st.error(f"'{new_domain_name}' 도메인이 이미 존재합니다. 다른 이름을 사용하세요.")
                 else:
                     # 도메인 이름 변경
-                    data[new_domain_name] = data[domain_to_edit]
-                    del data[domain_to_edit]
-                    save_data(data)
+                    domains[domains.index(domain_to_edit)] = new_domain_name
+                    rename_domain(domain_to_edit, new_domain_name)
                     
                     # 이미지 폴더 이름도 변경 (사용자별 폴더 경로 사용)
                     if st.session_state.username:
@@ -4089,23 +4615,8 @@ def sidebar():
                         
                         if os.path.exists(old_folder):
                             try:
-                                # 새 폴더가 이미 존재하면 병합, 아니면 이름 변경
-                                if os.path.exists(new_folder):
-                                    import shutil
-                                    # 파일 복사
-                                    for item in os.listdir(old_folder):
-                                        s = os.path.join(old_folder, item)
-                                        d = os.path.join(new_folder, item)
-                                        if os.path.isdir(s):
-                                            if not os.path.exists(d):
-                                                shutil.copytree(s, d)
-                                        else:
-                                            shutil.copy2(s, d)
-                                    # 기존 폴더 삭제
-                                    shutil.rmtree(old_folder)
-                                else:
-                                    # 단순 이름 변경
-                                    os.rename(old_folder, new_folder)
+                                # 새 폴더가 이미 존재하면 토픽별로 병합, 아니면 이름 변경 (매니페스트만 옮김)
+                                image_store.move_domain_folder(old_folder, new_folder)
                             except Exception as e:
                                 st.error(f"폴더 이름 변경 중 오류 발생: {str(e)}")
                     
@@ -4148,22 +4659,22 @@ def sidebar():
                 # 확인 대화상자 대신 직접 삭제 처리
                 try:
                     # 데이터에서 도메인 삭제
-                    del data[domain_to_delete]
-                    save_data(data)
+                    domains.remove(domain_to_delete)
+                    delete_domain(domain_to_delete)
                     
                     # 이미지 폴더도 삭제 (사용자별 폴더 경로 사용)
                     if st.session_state.username:
                         domain_folder = os.path.join(get_user_image_folder(st.session_state.username), domain_to_delete)
                         if os.path.exists(domain_folder):
                             try:
-                                import shutil
-                                shutil.rmtree(domain_folder)
+                                # 참조를 빼고 폴더 삭제 (다른 도메인에서 쓰지 않는 파일만 지워짐)
+                                image_store.remove_folder(domain_folder)
                             except Exception as e:
                                 st.error(f"도메인 폴더 삭제 중 오류 발생: {str(e)}")
                     
                     # 세션 상태의 선택된 도메인도 업데이트
                     if st.session_state.selected_domain == domain_to_delete:
-                        remaining_domains = list(data.keys())
+                        remaining_domains = list(domains)
                         st.session_state.selected_domain = remaining_domains[0] if remaining_domains else None
                     
                     # 성공 플래그 설정
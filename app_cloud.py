@@ -111,8 +111,13 @@ def cleanup():
 # Streamlit 앱 실행 함수
 def run_streamlit_app():
     try:
+        # ngrok은 Streamlit 포트만 공개하므로 따로 설정하지 않았으면 별도 이미지 서버를 끄고
+        # Streamlit 정적 파일 서빙(같은 포트)으로 이미지를 내려보냄
+        env = dict(os.environ)
+        env.setdefault("FLASHCARD_IMAGE_SERVER", "off")
+        
         # 앱 실행 (백그라운드)
-        subprocess.Popen(["streamlit", "run", "app.py", "--server.port", str(PORT)])
+        subprocess.Popen(["streamlit", "run", "app.py", "--server.port", str(PORT)], env=env)
         logger.info(f"Streamlit 앱이 포트 {PORT}에서 실행 중입니다.")
     except Exception as e:
         logger.error(f"Streamlit 앱 실행 중 오류 발생: {e}")
@@ -0,0 +1,100 @@
+"""
+브라우저에서 동작하는 학습/퀴즈 컴포넌트
+
+학습 모드에서 "이전"/"다음", 가리기/보기 버튼을, 퀴즈 모드에서 힌트, 정답 확인, 자가 채점 버튼을 누를 때마다
+st.rerun()으로 app.py 전체를 다시 실행하지 않도록 섞은 카드 덱(문제 묶음)을 한 번 브라우저로 보내고
+화면 전환은 브라우저에서 처리합니다.
+서버로는 위치와 진행 상황, 채점 결과만 가끔 보냅니다 (components/ 아래의 HTML 참고).
+"""
+import os
+import hashlib
+
+import streamlit.components.v1 as components
+
+FRONTEND_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components")
+# 브라우저에서 이만큼 카드를 넘길 때마다 위치를 서버로 보냄
+SYNC_EVERY = 10
+# 브라우저에서 이만큼 문제를 채점할 때마다 채점 결과를 서버로 보냄
+QUIZ_SYNC_EVERY = 5
+
+_study_deck = components.declare_component("study_deck", path=os.path.join(FRONTEND_FOLDER, "study_deck"))
+_quiz_runner = components.declare_component("quiz_runner", path=os.path.join(FRONTEND_FOLDER, "quiz_runner"))
+_deck_feed = components.declare_component("deck_feed", path=os.path.join(FRONTEND_FOLDER, "deck_feed"))
+
+
+def deck_id(keys):
+    """카드 순서를 나타내는 덱 식별자 (섞거나 토픽을 바꾸면 달라짐)"""
+    digest = hashlib.sha1()
+    for key in keys:
+        digest.update("\x1f".join(key).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()[:16]
+
+
+def study_deck(deck, cards, position=0, show=None, show_domain=False, sync_every=SYNC_EVERY, key=None):
+    """
+    카드 덱 컴포넌트를 그립니다.
+
+    Parameters:
+    -----------
+    deck : str
+        덱 식별자 (deck_id). 같은 덱이면 브라우저의 위치/보기 상태를 유지함
+    cards : list
+        [도메인, 토픽, 정의/개념, 핵심키워드, 두음, 내용, [[표시용 이미지 URL, 원본 URL], ...]] 목록
+        (이미지 URL을 쓸 수 없으면 URL 자리에 None을 두고 이미지는 deck_feed로 보냄)
+    position : int
+        새 덱을 보여 줄 때 시작 위치
+    show : dict
+        새 덱을 보여 줄 때 핵심키워드/두음/내용(keyword/rhyming/content) 보기 여부
+    show_domain : bool
+        카드의 도메인도 표시 (전체 도메인 학습)
+    sync_every : int
+        위치를 서버로 보내는 이동 횟수
+
+    Returns:
+    --------
+    dict or None
+        브라우저가 마지막으로 보낸 {"deck", "position", "show", "viewed", "seq"} (보낸 적이 없으면 None)
+    """
+    return _study_deck(deck_id=deck, cards=cards, position=position, show=show or {},
+                       show_domain=show_domain, sync_every=sync_every, key=key, default=None)
+
+
+def deck_feed(deck, related=None, images=None, key=None):
+    """
+    study_deck/quiz_runner에 관련 카드와 이미지를 보냅니다. 화면에는 아무것도 그리지 않습니다.
+    이 값이 바뀌어도 카드 덱 컴포넌트의 인자는 그대로여서 덱을 다시 보내지 않습니다.
+
+    Parameters:
+    -----------
+    deck : str
+        받을 덱 식별자 (study_deck의 deck_id, quiz_runner의 quiz_id)
+    related : dict
+        카드 위치 -> 관련 카드 목록. 덱에 있는 카드는 [덱 위치, 유사도],
+        덱 밖의 카드는 [도메인, 토픽, 정의/개념, 유사도] (브라우저는 받은 것을 덱별로 모아 둠)
+    images : dict
+        "도메인\x1f토픽" -> 표시용 이미지 data URL 목록. 카드 덱에 이미지 URL 대신 None을 보냈을 때만 씀
+        (브라우저는 마지막으로 받은 것만 둠)
+    """
+    _deck_feed(deck_id=deck, related=related or {}, images=images or {}, key=key, default=None)
+
+
+def quiz_runner(quiz, questions, sync_every=QUIZ_SYNC_EVERY, key=None):
+    """
+    퀴즈 문제 진행 컴포넌트를 그립니다.
+
+    Parameters:
+    -----------
+    quiz : str
+        퀴즈 식별자. 같은 퀴즈면 브라우저의 진행 상황을 유지함
+    questions : list
+        study_deck의 cards와 같은 형식의 문제 목록
+    sync_every : int
+        채점 결과를 서버로 보내는 문제 수
+
+    Returns:
+    --------
+    dict or None
+        브라우저가 마지막으로 보낸 {"quiz", "answers", "done", "seq"} (answers는 푼 순서대로 맞으면 1, 틀리면 0)
+    """
+    return _quiz_runner(quiz_id=quiz, questions=questions, sync_every=sync_every, key=key, default=None)
@@ -0,0 +1,253 @@
+"""
+중복 의심 카드 찾기
+
+카드마다 정의/개념, 핵심키워드, 내용을 합쳐 공백과 문장부호를 뺀 뒤 글자 SHINGLE_SIZE-gram(shingle)의
+집합으로 보고, 그 집합의 MinHash 서명(shingle 해시를 NUM_PERM개 칸으로 나눈 칸별 최솟값)을 구합니다.
+두 카드의 서명에서 값이 같은 자리의 비율은 두 shingle 집합의 자카드 유사도의 추정값입니다.
+
+서명을 BANDS개의 띠로 나누어 띠마다 같은 값을 가진 카드끼리만 후보로 묶으므로(LSH)
+모든 카드 쌍을 비교하지 않고, 후보 쌍만 서명으로 유사도를 확인합니다.
+shingle 해시와 서명, 후보 쌍은 numpy로 여러 카드를 한 번에 계산하며 shingle마다 해시는 한 번만 구합니다.
+
+서명은 검색 색인(search_index)과 같은 방식으로 덱 옆(data/duplicate_index.npz)에 저장하고,
+덱 버전이 바뀌면 체크섬이 달라진 카드만 다시 계산합니다.
+"""
+import sys
+import functools
+
+import numpy as np
+
+import search_index
+
+INDEX_FILE_NAME = "duplicate_index.npz"
+INDEX_FORMAT = 2
+SHINGLE_SIZE = 4
+# 서명 길이 = BANDS * BAND_ROWS (유사도 0.5 근처부터 후보가 되기 시작함)
+BANDS = 16
+BAND_ROWS = 4
+NUM_PERM = BANDS * BAND_ROWS
+# 서명 칸 번호를 고르는 해시의 위 비트 수 (2^PERM_BITS = NUM_PERM)
+PERM_BITS = 6
+# 중복으로 볼 추정 자카드 유사도
+DUPLICATE_THRESHOLD = 0.6
+# 한 띠에서 같은 값을 가진 카드가 이보다 많으면 모든 쌍 대신 첫 카드와의 쌍만 봄
+MAX_BUCKET_SIZE = 50
+# 서명을 한 번에 계산할 글자 수 (메모리 사용량 제한)
+SIGNATURE_CHUNK = 1 << 20
+
+# shingle 해시를 섞는 해시 (a * x + b) mod 2^64 의 계수 (a는 홀수, 프로세스가 바뀌어도 같은 값)
+_rng = np.random.default_rng(20240611)
+_HASH_A = np.uint64((int(_rng.integers(0, 1 << 63)) << 1) | 1)
+_HASH_B = np.uint64(int(_rng.integers(0, 1 << 63)))
+# 빈 칸 표시와, 빈 칸을 채울 때 거리마다 섞는 값
+_EMPTY = np.uint32(0xFFFFFFFF)
+_DENSIFY_STEP = 0x9E3779B9
+_BAND_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5],
+                     dtype=np.uint64)[:BAND_ROWS]
+
+
+def shingle_text(fields):
+    """shingle을 만들 카드 내용 (소문자로 바꿈, 공백/문장부호는 shingle_hashes에서 뺌)"""
+    return " ".join((fields["term"], fields["keyword"], fields["content"])).lower()
+
+
+@functools.lru_cache(maxsize=1)
+def _word_chars():
+    """유니코드 코드 포인트 -> 글자/숫자 여부 (정규식 \\w에서 밑줄을 뺀 것과 같음)"""
+    return np.fromiter((chr(code).isalnum() for code in range(sys.maxunicode + 1)), dtype=bool,
+                       count=sys.maxunicode + 1)
+
+
+def shingle_hashes(texts):
+    """
+    여러 카드의 글자 SHINGLE_SIZE-gram 32비트 해시를 한 번에 구합니다.
+    공백과 문장부호를 뺀 뒤 만들며, 그보다 짧은 카드는 내용 전체를 shingle 하나로 봅니다.
+
+    Returns:
+    --------
+    tuple
+        (모든 카드의 shingle 해시를 이어 붙인 uint64 배열, 카드별 shingle 수 배열)
+    """
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    keep = _word_chars()[codes]
+    cards = np.repeat(np.arange(len(texts)), np.fromiter(map(len, texts), dtype=np.int64, count=len(texts)))
+    lengths = np.bincount(cards[keep], minlength=len(texts))
+    # 카드마다 적어도 SHINGLE_SIZE 글자가 되도록 뒤를 0으로 채워 이어 붙임
+    padded = np.maximum(lengths, SHINGLE_SIZE)
+    starts = np.cumsum(padded) - padded
+    within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    joined = np.zeros(padded.sum(), dtype=np.uint64)
+    joined[np.repeat(starts, lengths) + within] = codes[keep]
+
+    hashes = np.zeros(len(joined) - SHINGLE_SIZE + 1, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        hashes = (hashes * np.uint64(1000003) + joined[offset:offset + len(hashes)]) & np.uint64(0xFFFFFFFF)
+    # 카드 경계에 걸친 shingle은 뺌
+    counts = padded - SHINGLE_SIZE + 1
+    positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(counts.sum())
+    return hashes[positions], counts
+
+
+def _densify(result):
+    """shingle이 하나도 떨어지지 않은 칸을 오른쪽(원형)으로 가장 가까운 칸의 값에 거리만큼 다른 값을 섞어 채웁니다."""
+    rows = np.flatnonzero((result == _EMPTY).any(axis=1))
+    if not len(rows):
+        return
+    signatures = result[rows]
+    empty = signatures == _EMPTY
+    filled = signatures.copy()
+    for distance in range(1, NUM_PERM):
+        source = np.roll(signatures, -distance, axis=1)
+        take = empty & (source != _EMPTY)
+        filled[take] = ((source[take].astype(np.uint64) + distance * _DENSIFY_STEP) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        empty &= ~take
+        if not empty.any():
+            break
+    result[rows] = filled
+
+
+def signatures(texts):
+    """
+    여러 카드의 MinHash 서명을 한 번에 구합니다.
+    shingle마다 해시를 한 번만 구해(one permutation hashing) 위 PERM_BITS 비트로 NUM_PERM개 칸 중
+    하나를 고르고 칸마다 최솟값을 남긴 뒤, 빈 칸을 채웁니다(_densify). 두 카드의 서명에서 값이 같은
+    칸의 비율은 shingle마다 NUM_PERM번 해시하는 MinHash와 같이 자카드 유사도의 추정값입니다.
+
+    Returns:
+    --------
+    numpy.ndarray
+        (카드 수, NUM_PERM) uint32
+    """
+    result = np.full((len(texts), NUM_PERM), _EMPTY, dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        # 글자 수가 SIGNATURE_CHUNK를 넘지 않도록 카드를 묶어 계산
+        end, total = start, 0
+        while end < len(texts) and (end == start or total < SIGNATURE_CHUNK):
+            total += len(texts[end])
+            end += 1
+        hashes, counts = shingle_hashes(texts[start:end])
+        mixed = hashes * _HASH_A + _HASH_B
+        slots = np.repeat(np.arange(end - start, dtype=np.int64) * NUM_PERM, counts)
+        slots += (mixed >> np.uint64(64 - PERM_BITS)).astype(np.int64)
+        values = ((mixed >> np.uint64(16)) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+        chunk = result[start:end]
+        np.minimum.at(chunk.reshape(-1), slots, values)
+        _densify(chunk)
+        start = end
+    return result
+
+
+def _pair_codes(first, second, count):
+    first, second = first.astype(np.int64), second.astype(np.int64)
+    return np.minimum(first, second) * count + np.maximum(first, second)
+
+
+class DuplicateIndex(search_index.CardIndex):
+    """한 사용자의 중복 의심 카드 색인 (카드별 MinHash 서명)."""
+
+    index_format = INDEX_FORMAT
+
+    def _reset(self):
+        super()._reset()
+        self.signatures = np.zeros((0, NUM_PERM), dtype=np.uint32)
+        # 찾아 둔 중복 후보 (덱이 바뀌면 다시 찾음)
+        self._pairs = None
+
+    # 색인 갱신
+    def _add_docs(self, doc_ids, items):
+        new_signatures = signatures([shingle_text(fields) for _, fields in items])
+        self.signatures = np.concatenate((self.signatures, new_signatures))
+        self._pairs = None
+
+    def _remove_doc(self, doc_id):
+        self._pairs = None
+
+    def _rekey_doc(self, doc_id, key):
+        self._pairs = None
+
+    def _compact_docs(self, live):
+        self.signatures = self.signatures[live]
+        self._pairs = None
+
+    # 중복 찾기
+    def _candidate_pairs(self, doc_ids):
+        """LSH 띠마다 같은 값을 가진 카드끼리 묶은 후보 쌍 (doc_ids 안의 위치, 중복 없음)"""
+        signatures = self.signatures[doc_ids].astype(np.uint64)
+        count = len(doc_ids)
+        # 쌍 (a, b)는 a * count + b (a < b) 하나의 정수로 모아 중복을 뺌
+        codes = [np.zeros(0, dtype=np.int64)]
+        for band in range(BANDS):
+            rows = signatures[:, band * BAND_ROWS:(band + 1) * BAND_ROWS]
+            buckets = (rows * _BAND_MIX).sum(axis=1)
+            order = np.argsort(buckets, kind="stable")
+            sorted_buckets = buckets[order]
+            # 같은 값이 이어지는 구간 (두 장 이상)
+            starts = np.flatnonzero(np.concatenate(([True], sorted_buckets[1:] != sorted_buckets[:-1])))
+            sizes = np.diff(np.concatenate((starts, [count])))
+            starts, sizes = starts[sizes > 1], sizes[sizes > 1]
+            for start, size in zip(starts[sizes > MAX_BUCKET_SIZE].tolist(), sizes[sizes > MAX_BUCKET_SIZE].tolist()):
+                members = order[start:start + size]
+                codes.append(_pair_codes(np.full(size - 1, members[0]), members[1:], count))
+            # 크기가 같은 구간끼리 모아 모든 쌍을 한 번에 만듦
+            for size in np.unique(sizes[sizes <= MAX_BUCKET_SIZE]).tolist():
+                members = order[starts[sizes == size][:, None] + np.arange(size)]
+                left, right = np.triu_indices(size, 1)
+                codes.append(_pair_codes(members[:, left].ravel(), members[:, right].ravel(), count))
+        codes = np.unique(np.concatenate(codes))
+        return np.stack((codes // max(count, 1), codes % max(count, 1)), axis=1)
+
+    def find_duplicates(self, threshold=DUPLICATE_THRESHOLD):
+        """
+        추정 유사도가 threshold 이상인 카드 쌍을 찾습니다.
+
+        Returns:
+        --------
+        list
+            [((도메인, 토픽, 정의/개념), (도메인, 토픽, 정의/개념), 유사도)] (유사도 내림차순)
+        """
+        if self._pairs is None or self._pairs[0] != threshold:
+            doc_ids = np.flatnonzero(np.frombuffer(bytes(self.alive), dtype=np.uint8))
+            pairs = self._candidate_pairs(doc_ids)
+            similar = []
+            if len(pairs):
+                left, right = doc_ids[pairs[:, 0]], doc_ids[pairs[:, 1]]
+                similarity = (self.signatures[left] == self.signatures[right]).mean(axis=1)
+                keep = np.flatnonzero(similarity >= threshold)
+                keep = keep[np.argsort(-similarity[keep], kind="stable")]
+                similar = [(self.keys[a], self.keys[b], s) for a, b, s in
+                           zip(left[keep].tolist(), right[keep].tolist(), similarity[keep].tolist())]
+            self._pairs = (threshold, similar)
+        return self._pairs[1]
+
+    # 저장/읽기
+    def _arrays(self):
+        return {"signatures": self.signatures}
+
+    def _load_arrays(self, arrays):
+        if arrays["signatures"].shape[1:] != (NUM_PERM,):
+            raise ValueError("지원하지 않는 색인 형식")
+        self.signatures = arrays["signatures"].astype(np.uint32)
+
+
+def get_user_index(deck_storage, username):
+    """사용자의 중복 의심 카드 색인을 덱의 현재 내용에 맞춰 반환합니다."""
+    return search_index.get_synced_index(deck_storage, username, INDEX_FILE_NAME, DuplicateIndex)
+
+
+def find_duplicates(deck_storage, username, threshold=DUPLICATE_THRESHOLD):
+    """사용자의 중복 의심 카드 쌍을 찾습니다. (DuplicateIndex.find_duplicates 참고)"""
+    index = get_user_index(deck_storage, username)
+    with index.lock:
+        return index.find_duplicates(threshold)
+
+
+def merge_card_data(keep, other):
+    """
+    합칠 때 남길 카드 내용. 남길 카드의 비어 있는 핵심키워드/두음/내용은 다른 카드의 값으로 채웁니다.
+    """
+    merged = dict(keep)
+    for field in ("keyword", "rhyming", "content"):
+        if not (merged.get(field) or "").strip() and (other.get(field) or "").strip():
+            merged[field] = other[field]
+    return merged
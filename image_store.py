@@ -0,0 +1,1536 @@
+"""
+플래시카드 이미지 저장소
+
+이미지 파일은 사용자 images 폴더의 .blobs 아래에 내용의 SHA-256 이름으로 한 번만 저장하고,
+도메인/토픽 폴더에는 이미지 목록(이름, 순서, 크기, 해상도, 해시)을 담은 매니페스트(.manifest.json)만 둡니다.
+같은 이미지를 여러 토픽에 올려도 파일은 하나이며, 이름 변경/이동/도메인 이름 변경은 매니페스트만 고칩니다.
+blob마다 참조 수(.blobs/refs.json)를 세어 더 이상 쓰이지 않는 blob은 지웁니다.
+토픽 폴더에 이미지 파일이 직접 들어 있으면(이전 형식, 백업 가져오기) 읽을 때는 파일을 그대로 두고 목록에 넣으며,
+blob으로 옮기는 것은 매니페스트 다시 만들기(rebuild_manifests, `python image_store.py rebuild`)나
+그 폴더의 이미지를 고칠 때뿐입니다.
+
+프로세스 안에서는 폴더의 mtime이 바뀌지 않는 한 메모리에 둔 매니페스트를 그대로 사용합니다.
+
+이미지는 URL로 내려보내므로 rerun마다 base64로 다시 보내지 않고 브라우저가 한 번 받아 캐시합니다.
+기본은 Streamlit 정적 파일 서빙(StaticImagePublisher, 앱의 static 폴더에 하드 링크)이고,
+앱과 함께 띄우는 작은 정적 파일 서버(ImageServer)를 따로 쓸 수도 있습니다.
+
+화면에는 원본 대신 크기를 줄인 파생 이미지(썸네일 150px, 표시용 1200px)를 쓰며,
+파생 이미지는 images 폴더의 .derived 폴더에 원본 해시 기준으로 보관합니다.
+
+업로드한 이미지는 저장 전에 WebP/JPEG으로 다시 인코딩하고 긴 변을 제한할 수 있으며(ingest),
+정책에 따라 원본도 blob으로 남겨 되돌릴 수 있습니다.
+"""
+import io
+import os
+import re
+import hmac
+import base64
+import shutil
+import secrets
+import argparse
+import datetime
+import hashlib
+import mimetypes
+import threading
+import collections
+import http.server
+import urllib.parse
+import concurrent.futures
+
+from PIL import Image, ImageOps, features
+
+import storage
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp')
+MANIFEST_FILE_NAME = ".manifest.json"
+# 1: 토픽 폴더에 이미지 파일을 두던 형식, 2: blob 참조만 두는 형식
+MANIFEST_VERSION = 2
+BLOBS_FOLDER_NAME = ".blobs"
+REFS_FILE_NAME = "refs.json"
+DERIVED_FOLDER_NAME = ".derived"
+# 이전 버전에서 재인코딩 전 원본을 두던 토픽 폴더 안의 폴더 (읽을 때 blob으로 옮김)
+ORIGINALS_FOLDER_NAME = ".originals"
+# 파생 이미지 크기 (긴 변 기준 px)
+DERIVATIVE_SIZES = {"thumb": 150, "display": 1200}
+# Pillow 형식 -> blob 확장자 (같은 내용은 항상 같은 blob 이름이 되도록 내용으로 정함)
+_FORMAT_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "GIF": ".gif", "BMP": ".bmp", "WEBP": ".webp"}
+
+# 토픽 폴더 경로 -> (폴더 mtime_ns, 매니페스트 항목 목록)
+_cache = {}
+# images 폴더 경로 -> InterProcessLock (매니페스트와 참조 수는 항상 이 잠금을 잡고 고침)
+_store_locks = {}
+# 파생 이미지 경로 -> 스레드 잠금 (같은 파생 이미지를 동시에 만들지 않도록)
+_render_locks = {}
+_locks_lock = threading.Lock()
+
+
+def safe_name(name):
+    """윈도우 파일 시스템에서 사용할 수 없는 문자 제거 (\\ / : * ? " < > |)"""
+    return ''.join(c for c in name if c not in '\\/:*?"<>|')
+
+
+def get_topic_folder(image_root, domain, topic):
+    return os.path.join(image_root, safe_name(domain), safe_name(topic))
+
+
+def image_root_of(topic_folder):
+    """토픽 폴더(images/<도메인>/<토픽>)가 속한 images 폴더"""
+    return os.path.dirname(os.path.dirname(os.path.abspath(topic_folder)))
+
+
+def is_image_file(file_name):
+    return os.path.splitext(file_name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def _store_lock(image_root):
+    image_root = os.path.abspath(image_root)
+    with _locks_lock:
+        if image_root not in _store_locks:
+            _store_locks[image_root] = storage.InterProcessLock(
+                os.path.join(image_root, BLOBS_FOLDER_NAME, "refs.lock"))
+        return _store_locks[image_root]
+
+
+def _lock_for(topic_folder):
+    return _store_lock(image_root_of(topic_folder))
+
+
+def _render_lock(derived_base):
+    with _locks_lock:
+        if derived_base not in _render_locks:
+            _render_locks[derived_base] = threading.Lock()
+        return _render_locks[derived_base]
+
+
+def _folder_mtime(topic_folder):
+    try:
+        return os.stat(topic_folder).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def legacy_sort_key(topic_folder, file_name):
+    """
+    매니페스트가 없던 폴더의 정렬 순서.
+    새 형식(토픽명_타임스탬프_순번)은 순번, 타임스탬프 순이고 기존 형식은 수정 시간 순으로 뒤에 둡니다.
+    """
+    match = re.search(r'_(\d{8}_\d{6})_(\d+)', file_name)
+    if match:
+        return (int(match.group(2)), match.group(1))
+    try:
+        return (99999, str(os.path.getmtime(os.path.join(topic_folder, file_name))))
+    except OSError:
+        return (99999, "0")
+
+
+# ---------------------------------------------------------------------------
+# blob 저장소와 참조 수
+# ---------------------------------------------------------------------------
+
+def blob_path(image_root, blob):
+    return os.path.join(image_root, BLOBS_FOLDER_NAME, blob[:2], blob)
+
+
+def is_blob(file_path):
+    return os.path.basename(os.path.dirname(os.path.dirname(file_path))) == BLOBS_FOLDER_NAME
+
+
+def describe_image(payload, file_name):
+    """매니페스트에 기록할 이미지 정보 (이름, blob 이름, 크기, 해상도, SHA-256)"""
+    sha256 = hashlib.sha256(payload).hexdigest()
+    ext = os.path.splitext(file_name)[1].lower()
+    ext = ".jpg" if ext == ".jpeg" else ext
+    try:
+        # 헤더만 읽으므로 이미지 전체를 디코딩하지 않음
+        with Image.open(io.BytesIO(payload)) as img:
+            width, height = img.size
+            ext = _FORMAT_EXTENSIONS.get(img.format, ext)
+    except Exception:
+        width, height = None, None
+    return {
+        "file": file_name,
+        "blob": sha256 + ext,
+        "size": len(payload),
+        "width": width,
+        "height": height,
+        "sha256": sha256,
+    }
+
+
+def _store_blob(image_root, payload, file_name):
+    """
+    이미지 내용을 blob으로 저장하고(이미 있으면 그대로 둠) 매니페스트 항목을 반환합니다.
+    저장한 blob은 항목을 매니페스트에 쓸 때 참조 수가 올라가므로 잠금을 잡은 상태에서 호출해야 합니다.
+    """
+    entry = describe_image(payload, file_name)
+    path = blob_path(image_root, entry["blob"])
+    if not os.path.exists(path):
+        storage.replace_file(path, payload)
+    return entry
+
+
+def _describe_file(topic_folder, file_name):
+    """토픽 폴더에 직접 놓인 이미지 파일을 옮기지 않고 매니페스트 항목으로 나타냅니다 (path에 파일 경로)."""
+    file_path = os.path.join(topic_folder, file_name)
+    with open(file_path, "rb") as f:
+        entry = describe_image(f.read(), file_name)
+    entry["path"] = file_path
+    return entry
+
+
+def _source_path(image_root, entry):
+    """항목의 실제 파일 경로 (blob, 아직 옮기지 않은 파일이면 토픽 폴더의 파일)"""
+    return entry.get("path") or blob_path(image_root, entry["blob"])
+
+
+def _absorb_file(topic_folder, file_name):
+    """토픽 폴더에 직접 놓인 이미지 파일을 blob으로 옮기고 매니페스트 항목을 반환합니다."""
+    file_path = os.path.join(topic_folder, file_name)
+    with open(file_path, "rb") as f:
+        payload = f.read()
+    image_root = image_root_of(topic_folder)
+    entry = describe_image(payload, file_name)
+    path = blob_path(image_root, entry["blob"])
+    if os.path.exists(path):
+        os.remove(file_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(file_path, path)
+    return entry
+
+
+def _entry_blobs(entries):
+    for entry in entries:
+        yield entry["blob"]
+        if entry.get("original"):
+            yield entry["original"]["blob"]
+
+
+def _refs_path(image_root):
+    return os.path.join(image_root, BLOBS_FOLDER_NAME, REFS_FILE_NAME)
+
+
+def _read_refs(image_root):
+    try:
+        refs = storage.read_data_file(_refs_path(image_root))
+    except (FileNotFoundError, ValueError):
+        return {}
+    return refs if isinstance(refs, dict) else {}
+
+
+def _free_blob(image_root, blob):
+    """참조가 없어진 blob과 그 파생 이미지를 지웁니다."""
+    _invalidate_payloads(blob_path(image_root, blob))
+    try:
+        os.remove(blob_path(image_root, blob))
+    except OSError:
+        pass
+    derived_folder = os.path.join(image_root, DERIVED_FOLDER_NAME)
+    if os.path.isdir(derived_folder):
+        prefix = blob[:16] + "_"
+        for file_name in os.listdir(derived_folder):
+            if file_name.startswith(prefix):
+                _invalidate_payloads(os.path.join(derived_folder, file_name))
+                try:
+                    os.remove(os.path.join(derived_folder, file_name))
+                except OSError:
+                    pass
+
+
+def _update_refs(image_root, added, removed):
+    """
+    참조 수를 더하고 뺍니다. 0이 된 blob은 지웁니다. 잠금을 잡은 상태에서 호출해야 합니다.
+
+    Returns:
+    --------
+    int
+        지운 blob 수
+    """
+    delta = collections.Counter(added)
+    delta.subtract(removed)
+    delta = {blob: count for blob, count in delta.items() if count}
+    if not delta:
+        return 0
+    refs = _read_refs(image_root)
+    freed = []
+    for blob, count in delta.items():
+        total = refs.get(blob, 0) + count
+        if total > 0:
+            refs[blob] = total
+        elif refs.pop(blob, None) is not None:
+            # 세던 blob만 지움 (참조 수 파일이 어긋났으면 rebuild_refs로 바로잡음)
+            freed.append(blob)
+    storage.replace_data_file(_refs_path(image_root), refs)
+    for blob in freed:
+        _free_blob(image_root, blob)
+    if freed:
+        _prune_published()
+    return len(freed)
+
+
+def rebuild_refs(image_root):
+    """
+    모든 토픽 폴더의 매니페스트로 참조 수를 다시 세고, 참조되지 않는 blob과 파생 이미지를 지웁니다.
+    백업을 가져오는 등 매니페스트를 직접 덮어쓴 뒤에 호출합니다.
+
+    Returns:
+    --------
+    int
+        지운 blob 수
+    """
+    with _store_lock(image_root):
+        refs = collections.Counter()
+        for topic_folder in iter_topic_folders(image_root):
+            # 매니페스트 파일에 기록된 blob만 셈 (아직 옮기지 않은 파일은 blob이 없음)
+            version, entries = _read_manifest_file(topic_folder)
+            if version == MANIFEST_VERSION:
+                refs.update(_entry_blobs(entries))
+        storage.replace_data_file(_refs_path(image_root), dict(refs))
+
+        freed = 0
+        blobs_folder = os.path.join(image_root, BLOBS_FOLDER_NAME)
+        if os.path.isdir(blobs_folder):
+            for prefix in os.listdir(blobs_folder):
+                prefix_folder = os.path.join(blobs_folder, prefix)
+                if not os.path.isdir(prefix_folder):
+                    continue
+                for blob in os.listdir(prefix_folder):
+                    if blob not in refs:
+                        _free_blob(image_root, blob)
+                        freed += 1
+
+        derived_folder = os.path.join(image_root, DERIVED_FOLDER_NAME)
+        if os.path.isdir(derived_folder):
+            live = {blob[:16] for blob in refs}
+            for file_name in os.listdir(derived_folder):
+                if file_name.split("_", 1)[0] not in live:
+                    _invalidate_payloads(os.path.join(derived_folder, file_name))
+                    try:
+                        os.remove(os.path.join(derived_folder, file_name))
+                    except OSError:
+                        pass
+        _prune_published()
+        return freed
+
+
+def store_stats(image_root):
+    """
+    (이미지 참조 수, blob 수, blob 전체 크기, 중복 저장했을 때의 크기)
+    """
+    with _store_lock(image_root):
+        refs = _read_refs(image_root)
+    blob_count = blob_bytes = referenced_bytes = 0
+    for blob, count in refs.items():
+        try:
+            size = os.path.getsize(blob_path(image_root, blob))
+        except OSError:
+            continue
+        blob_count += 1
+        blob_bytes += size
+        referenced_bytes += size * count
+    return sum(refs.values()), blob_count, blob_bytes, referenced_bytes
+
+
+# ---------------------------------------------------------------------------
+# 토픽 폴더 매니페스트
+# ---------------------------------------------------------------------------
+
+def _read_manifest_file(topic_folder):
+    """매니페스트 파일의 (버전, 항목 목록). 없거나 읽을 수 없으면 (None, None)."""
+    try:
+        manifest = storage.read_data_file(os.path.join(topic_folder, MANIFEST_FILE_NAME))
+    except (FileNotFoundError, ValueError):
+        return None, None
+    if not isinstance(manifest, dict) or manifest.get("version") not in (1, MANIFEST_VERSION):
+        return None, None
+    return manifest["version"], manifest.get("images", [])
+
+
+def _write_manifest(topic_folder, entries):
+    """매니페스트를 쓰고 이전 매니페스트와 비교해 blob 참조 수를 고칩니다."""
+    with _lock_for(topic_folder):
+        version, previous = _read_manifest_file(topic_folder)
+        # 이전 형식의 매니페스트는 blob을 참조하지 않으므로 참조 수에 없음
+        previous = previous if version == MANIFEST_VERSION else []
+        storage.replace_data_file(os.path.join(topic_folder, MANIFEST_FILE_NAME),
+                                  {"version": MANIFEST_VERSION, "images": entries})
+        # 매니페스트를 쓰면서 폴더 mtime도 바뀌므로 쓴 뒤의 mtime을 기억
+        _cache[topic_folder] = (_folder_mtime(topic_folder), entries)
+        _update_refs(image_root_of(topic_folder), _entry_blobs(entries), _entry_blobs(previous))
+
+
+def _list_image_files(topic_folder):
+    return [
+        file_name for file_name in os.listdir(topic_folder)
+        if is_image_file(file_name) and os.path.isfile(os.path.join(topic_folder, file_name))
+    ]
+
+
+def _absorb_originals(topic_folder, entries):
+    """이전 버전의 .originals 폴더에 있던 원본을 blob으로 옮겨 항목에 붙입니다."""
+    originals_folder = os.path.join(topic_folder, ORIGINALS_FOLDER_NAME)
+    if not os.path.isdir(originals_folder):
+        return False
+    by_stem = {os.path.splitext(entry["file"])[0]: entry for entry in entries}
+    for file_name in os.listdir(originals_folder):
+        entry = by_stem.get(os.path.splitext(file_name)[0])
+        file_path = os.path.join(originals_folder, file_name)
+        if entry is not None and not entry.get("original"):
+            with open(file_path, "rb") as f:
+                entry["original"] = _store_blob(image_root_of(topic_folder), f.read(), file_name)
+        os.remove(file_path)
+    os.rmdir(originals_folder)
+    return True
+
+
+def _reconcile(topic_folder, entries, order=None, absorb=True):
+    """
+    토픽 폴더에 직접 놓인 이미지 파일을 매니페스트에 넣습니다. 잠금을 잡은 상태에서 호출해야 합니다.
+    새 파일은 기존 정렬 규칙대로 뒤에 붙이고, 이미 있는 이름이면 그 자리의 이미지를 바꿉니다.
+    order(파일명 목록)를 주면 그 순서를 우선합니다.
+    absorb면 파일(과 .originals 폴더의 원본)을 blob으로 옮기고, 아니면 파일을 그대로 두고 항목만 만듭니다.
+
+    Returns:
+    --------
+    tuple
+        (항목 목록, 변경 여부)
+    """
+    entries = [dict(entry) for entry in entries or []]
+    by_name = {entry["file"]: entry for entry in entries}
+    loose = set(_list_image_files(topic_folder))
+
+    names = [entry["file"] for entry in entries]
+    if order is not None:
+        ordered = [name for name in order if name in by_name or name in loose]
+        ordered += [name for name in names if name not in ordered]
+    else:
+        ordered = list(names)
+    ordered += sorted(loose - set(ordered), key=lambda name: legacy_sort_key(topic_folder, name))
+
+    result = []
+    for name in ordered:
+        entry = by_name.get(name)
+        if name in loose:
+            try:
+                entry = _absorb_file(topic_folder, name) if absorb else _describe_file(topic_folder, name)
+            except OSError:
+                pass
+        if entry is not None:
+            result.append(entry)
+    originals_absorbed = absorb and _absorb_originals(topic_folder, result)
+    changed = bool(loose) or originals_absorbed or [entry["file"] for entry in result] != names
+    return result, changed
+
+
+def _load_manifest(topic_folder, absorb):
+    """
+    매니페스트 파일과 토픽 폴더에 직접 놓인 이미지 파일로 항목 목록을 만듭니다. 잠금을 잡은 상태에서 호출해야 합니다.
+
+    Returns:
+    --------
+    tuple
+        (항목 목록, 매니페스트 파일과 달라졌는지 여부)
+    """
+    version, entries = _read_manifest_file(topic_folder)
+    if version == MANIFEST_VERSION:
+        return _reconcile(topic_folder, entries, absorb=absorb)
+    # 이전 형식이면 기록된 순서만 사용하고 파일은 모두 직접 놓인 파일로 다룸
+    order = [entry["file"] for entry in entries] if entries else None
+    entries, _ = _reconcile(topic_folder, [], order, absorb=absorb)
+    return entries, True
+
+
+def get_manifest(topic_folder):
+    """
+    토픽 폴더의 매니페스트 항목 목록을 반환합니다. 폴더가 없으면 빈 목록.
+    폴더가 바뀌지 않았으면 메모리의 목록을 사용합니다. 읽기만 하므로 이전 형식이거나 폴더에 이미지 파일이
+    직접 있어도 파일을 옮기지 않고 그 파일을 가리키는 항목(path)을 넣습니다.
+    """
+    mtime = _folder_mtime(topic_folder)
+    if mtime is None:
+        _cache.pop(topic_folder, None)
+        return []
+    cached = _cache.get(topic_folder)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with _lock_for(topic_folder):
+        mtime = _folder_mtime(topic_folder)
+        cached = _cache.get(topic_folder)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        entries, _ = _load_manifest(topic_folder, absorb=False)
+        _cache[topic_folder] = (mtime, entries)
+        return entries
+
+
+def _writable_manifest(topic_folder):
+    """
+    매니페스트를 고치기 전에 읽는 항목 목록. 잠금을 잡은 상태에서 호출해야 합니다.
+    고칠 폴더가 이전 형식이거나 이미지 파일이 직접 있으면 먼저 파일을 blob으로 옮겨 매니페스트를 새로 씁니다.
+    """
+    if not os.path.isdir(topic_folder) or not is_manifest_stale(topic_folder):
+        return get_manifest(topic_folder)
+    entries, _ = _load_manifest(topic_folder, absorb=True)
+    _write_manifest(topic_folder, entries)
+    return entries
+
+
+def list_images(topic_folder):
+    """토픽 폴더의 이미지 경로(토픽 폴더/이름)를 매니페스트 순서대로 반환합니다."""
+    return [os.path.join(topic_folder, entry["file"]) for entry in get_manifest(topic_folder)]
+
+
+def _entry_for(file_path):
+    file_name = os.path.basename(file_path)
+    for entry in get_manifest(os.path.dirname(file_path)):
+        if entry["file"] == file_name:
+            return entry
+    return None
+
+
+def resolve(file_path):
+    """
+    이미지 경로(토픽 폴더/이름)에 해당하는 실제 파일(blob) 경로.
+    blob이나 파생 이미지 경로, 매니페스트에 없는 경로는 그대로 반환합니다.
+    """
+    if is_blob(file_path) or is_derivative(file_path):
+        return file_path
+    entry = _entry_for(file_path)
+    if entry is None:
+        return file_path
+    return _source_path(image_root_of(os.path.dirname(file_path)), entry)
+
+
+def new_image_name(topic_folder, ext, taken=()):
+    """토픽 이름_타임스탬프_순번.확장자 형식의 새 이미지 이름 (토픽 폴더에 없는 이름)"""
+    safe_topic = os.path.basename(topic_folder)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    names = {entry["file"] for entry in get_manifest(topic_folder)} | set(taken)
+    # 같은 토픽과 타임스탬프를 가진 이미지 수로 순번을 정함
+    count = 1 + sum(1 for name in names if safe_topic in name and timestamp in name)
+    while f"{safe_topic}_{timestamp}_{count}{ext}" in names:
+        count += 1
+    return f"{safe_topic}_{timestamp}_{count}{ext}"
+
+
+def add_image(topic_folder, file_name, payload, original=None):
+    """
+    이미지를 blob으로 저장하고 토픽 폴더 매니페스트 끝에 추가합니다.
+    original에 (이름, 바이트)를 주면 재인코딩 전 원본으로 함께 보관합니다.
+
+    Returns:
+    --------
+    str
+        이미지 경로 (토픽 폴더/이름)
+    """
+    os.makedirs(topic_folder, exist_ok=True)
+    image_root = image_root_of(topic_folder)
+    with _lock_for(topic_folder):
+        entry = _store_blob(image_root, payload, file_name)
+        if original is not None:
+            entry["original"] = _store_blob(image_root, original[1], original[0])
+        entries = [existing for existing in _writable_manifest(topic_folder) if existing["file"] != file_name]
+        _write_manifest(topic_folder, entries + [entry])
+    return os.path.join(topic_folder, file_name)
+
+
+def delete_images(file_paths):
+    """
+    이미지를 토픽 폴더 매니페스트에서 뺍니다. 다른 곳에서 쓰지 않는 blob은 지워집니다.
+
+    Returns:
+    --------
+    int
+        지운 이미지 수
+    """
+    by_folder = collections.defaultdict(set)
+    for file_path in file_paths:
+        by_folder[os.path.dirname(file_path)].add(os.path.basename(file_path))
+    deleted = 0
+    for topic_folder, names in by_folder.items():
+        with _lock_for(topic_folder):
+            entries = _writable_manifest(topic_folder)
+            remaining = [entry for entry in entries if entry["file"] not in names]
+            if len(remaining) != len(entries):
+                _write_manifest(topic_folder, remaining)
+                deleted += len(entries) - len(remaining)
+    return deleted
+
+
+def record_renames(topic_folder, renames):
+    """
+    이미지 이름을 바꿉니다(순서 변경 등). 파일은 blob에 있으므로 매니페스트만 고칩니다.
+    renames(이전 경로, 새 경로) 순서를 새 이미지 순서로 사용하고, 목록에 없는 이미지는 뒤에 둡니다.
+    """
+    with _lock_for(topic_folder):
+        entries = _writable_manifest(topic_folder)
+        by_name = {entry["file"]: entry for entry in entries}
+        renamed = []
+        for old_path, new_path in renames:
+            entry = by_name.pop(os.path.basename(old_path), None)
+            if entry is not None:
+                renamed.append({**entry, "file": os.path.basename(new_path)})
+        renamed += [entry for entry in entries if entry["file"] in by_name]
+        _write_manifest(topic_folder, renamed)
+        return renamed
+
+
+def move_images(file_paths, dest_folder):
+    """
+    이미지를 다른 토픽 폴더로 옮깁니다. 새 폴더에서는 새 이름을 붙이며 blob은 그대로 씁니다.
+
+    Returns:
+    --------
+    list
+        옮긴 이미지의 새 경로
+    """
+    os.makedirs(dest_folder, exist_ok=True)
+    with _lock_for(dest_folder):
+        dest_entries = list(_writable_manifest(dest_folder))
+        by_folder = collections.defaultdict(set)
+        for file_path in file_paths:
+            if os.path.dirname(file_path) != dest_folder:
+                by_folder[os.path.dirname(file_path)].add(os.path.basename(file_path))
+
+        moved, sources = [], []
+        for topic_folder, names in by_folder.items():
+            entries = _writable_manifest(topic_folder)
+            for entry in entries:
+                if entry["file"] in names:
+                    ext = os.path.splitext(entry["file"])[1]
+                    file_name = new_image_name(dest_folder, ext, [dest["file"] for dest in dest_entries])
+                    dest_entries.append({**entry, "file": file_name})
+                    moved.append(os.path.join(dest_folder, file_name))
+            sources.append((topic_folder, [entry for entry in entries if entry["file"] not in names]))
+
+        # 새 폴더에 먼저 참조를 더해야 옮기는 도중 blob이 지워지지 않음
+        _write_manifest(dest_folder, dest_entries)
+        for topic_folder, remaining in sources:
+            _write_manifest(topic_folder, remaining)
+    return moved
+
+
+def merge_folders(source_folder, dest_folder):
+    """
+    토픽 폴더의 이미지를 다른 토픽 폴더로 옮기고 원래 폴더를 지웁니다(중복 카드 합치기).
+    대상 폴더에 같은 내용(blob)의 이미지가 이미 있으면 더하지 않습니다.
+
+    Returns:
+    --------
+    tuple
+        (더한 이미지 수, 같은 이미지가 있어 건너뛴 수)
+    """
+    if os.path.abspath(source_folder) == os.path.abspath(dest_folder) or not os.path.isdir(source_folder):
+        return 0, 0
+    os.makedirs(dest_folder, exist_ok=True)
+    with _lock_for(dest_folder):
+        dest_entries = list(_writable_manifest(dest_folder))
+        blobs = {entry["blob"] for entry in dest_entries}
+        source_entries = _writable_manifest(source_folder)
+        added = 0
+        for entry in source_entries:
+            if entry["blob"] in blobs:
+                continue
+            blobs.add(entry["blob"])
+            ext = os.path.splitext(entry["file"])[1]
+            file_name = new_image_name(dest_folder, ext, [dest["file"] for dest in dest_entries])
+            dest_entries.append({**entry, "file": file_name})
+            added += 1
+        skipped = len(source_entries) - added
+        # 새 폴더에 먼저 참조를 더해야 원래 폴더를 지울 때 blob이 지워지지 않음
+        if added:
+            _write_manifest(dest_folder, dest_entries)
+        remove_folder(source_folder)
+    return added, skipped
+
+
+def move_domain_folder(old_folder, new_folder):
+    """
+    도메인 폴더 이름을 바꿉니다. 새 폴더가 이미 있으면 토픽별로 이미지를 합칩니다.
+    """
+    if not os.path.isdir(old_folder):
+        return
+    with _store_lock(os.path.dirname(os.path.abspath(old_folder))):
+        if not os.path.exists(new_folder):
+            os.rename(old_folder, new_folder)
+        else:
+            for topic_name in os.listdir(old_folder):
+                topic_folder = os.path.join(old_folder, topic_name)
+                if os.path.isdir(topic_folder) and not topic_name.startswith("."):
+                    move_images(list_images(topic_folder), os.path.join(new_folder, topic_name))
+            remove_folder(old_folder)
+        forget(old_folder)
+
+
+def remove_folder(folder):
+    """
+    도메인 또는 토픽 폴더를 지웁니다. 안에 든 이미지의 참조를 빼므로 쓰지 않게 된 blob도 지워집니다.
+    """
+    if not os.path.isdir(folder):
+        return
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        if MANIFEST_FILE_NAME in files or any(is_image_file(file_name) for file_name in files):
+            with _lock_for(root):
+                if get_manifest(root):
+                    _write_manifest(root, [])
+    shutil.rmtree(folder)
+    forget(folder)
+    # 아직 blob으로 옮기지 않았던 이미지 파일의 링크도 버림
+    _prune_published()
+
+
+# ---------------------------------------------------------------------------
+# 파생 이미지 (썸네일/표시용)
+# ---------------------------------------------------------------------------
+
+def _derived_candidates(image_root, entry, max_edge):
+    base = os.path.join(image_root, DERIVED_FOLDER_NAME, f"{entry['sha256'][:16]}_{max_edge}")
+    return [base + ".jpg", base + ".png"]
+
+
+def _render_derivative(file_path, max_edge, candidates):
+    with Image.open(file_path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        buffer = io.BytesIO()
+        if has_alpha:
+            img.save(buffer, format="PNG", optimize=True)
+            derived_path = candidates[1]
+        else:
+            img.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True, progressive=True)
+            derived_path = candidates[0]
+    storage.replace_file(derived_path, buffer.getvalue())
+    return derived_path
+
+
+def get_derivative(file_path, size="display", create=True):
+    """
+    size(thumb | display)에 맞게 줄인 이미지의 실제 파일 경로를 반환합니다. 없으면 만들어 둡니다.
+    원본이 이미 충분히 작거나, 애니메이션 GIF의 표시용이거나, 만들 수 없으면 원본 blob 경로를 반환합니다.
+    create가 False면 아직 만들지 않은 파생 이미지는 만들지 않고 None을 반환합니다.
+    """
+    max_edge = DERIVATIVE_SIZES[size]
+    entry = _entry_for(file_path)
+    if entry is None:
+        return file_path
+    image_root = image_root_of(os.path.dirname(file_path))
+    source_path = _source_path(image_root, entry)
+    if entry.get("width") and entry.get("height") and max(entry["width"], entry["height"]) <= max_edge:
+        return source_path
+    if entry["blob"].endswith(".gif") and size != "thumb":
+        return source_path
+
+    candidates = _derived_candidates(image_root, entry, max_edge)
+    for derived_path in candidates:
+        if os.path.exists(derived_path):
+            return derived_path
+    if not create:
+        return None
+    with _render_lock(candidates[0]):
+        for derived_path in candidates:
+            if os.path.exists(derived_path):
+                return derived_path
+        try:
+            return _render_derivative(source_path, max_edge, candidates)
+        except Exception:
+            return source_path
+
+
+def create_derivatives(file_path):
+    """업로드 직후 모든 크기의 파생 이미지를 미리 만듭니다."""
+    for size in DERIVATIVE_SIZES:
+        get_derivative(file_path, size)
+
+
+def is_derivative(file_path):
+    return os.path.basename(os.path.dirname(file_path)) == DERIVED_FOLDER_NAME
+
+
+# ---------------------------------------------------------------------------
+# 인코딩한 이미지 캐시 (이미지 서버를 쓰지 않을 때의 base64)
+# ---------------------------------------------------------------------------
+
+class PayloadCache:
+    """
+    이미지 파일을 base64 data URL로 인코딩한 결과를 담는 LRU 캐시. 프로세스의 모든 세션이 함께 씁니다.
+
+    키는 (실제 파일 경로, mtime_ns, 크기)이므로 파일이 바뀌면 자동으로 새로 인코딩하며,
+    담은 문자열 길이의 합이 max_bytes를 넘으면 가장 오래 쓰지 않은 것부터 버립니다.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_data_url(self, file_path):
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        with open(file_path, "rb") as f:
+            encoded = base64.b64encode(f.read()).decode()
+        mime_type = mimetypes.guess_type(file_path)[0] or "image/png"
+        value = f"data:{mime_type};base64,{encoded}"
+
+        with self._lock:
+            if len(value) <= self.max_bytes and key not in self._items:
+                # 같은 경로의 이전 버전은 더 쓰지 않음
+                for old_key in [old_key for old_key in self._items if old_key[0] == key[0]]:
+                    self.current_bytes -= len(self._items.pop(old_key))
+                self._items[key] = value
+                self.current_bytes += len(value)
+                self._evict()
+        return value
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._items:
+            _, value = self._items.popitem(last=False)
+            self.current_bytes -= len(value)
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def invalidate(self, path):
+        """path 파일 또는 path 폴더 아래 파일의 항목을 버립니다."""
+        path = os.path.abspath(path)
+        prefix = os.path.join(path, "")
+        with self._lock:
+            for key in [key for key in self._items if key[0] == path or key[0].startswith(prefix)]:
+                self.current_bytes -= len(self._items.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "items": len(self._items),
+                    "bytes": self.current_bytes, "max_bytes": self.max_bytes}
+
+
+_payload_cache = None
+
+
+def get_payload_cache(max_bytes=64 * 1024 * 1024):
+    """프로세스에 하나인 PayloadCache. 이미 있으면 크기만 max_bytes로 맞춥니다."""
+    global _payload_cache
+    with _locks_lock:
+        if _payload_cache is None:
+            _payload_cache = PayloadCache(max_bytes)
+        elif _payload_cache.max_bytes != max_bytes:
+            _payload_cache.resize(max_bytes)
+        return _payload_cache
+
+
+def _invalidate_payloads(path):
+    if _payload_cache is not None:
+        _payload_cache.invalidate(path)
+
+
+# ---------------------------------------------------------------------------
+# 미리 읽기 (다음 카드 이미지)
+# ---------------------------------------------------------------------------
+
+PREFETCH_WORKERS = 2
+
+_prefetch_executor = None
+# 작업이 대기 중이거나 진행 중인 토픽 폴더 (같은 폴더를 rerun마다 중복으로 넣지 않음)
+_prefetch_pending = set()
+
+
+def _prefetch_topic(topic_folder, payload_cache):
+    try:
+        for file_path in list_images(topic_folder):
+            display_path = get_derivative(file_path, "display")
+            if payload_cache is not None:
+                payload_cache.get_data_url(display_path)
+    except Exception:
+        # 미리 읽기는 실패해도 화면을 그릴 때 다시 시도하므로 무시
+        pass
+    finally:
+        with _locks_lock:
+            _prefetch_pending.discard(topic_folder)
+
+
+def prefetch(topic_folders, payload_cache=None):
+    """
+    토픽 폴더들의 매니페스트와 표시용 파생 이미지를 백그라운드 스레드에서 미리 준비합니다.
+    payload_cache를 주면 base64 인코딩 결과도 미리 담아 둡니다(이미지 서버를 쓰지 않는 경우).
+    """
+    global _prefetch_executor
+    with _locks_lock:
+        if _prefetch_executor is None:
+            _prefetch_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=PREFETCH_WORKERS, thread_name_prefix="image-prefetch")
+        topic_folders = [folder for folder in dict.fromkeys(topic_folders) if folder not in _prefetch_pending]
+        _prefetch_pending.update(topic_folders)
+    for topic_folder in topic_folders:
+        _prefetch_executor.submit(_prefetch_topic, topic_folder, payload_cache)
+
+
+# ---------------------------------------------------------------------------
+# 업로드 시 재인코딩 (ingest)
+# ---------------------------------------------------------------------------
+
+# original: 받은 그대로 저장, webp/jpeg: 다시 인코딩
+INGEST_FORMATS = ("original", "webp", "jpeg")
+# keep: 원본도 blob으로 보관(되돌리기 가능), discard: 원본 버림
+ORIGINAL_POLICIES = ("keep", "discard")
+
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+
+
+# 다시 인코딩하지 않고 지우는 메타데이터
+# JPEG: APP1(EXIF/XMP), APP3~APP13(IPTC 등), APP15, COM. APP0(JFIF), APP2(ICC 색 프로필), APP14(Adobe 색 변환)는 남김
+_JPEG_METADATA_MARKERS = {0xE1, *range(0xE3, 0xEE), 0xEF, 0xFE}
+_PNG_METADATA_CHUNKS = {b"tEXt", b"zTXt", b"iTXt", b"eXIf", b"tIME"}
+_WEBP_METADATA_CHUNKS = {b"EXIF", b"XMP "}
+
+
+def _strip_jpeg_metadata(raw):
+    if raw[:2] != b"\xff\xd8":
+        return raw
+    parts = [raw[:2]]
+    pos = 2
+    changed = False
+    while pos + 4 <= len(raw):
+        if raw[pos] != 0xFF:
+            return raw
+        marker = raw[pos + 1]
+        if marker == 0xFF:
+            # 채움 바이트
+            pos += 1
+            continue
+        if marker in (0xDA, 0xD9):
+            # 압축된 이미지 데이터(SOS)부터는 그대로
+            parts.append(raw[pos:])
+            return b"".join(parts) if changed else raw
+        length = int.from_bytes(raw[pos + 2:pos + 4], "big")
+        if marker in _JPEG_METADATA_MARKERS:
+            changed = True
+        else:
+            parts.append(raw[pos:pos + 2 + length])
+        pos += 2 + length
+    return raw
+
+
+def _strip_png_metadata(raw):
+    if raw[:8] != b"\x89PNG\r\n\x1a\n":
+        return raw
+    parts = [raw[:8]]
+    pos = 8
+    changed = False
+    while pos + 12 <= len(raw):
+        length = int.from_bytes(raw[pos:pos + 4], "big")
+        chunk_type = raw[pos + 4:pos + 8]
+        end = pos + 12 + length
+        if chunk_type in _PNG_METADATA_CHUNKS:
+            changed = True
+        else:
+            parts.append(raw[pos:end])
+        pos = end
+    return b"".join(parts) if changed and pos == len(raw) else raw
+
+
+def _strip_webp_metadata(raw):
+    if raw[:4] != b"RIFF" or raw[8:12] != b"WEBP":
+        return raw
+    parts = []
+    pos = 12
+    changed = False
+    while pos + 8 <= len(raw):
+        chunk_type = raw[pos:pos + 4]
+        length = int.from_bytes(raw[pos + 4:pos + 8], "little")
+        end = pos + 8 + length + (length & 1)
+        if chunk_type in _WEBP_METADATA_CHUNKS:
+            changed = True
+        elif chunk_type == b"VP8X":
+            # 확장 헤더의 EXIF(0x08)/XMP(0x04) 플래그도 끔
+            parts.append(raw[pos:pos + 8] + bytes([raw[pos + 8] & ~0x0C]) + raw[pos + 9:end])
+        else:
+            parts.append(raw[pos:end])
+        pos = end
+    if not changed or pos != len(raw):
+        return raw
+    body = b"WEBP" + b"".join(parts)
+    return b"RIFF" + len(body).to_bytes(4, "little") + body
+
+
+def strip_metadata(raw):
+    """
+    JPEG/PNG/WebP 이미지에서 메타데이터(EXIF, XMP, 텍스트 등)만 지운 바이트를 반환합니다.
+    다시 인코딩하지 않으므로 화질은 그대로이며, 지울 것이 없거나 알 수 없는 형식이면 raw를 그대로 반환합니다.
+    """
+    for strip in (_strip_jpeg_metadata, _strip_png_metadata, _strip_webp_metadata):
+        stripped = strip(raw)
+        if stripped is not raw:
+            return stripped
+    return raw
+
+
+def transcode_image(raw, file_ext, fmt="webp", max_edge=2560, quality=85):
+    """
+    이미지 바이트를 fmt 형식으로 다시 인코딩합니다. EXIF 방향을 반영하고 메타데이터는 버리며,
+    긴 변이 max_edge보다 크면 줄입니다. JPEG으로는 투명도를 담을 수 없으므로 투명한 이미지는 PNG로 저장합니다.
+    애니메이션 이미지이거나 결과가 원본보다 크면(줄이거나 회전할 필요도 없는 경우) 다시 인코딩하지 않고
+    원본에서 메타데이터만 지워 반환합니다 (지울 것이 없으면 raw 그대로).
+
+    Returns:
+    --------
+    tuple
+        (저장할 바이트, 확장자)
+    """
+    file_ext = file_ext.lower()
+    if fmt == "original":
+        return raw, file_ext
+    if fmt == "webp" and not features.check("webp"):
+        fmt = "jpeg"
+
+    with Image.open(io.BytesIO(raw)) as img:
+        if getattr(img, "is_animated", False):
+            return strip_metadata(raw), file_ext
+        orientation = img.getexif().get(0x0112, 1)
+        too_large = bool(max_edge) and max(img.size) > max_edge
+        img = ImageOps.exif_transpose(img)
+        if too_large:
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        if fmt == "webp":
+            if _has_alpha(img):
+                img.convert("RGBA").save(buffer, format="WEBP", quality=quality, method=6)
+            else:
+                img.convert("RGB").save(buffer, format="WEBP", quality=quality, method=6)
+            new_ext = ".webp"
+        elif _has_alpha(img):
+            img.save(buffer, format="PNG", optimize=True)
+            new_ext = ".png"
+        else:
+            img.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+            new_ext = ".jpg"
+
+    payload = buffer.getvalue()
+    if len(payload) >= len(raw) and not too_large and orientation == 1:
+        # 방향이 1이므로 EXIF를 지워도 보이는 모양은 같음
+        stripped = strip_metadata(raw)
+        if len(payload) >= len(stripped):
+            return stripped, file_ext
+    return payload, new_ext
+
+
+def restore_topic_folder(topic_folder):
+    """
+    토픽 폴더에서 원본을 보관해 둔 이미지를 모두 원본으로 되돌립니다 (순서 유지).
+    다시 인코딩한 blob은 다른 곳에서 참조하지 않으면 지워집니다.
+
+    Returns:
+    --------
+    tuple
+        (토픽 폴더, 되돌린 이미지 수)
+    """
+    with _lock_for(topic_folder):
+        entries = list(_writable_manifest(topic_folder))
+        restored = 0
+        for i, entry in enumerate(entries):
+            if entry.get("original"):
+                entries[i] = dict(entry["original"])
+                restored += 1
+        if restored:
+            _write_manifest(topic_folder, entries)
+    return topic_folder, restored
+
+
+def recompress_topic_folder(topic_folder, fmt="webp", max_edge=2560, quality=85, original_policy="keep"):
+    """
+    토픽 폴더의 이미지를 모두 다시 인코딩하고 순서를 유지한 채 매니페스트를 갱신합니다.
+    인코딩은 잠금 밖에서 하고 매니페스트를 고칠 때만 잠금을 잡습니다.
+
+    Returns:
+    --------
+    tuple
+        (토픽 폴더, 바뀐 이미지 수, 이전 전체 크기, 새 전체 크기)
+    """
+    image_root = image_root_of(topic_folder)
+    results = {}
+    for entry in get_manifest(topic_folder):
+        try:
+            with open(_source_path(image_root, entry), "rb") as f:
+                raw = f.read()
+            payload, new_ext = transcode_image(raw, os.path.splitext(entry["file"])[1], fmt, max_edge, quality)
+        except Exception:
+            # 읽을 수 없는 이미지는 그대로 둠
+            continue
+        if payload is not raw:
+            results[entry["blob"]] = (payload, new_ext)
+
+    changed_count = before_total = after_total = 0
+    with _lock_for(topic_folder):
+        entries = []
+        for entry in _writable_manifest(topic_folder):
+            before_total += entry["size"]
+            if entry["blob"] not in results:
+                entries.append(entry)
+                after_total += entry["size"]
+                continue
+            payload, new_ext = results[entry["blob"]]
+            new_entry = _store_blob(image_root, payload, os.path.splitext(entry["file"])[0] + new_ext)
+            if entry.get("original"):
+                new_entry["original"] = entry["original"]
+            elif original_policy == "keep":
+                new_entry["original"] = entry
+            entries.append(new_entry)
+            after_total += new_entry["size"]
+            changed_count += 1
+        if changed_count:
+            _write_manifest(topic_folder, entries)
+    return topic_folder, changed_count, before_total, after_total
+
+
+def recompress_images(image_roots, fmt="webp", max_edge=2560, quality=85, original_policy="keep", workers=None):
+    """
+    여러 사용자의 images 폴더를 토픽 폴더 단위로 나누어 프로세스 풀에서 다시 인코딩합니다.
+
+    Returns:
+    --------
+    list of tuple
+        토픽 폴더마다 (토픽 폴더, 바뀐 이미지 수, 이전 전체 크기, 새 전체 크기)
+    """
+    topic_folders = [topic_folder for image_root in image_roots for topic_folder in iter_topic_folders(image_root)]
+    if not topic_folders:
+        return []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(recompress_topic_folder, topic_folder, fmt, max_edge, quality, original_policy)
+            for topic_folder in topic_folders
+        ]
+        return [future.result() for future in futures]
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def describe_size_change(before, after):
+    """저장 공간 변화를 "1.2MB 절약" / "300KB 증가" 형태로 나타냅니다."""
+    if after > before:
+        return f"{format_bytes(after - before)} 증가"
+    return f"{format_bytes(before - after)} 절약"
+
+
+def forget(folder):
+    """폴더(또는 그 하위 폴더)를 통째로 지우거나 옮긴 뒤 메모리 캐시를 비웁니다."""
+    prefix = os.path.join(folder, "")
+    for path in list(_cache):
+        if path == folder or path.startswith(prefix):
+            _cache.pop(path, None)
+    _invalidate_payloads(folder)
+
+
+def is_manifest_stale(topic_folder):
+    version, _ = _read_manifest_file(topic_folder)
+    return (version != MANIFEST_VERSION or bool(_list_image_files(topic_folder))
+            or os.path.isdir(os.path.join(topic_folder, ORIGINALS_FOLDER_NAME)))
+
+
+def iter_topic_folders(image_root):
+    """images/<도메인>/<토픽> 폴더를 모두 나열합니다 (.blobs, .derived 등 점으로 시작하는 폴더 제외)."""
+    if not os.path.isdir(image_root):
+        return
+    for domain_name in sorted(os.listdir(image_root)):
+        domain_folder = os.path.join(image_root, domain_name)
+        if domain_name.startswith(".") or not os.path.isdir(domain_folder):
+            continue
+        for topic_name in sorted(os.listdir(domain_folder)):
+            topic_folder = os.path.join(domain_folder, topic_name)
+            if not topic_name.startswith(".") and os.path.isdir(topic_folder):
+                yield topic_folder
+
+
+def rebuild_manifests(image_root, force=False):
+    """
+    이전 형식이거나 이미지 파일이 직접 들어 있는 토픽 폴더의 매니페스트를 다시 만들고 참조 수를 다시 셉니다.
+    force면 모든 폴더의 이미지 정보를 blob 내용으로 새로 구하고 blob이 없는 항목은 뺍니다(순서는 유지).
+
+    Returns:
+    --------
+    tuple
+        (검사한 폴더 수, 다시 만든 폴더 수, 지운 blob 수)
+    """
+    checked = rebuilt = 0
+    for topic_folder in iter_topic_folders(image_root):
+        checked += 1
+        if not force and not is_manifest_stale(topic_folder):
+            continue
+        with _store_lock(image_root):
+            forget(topic_folder)
+            entries = _writable_manifest(topic_folder)
+            if force:
+                refreshed = []
+                for entry in entries:
+                    try:
+                        with open(blob_path(image_root, entry["blob"]), "rb") as f:
+                            refreshed.append({**entry, **describe_image(f.read(), entry["file"]), "blob": entry["blob"]})
+                    except OSError:
+                        continue
+                _write_manifest(topic_folder, refreshed)
+        rebuilt += 1
+    freed = rebuild_refs(image_root)
+    return checked, rebuilt, freed
+
+
+# ---------------------------------------------------------------------------
+# 이미지 서버
+# ---------------------------------------------------------------------------
+
+def load_or_create_secret(path):
+    """이미지 URL 서명 키. 재시작해도 URL이 바뀌지 않도록 파일에 보관합니다."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    secret = secrets.token_hex(32)
+    storage.replace_file(path, secret.encode("utf-8"))
+    return secret
+
+
+def image_etag(file_path):
+    """blob이면 이름의 SHA-256을 사용하고, 아니면(파생 이미지 등) mtime/크기로 만듭니다."""
+    file_path = resolve(file_path)
+    if is_blob(file_path):
+        return os.path.basename(file_path)[:32]
+    stat = os.stat(file_path)
+    return "%x-%x" % (stat.st_mtime_ns, stat.st_size)
+
+
+class _ImageRequestHandler(http.server.BaseHTTPRequestHandler):
+    """/img/<아이디>/<도메인>/<토픽>/<파일>?v=<버전>&t=<사용자 토큰> 형식의 요청만 처리합니다."""
+
+    server_version = "FlashcardImages/1.0"
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def log_message(self, format, *args):
+        # 이미지 요청마다 콘솔에 찍히지 않도록 함
+        pass
+
+    def _serve(self, send_body):
+        image_server = self.server.image_server
+        url = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(part) for part in url.path.split("/") if part]
+        if len(parts) < 3 or parts[0] != "img":
+            self.send_error(404)
+            return
+
+        username, relative_parts = parts[1], parts[2:]
+        token = urllib.parse.parse_qs(url.query).get("t", [""])[0]
+        # 사용자별 토큰이 맞아야 해당 사용자의 이미지에 접근 가능
+        if not hmac.compare_digest(token, image_server.user_token(username)):
+            self.send_error(403)
+            return
+
+        image_root = os.path.realpath(image_server.get_image_root(username))
+        file_path = os.path.realpath(os.path.join(image_root, *relative_parts))
+        if file_path.startswith(image_root + os.sep):
+            # 토픽 폴더/이름 형식의 URL도 해당 blob으로 연결
+            file_path = resolve(file_path)
+        if (not file_path.startswith(image_root + os.sep) or not is_image_file(file_path)
+                or not os.path.isfile(file_path)):
+            self.send_error(404)
+            return
+
+        try:
+            etag = f'"{image_etag(file_path)}"'
+            headers = {
+                "ETag": etag,
+                # URL에 내용 해시(v)가 들어 있으므로 내용이 바뀌면 URL도 바뀜
+                "Cache-Control": f"private, max-age={image_server.max_age}, immutable",
+            }
+            if etag in [value.strip() for value in self.headers.get("If-None-Match", "").split(",")]:
+                self.send_response(304)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+
+            with open(file_path, "rb") as f:
+                body = f.read()
+        except OSError:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", mimetypes.guess_type(file_path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+
+class _ImageHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class ImageServer:
+    """
+    사용자 이미지 폴더를 내려보내는 정적 파일 서버.
+
+    URL에는 사용자별 서명 토큰(t)과 이미지 내용 해시(v)가 들어 있어 같은 이미지는 항상 같은 URL이 되며,
+    다른 사용자의 토큰으로는 접근할 수 없습니다. 응답에는 ETag와 긴 Cache-Control을 붙입니다.
+    """
+
+    def __init__(self, users_folder, secret, host="127.0.0.1", port=8502, base_url=None, max_age=31536000):
+        self.users_folder = users_folder
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.base_url = (base_url or f"http://localhost:{port}").rstrip("/")
+        self.max_age = max_age
+        self._httpd = None
+
+    def get_image_root(self, username):
+        return os.path.join(self.users_folder, username, "images")
+
+    def user_token(self, username):
+        return hmac.new(self.secret.encode("utf-8"), username.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+    def start(self):
+        self._httpd = _ImageHTTPServer((self.host, self.port), _ImageRequestHandler)
+        self._httpd.image_server = self
+        threading.Thread(target=self._httpd.serve_forever, name="image-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def url_for(self, username, file_path):
+        """이미지 경로(토픽 폴더/이름, blob, 파생 이미지)에 대한 URL. 사용자 이미지 폴더 밖의 파일이면 None."""
+        file_path = resolve(file_path)
+        image_root = os.path.realpath(self.get_image_root(username))
+        real_path = os.path.realpath(file_path)
+        if not real_path.startswith(image_root + os.sep):
+            return None
+        relative = os.path.relpath(real_path, image_root).split(os.sep)
+        path = "/".join(urllib.parse.quote(part) for part in ["img", username] + relative)
+        query = urllib.parse.urlencode({"v": image_etag(file_path)[:12], "t": self.user_token(username)})
+        return f"{self.base_url}/{path}?{query}"
+
+
+class StaticImagePublisher:
+    """
+    Streamlit 정적 파일 서빙(server.enableStaticServing)으로 이미지를 내려보냅니다.
+
+    이미지 파일을 앱의 static 폴더에 하드 링크로 걸고(복사하지 않음) <url_prefix>/<링크 이름> URL을 만들므로
+    Streamlit 포트만 열려 있으면 따로 포트나 주소를 설정하지 않아도 됩니다.
+    링크 이름은 (아이디, 경로, inode, mtime)을 서명 키로 서명한 값이라 URL을 받은 사용자만 접근할 수 있고,
+    내용이 바뀌면 이름도 바뀝니다. 원본 파일이 지워져 링크만 남으면 prune으로 지웁니다.
+    ImageServer와 같은 url_for를 제공합니다.
+    """
+
+    def __init__(self, users_folder, secret, link_folder, url_prefix):
+        self.users_folder = users_folder
+        self.secret = secret
+        self.link_folder = link_folder
+        self.url_prefix = url_prefix.rstrip("/")
+        # (실제 경로, inode, mtime_ns) -> URL
+        self._urls = {}
+        self._lock = threading.Lock()
+
+    def get_image_root(self, username):
+        return os.path.join(self.users_folder, username, "images")
+
+    def url_for(self, username, file_path):
+        """이미지 경로(토픽 폴더/이름, blob, 파생 이미지)에 대한 URL. 사용자 이미지 폴더 밖이거나 링크를 걸 수 없으면 None."""
+        file_path = resolve(file_path)
+        image_root = os.path.realpath(self.get_image_root(username))
+        real_path = os.path.realpath(file_path)
+        if not real_path.startswith(image_root + os.sep) or not is_image_file(real_path):
+            return None
+        try:
+            stat = os.stat(real_path)
+        except OSError:
+            return None
+        key = (real_path, stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            url = self._urls.get(key)
+        if url is not None:
+            return url
+
+        message = "\0".join([username, os.path.relpath(real_path, image_root), str(stat.st_ino), str(stat.st_mtime_ns)])
+        name = hmac.new(self.secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+        link_name = name + os.path.splitext(real_path)[1].lower()
+        try:
+            os.makedirs(self.link_folder, exist_ok=True)
+            os.link(real_path, os.path.join(self.link_folder, link_name))
+        except FileExistsError:
+            pass
+        except OSError:
+            # 하드 링크를 지원하지 않는 파일 시스템 등 (호출하는 쪽은 base64로 표시)
+            return None
+        # v가 있으면 Streamlit(tornado)이 오래 캐시하도록 응답함
+        url = f"{self.url_prefix}/{urllib.parse.quote(link_name)}?v={name[:12]}"
+        with self._lock:
+            self._urls[key] = url
+        return url
+
+    def prune(self):
+        """원본 파일이 지워지거나 바뀌어 링크만 남은 파일을 지웁니다."""
+        if not os.path.isdir(self.link_folder):
+            return 0
+        removed = 0
+        for link_name in os.listdir(self.link_folder):
+            link_path = os.path.join(self.link_folder, link_name)
+            try:
+                if os.stat(link_path).st_nlink <= 1:
+                    os.remove(link_path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            with self._lock:
+                self._urls.clear()
+        return removed
+
+
+# (users 폴더, 포트) -> ImageServer (시작에 실패했으면 None)
+_servers = {}
+_servers_lock = threading.Lock()
+# 링크 폴더 -> StaticImagePublisher
+_publishers = {}
+
+
+def get_image_server(users_folder, secret_file, host="127.0.0.1", port=8502, base_url=None):
+    """
+    프로세스마다 한 번만 이미지 서버를 띄워 반환합니다.
+    포트를 열 수 없으면 None을 반환하므로 호출하는 쪽은 기존 방식(base64)으로 표시하면 됩니다.
+    """
+    key = (os.path.abspath(users_folder), port)
+    with _servers_lock:
+        if key not in _servers:
+            try:
+                secret = load_or_create_secret(secret_file)
+                _servers[key] = ImageServer(users_folder, secret, host, port, base_url).start()
+            except OSError:
+                _servers[key] = None
+        return _servers[key]
+
+
+def get_static_publisher(users_folder, secret_file, link_folder, url_prefix):
+    """프로세스마다 링크 폴더당 하나인 StaticImagePublisher. 처음 만들 때 남은 링크를 정리합니다."""
+    key = os.path.abspath(link_folder)
+    with _servers_lock:
+        if key not in _publishers:
+            publisher = StaticImagePublisher(users_folder, load_or_create_secret(secret_file), link_folder, url_prefix)
+            publisher.prune()
+            _publishers[key] = publisher
+        return _publishers[key]
+
+
+def _prune_published():
+    """이미지 파일을 지운 뒤 정적 파일 링크도 정리합니다."""
+    with _servers_lock:
+        publishers = list(_publishers.values())
+    for publisher in publishers:
+        publisher.prune()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="플래시카드 이미지 관리 도구")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="토픽 폴더의 이미지 매니페스트와 blob 참조 수를 다시 만듭니다")
+    rebuild_parser.add_argument("usernames", nargs="*", help="대상 사용자 (생략하면 전체 사용자)")
+    rebuild_parser.add_argument("--users-folder", default=os.path.join("flashcard_data", "users"))
+    rebuild_parser.add_argument("--force", action="store_true", help="최신인 매니페스트도 다시 만듭니다")
+
+    recompress_parser = subparsers.add_parser("recompress", help="저장된 이미지를 다시 인코딩해 용량을 줄입니다")
+    recompress_parser.add_argument("usernames", nargs="*", help="대상 사용자 (생략하면 전체 사용자)")
+    recompress_parser.add_argument("--users-folder", default=os.path.join("flashcard_data", "users"))
+    recompress_parser.add_argument("--format", default="webp", choices=[fmt for fmt in INGEST_FORMATS if fmt != "original"])
+    recompress_parser.add_argument("--max-edge", type=int, default=2560, help="긴 변 최대 길이(px), 0이면 제한 없음")
+    recompress_parser.add_argument("--quality", type=int, default=85)
+    recompress_parser.add_argument("--originals", default="keep", choices=ORIGINAL_POLICIES,
+                                   help="재인코딩 전 원본을 보관할지 여부")
+    recompress_parser.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 수)")
+
+    restore_parser = subparsers.add_parser("restore", help="다시 인코딩한 이미지를 보관해 둔 원본으로 되돌립니다")
+    restore_parser.add_argument("usernames", nargs="*", help="대상 사용자 (생략하면 전체 사용자)")
+    restore_parser.add_argument("--users-folder", default=os.path.join("flashcard_data", "users"))
+
+    args = parser.parse_args(argv)
+
+    if args.command == "recompress":
+        usernames = args.usernames or storage.list_usernames(args.users_folder)
+        image_roots = [os.path.join(args.users_folder, username, "images") for username in usernames]
+        # 원본을 보관하면 이미지 크기가 줄어도 저장 공간은 늘어나므로 blob 전체 크기로 실제 변화를 알림
+        stored_before = sum(store_stats(image_root)[2] for image_root in image_roots)
+        results = recompress_images(image_roots, args.format, args.max_edge, args.quality, args.originals, args.workers)
+        stored_after = sum(store_stats(image_root)[2] for image_root in image_roots)
+        changed = sum(result[1] for result in results)
+        before = sum(result[2] for result in results)
+        after = sum(result[3] for result in results)
+        print(f"토픽 폴더 {len(results)}개, 이미지 {changed}개를 다시 인코딩했습니다: "
+              f"이미지 {format_bytes(before)} -> {format_bytes(after)}")
+        print(f"저장 공간: {format_bytes(stored_before)} -> {format_bytes(stored_after)} "
+              f"({describe_size_change(stored_before, stored_after)})")
+        if args.originals == "keep" and changed:
+            print("원본을 보관했으므로 'python image_store.py restore'로 되돌릴 수 있습니다.")
+
+    if args.command == "restore":
+        usernames = args.usernames or storage.list_usernames(args.users_folder)
+        for username in usernames:
+            image_root = os.path.join(args.users_folder, username, "images")
+            stored_before = store_stats(image_root)[2]
+            restored = sum(restore_topic_folder(topic_folder)[1] for topic_folder in iter_topic_folders(image_root))
+            stored_after = store_stats(image_root)[2]
+            print(f"{username}: 이미지 {restored}개를 원본으로 되돌렸습니다. 저장 공간: {format_bytes(stored_before)} -> "
+                  f"{format_bytes(stored_after)} ({describe_size_change(stored_before, stored_after)})")
+
+    if args.command == "rebuild":
+        usernames = args.usernames or storage.list_usernames(args.users_folder)
+        for username in usernames:
+            image_root = os.path.join(args.users_folder, username, "images")
+            checked, rebuilt, freed = rebuild_manifests(image_root, force=args.force)
+            references, blob_count, blob_bytes, referenced_bytes = store_stats(image_root)
+            print(f"{username}: 토픽 폴더 {checked}개 중 {rebuilt}개의 매니페스트를 다시 만들었습니다. "
+                  f"쓰지 않는 blob {freed}개를 지웠습니다.")
+            print(f"{username}: 이미지 {references}개, blob {blob_count}개 "
+                  f"({format_bytes(blob_bytes)}, 중복 제거로 {format_bytes(referenced_bytes - blob_bytes)} 절약)")
+
+
+if __name__ == "__main__":
+    main()
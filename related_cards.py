@@ -0,0 +1,240 @@
+"""
+관련 카드 찾기
+
+카드마다 정의/개념, 핵심키워드, 내용을 단어와 글자 2-gram으로 나누고, 각 특징을 해시해
+FEATURE_COUNT 차원의 희소 벡터(특징 번호 배열, float32 가중치 배열)로 만듭니다.
+해시를 쓰므로 어휘가 따로 없고, 카드가 바뀌면 그 카드의 행만 다시 만들고 문서 빈도만 고치면 됩니다.
+
+관련 카드를 구할 때는 모든 행을 CSR 행렬로 이어 붙여 TF-IDF 가중치를 곱하고 행마다 정규화한 뒤,
+찾을 카드마다 그 벡터의 특징이 나오는 카드(열 방향 구간)만 모아 곱해 코사인 유사도를 구합니다.
+아주 많은 카드에 나오는 흔한 특징은 유사도에 거의 기여하지 않으면서 훑을 카드만 늘리므로 빼고 계산합니다.
+
+색인은 검색 색인(search_index)과 같은 방식으로 덱 옆(data/related_index.npz)에 저장하고,
+덱 버전이 바뀌면 체크섬이 달라진 카드만 다시 계산합니다.
+"""
+import math
+import zlib
+import array
+import functools
+
+import numpy as np
+
+import search_index
+
+INDEX_FILE_NAME = "related_index.npz"
+INDEX_FORMAT = 1
+# 특징 해시 공간 크기 (2^18)
+FEATURE_BITS = 18
+FEATURE_COUNT = 1 << FEATURE_BITS
+# 필드별 가중치 (정의/개념과 핵심키워드는 짧지만 카드의 주제를 잘 나타냄)
+FIELD_WEIGHTS = {"term": 2.0, "keyword": 2.0, "content": 1.0}
+# 관련 카드를 구할 때 쓰는 카드당 특징 수 (가중치가 큰 순)
+QUERY_FEATURE_LIMIT = 48
+# 관련 카드를 구할 때 빼는 흔한 특징: 전체 카드의 이 비율(적어도 FEATURE_DF_MIN장)보다 많은 카드에 나오는 특징
+FEATURE_DF_RATIO = 0.05
+FEATURE_DF_MIN = 200
+# 흔한 특징을 빼고 남는 특징이 이보다 적으면 덜 흔한 특징부터 채움
+QUERY_FEATURE_MIN = 4
+# 구해 둔 관련 카드 결과를 보관할 카드 수
+RESULT_CACHE_SIZE = 512
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def token_features(token):
+    """토큰의 특징 번호 (단어 자체와, 세 글자 이상이면 글자 2-gram)"""
+    features = ["w" + token]
+    if len(token) > 2:
+        features.extend("g" + token[i:i + 2] for i in range(len(token) - 1))
+    return tuple(zlib.crc32(feature.encode("utf-8")) & (FEATURE_COUNT - 1) for feature in features)
+
+
+def card_features(fields):
+    """
+    카드 필드에서 특징 벡터를 만듭니다.
+
+    Returns:
+    --------
+    tuple
+        (특징 번호 배열 array('I'), 가중치 배열 array('f')) - 특징 번호 오름차순
+    """
+    weights = {}
+    for field, field_weight in FIELD_WEIGHTS.items():
+        counts = {}
+        for token in search_index.tokenize(fields[field]):
+            for feature_id in token_features(token):
+                counts[feature_id] = counts.get(feature_id, 0) + 1
+        for feature_id, count in counts.items():
+            # 같은 말이 여러 번 나와도 가중치가 너무 커지지 않도록 로그를 씌움
+            weights[feature_id] = weights.get(feature_id, 0.0) + field_weight * (1.0 + math.log(count))
+    feature_ids = sorted(weights)
+    return array.array("I", feature_ids), array.array("f", [weights[i] for i in feature_ids])
+
+
+class RelatedIndex(search_index.CardIndex):
+    """한 사용자의 관련 카드 색인."""
+
+    index_format = INDEX_FORMAT
+
+    def _reset(self):
+        super()._reset()
+        # 카드 번호 -> (특징 번호 배열, 가중치 배열)
+        self.rows = []
+        # 특징 번호 -> 그 특징이 나오는 (지워지지 않은) 카드 수
+        self.df = np.zeros(FEATURE_COUNT, dtype=np.int32)
+        self._invalidate()
+
+    def _invalidate(self):
+        # 정규화한 행렬 (_build_matrix 참고)과 관련 카드 결과 캐시
+        self._matrix = None
+        self._results = {}
+
+    # 색인 갱신
+    def _add_docs(self, doc_ids, items):
+        for _, fields in items:
+            feature_ids, weights = card_features(fields)
+            self.rows.append((feature_ids, weights))
+            self.df[np.frombuffer(feature_ids, dtype=np.uint32)] += 1
+        self._invalidate()
+
+    def _remove_doc(self, doc_id):
+        self.df[np.frombuffer(self.rows[doc_id][0], dtype=np.uint32)] -= 1
+        self.rows[doc_id] = (array.array("I"), array.array("f"))
+        self._invalidate()
+
+    def _rekey_doc(self, doc_id, key):
+        self._invalidate()
+
+    def _compact_docs(self, live):
+        self.rows = [self.rows[i] for i in live.tolist()]
+        self._invalidate()
+
+    # 관련 카드
+    def _build_matrix(self):
+        """
+        행마다 TF-IDF 가중치를 곱하고 길이를 1로 맞춘 행렬.
+        질의 벡터를 꺼낼 행 방향(CSR)과 특징별로 카드를 모은 열 방향(CSC)을 함께 만듭니다.
+
+        Returns:
+        --------
+        tuple
+            (행 시작 위치, 특징 번호, 가중치, 열 시작 위치, 열 방향 카드 번호, 열 방향 가중치)
+        """
+        if self._matrix is None:
+            lengths = np.fromiter((len(feature_ids) for feature_ids, _ in self.rows), dtype=np.int64, count=len(self.rows))
+            rows = np.repeat(np.arange(len(self.rows), dtype=np.uint32), lengths)
+            feature_ids = np.frombuffer(b"".join(row[0].tobytes() for row in self.rows), dtype=np.uint32)
+            weights = np.frombuffer(b"".join(row[1].tobytes() for row in self.rows), dtype=np.float32)
+            idf = (np.log((1.0 + len(self.doc_ids)) / (1.0 + self.df)) + 1.0).astype(np.float32)
+            weights = weights * idf[feature_ids]
+            norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(self.rows))).astype(np.float32)
+            weights /= np.maximum(norms, 1e-12)[rows]
+            offsets = np.concatenate(([0], np.cumsum(lengths)))
+            order = np.argsort(feature_ids, kind="stable")
+            column_offsets = np.concatenate(([0], np.cumsum(np.bincount(feature_ids, minlength=FEATURE_COUNT))))
+            self._matrix = (offsets, feature_ids, weights, column_offsets, rows[order], weights[order])
+        return self._matrix
+
+    def _query_features(self, doc_id, df_limit):
+        """
+        관련 카드를 구할 때 쓸 카드의 특징 (특징 번호 배열, 정규화한 가중치 배열).
+        df_limit장보다 많은 카드에 나오는 흔한 특징은 빼되(idf가 낮아 유사도에 거의 기여하지 않으면서
+        훑을 카드만 늘림), 남는 특징이 QUERY_FEATURE_MIN개보다 적으면 덜 흔한 것부터 채우고,
+        그중 가중치가 큰 QUERY_FEATURE_LIMIT개만 씁니다.
+        """
+        offsets, feature_ids, weights, column_offsets, _, _ = self._build_matrix()
+        features = feature_ids[offsets[doc_id]:offsets[doc_id + 1]]
+        values = weights[offsets[doc_id]:offsets[doc_id + 1]]
+        df = column_offsets[features + 1] - column_offsets[features]
+        keep = df <= df_limit
+        if keep.sum() < QUERY_FEATURE_MIN:
+            keep[np.argsort(df, kind="stable")[:QUERY_FEATURE_MIN]] = True
+        features, values = features[keep], values[keep]
+        if len(features) > QUERY_FEATURE_LIMIT:
+            top = np.argpartition(-values, QUERY_FEATURE_LIMIT - 1)[:QUERY_FEATURE_LIMIT]
+            features, values = features[top], values[top]
+        return features, values
+
+    def related(self, keys, k=5):
+        """
+        카드마다 내용이 비슷한 카드를 유사도 순으로 k장씩 구합니다.
+        카드마다 그 카드의 특징이 나오는 카드만 모아 점수를 더하므로, 계산량과 메모리는
+        전체 카드 수가 아니라 그 특징들의 출현 카드 수에 비례합니다.
+
+        Parameters:
+        -----------
+        keys : list
+            (도메인, 토픽, 정의/개념) 목록
+        k : int
+            카드마다 구할 관련 카드 수
+
+        Returns:
+        --------
+        dict
+            키 -> [((도메인, 토픽, 정의/개념), 유사도)] (색인에 없는 키는 빈 목록)
+        """
+        results = {}
+        pending = []
+        for key in dict.fromkeys(keys):
+            cached = self._results.get(key)
+            if cached is not None and cached[0] >= k:
+                results[key] = cached[1][:k]
+            elif key in self.doc_ids:
+                pending.append(key)
+            else:
+                results[key] = []
+        if not pending:
+            return results
+
+        _, _, _, column_offsets, column_rows, column_weights = self._build_matrix()
+        df_limit = max(int(FEATURE_DF_RATIO * len(self.doc_ids)), FEATURE_DF_MIN)
+        for key in pending:
+            doc_id = self.doc_ids[key]
+            features, values = self._query_features(doc_id, df_limit)
+            # 질의 특징마다 그 특징이 나오는 카드(열 방향 구간)를 모아 곱하고, 나온 카드별로만 더함
+            starts = column_offsets[features]
+            counts = column_offsets[features + 1] - starts
+            positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+            rows, inverse = np.unique(column_rows[positions], return_inverse=True)
+            scores = np.bincount(inverse, weights=column_weights[positions] * np.repeat(values, counts),
+                                 minlength=len(rows))
+            scores[rows == doc_id] = 0
+            top = np.flatnonzero(scores > 0)
+            if len(top) > k:
+                top = top[np.argpartition(-scores[top], k - 1)[:k]]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            hits = list(zip(map(self.keys.__getitem__, rows[top].tolist()), scores[top].tolist()))
+            if len(self._results) >= RESULT_CACHE_SIZE:
+                self._results.pop(next(iter(self._results)))
+            self._results[key] = (k, hits)
+            results[key] = hits
+        return results
+
+    # 저장/읽기
+    def _arrays(self):
+        lengths = [len(feature_ids) for feature_ids, _ in self.rows]
+        return {
+            "offsets": np.cumsum([0] + lengths, dtype=np.uint64),
+            "feature_ids": np.frombuffer(b"".join(row[0].tobytes() for row in self.rows), dtype=np.uint32),
+            "weights": np.frombuffer(b"".join(row[1].tobytes() for row in self.rows), dtype=np.float32),
+        }
+
+    def _load_arrays(self, arrays):
+        offsets = arrays["offsets"]
+        feature_ids = arrays["feature_ids"]
+        weights = arrays["weights"]
+        self.rows = [(array.array("I", feature_ids[offsets[i]:offsets[i + 1]].tobytes()),
+                      array.array("f", weights[offsets[i]:offsets[i + 1]].tobytes()))
+                     for i in range(len(self.keys))]
+        self.df = np.bincount(feature_ids, minlength=FEATURE_COUNT).astype(np.int32)
+
+
+def get_user_index(deck_storage, username):
+    """사용자의 관련 카드 색인을 덱의 현재 내용에 맞춰 반환합니다."""
+    return search_index.get_synced_index(deck_storage, username, INDEX_FILE_NAME, RelatedIndex)
+
+
+def related(deck_storage, username, keys, k=5):
+    """카드마다 내용이 비슷한 카드를 구합니다. (RelatedIndex.related 참고)"""
+    index = get_user_index(deck_storage, username)
+    with index.lock:
+        return index.related(keys, k)
@@ -0,0 +1,827 @@
+"""
+플래시카드 검색 색인
+
+사용자 덱의 모든 카드(토픽, 정의/개념, 핵심키워드, 두음, 내용)에 대한 역색인입니다.
+필드마다 토큰 -> (카드 번호 배열, 출현 횟수 배열)을 두고, 검색할 때는 질의 토큰이 나오는
+카드의 점수를 numpy로 한 번에 더하므로 카드 수가 많아도 전체 카드를 훑지 않습니다.
+
+앱에서 카드를 저장/이동/삭제하면 같은 연산을 색인에도 바로 반영하므로(apply_op) 덱을 다시 읽지 않습니다.
+다른 프로세스가 덱을 바꾼 경우처럼 색인이 놓친 변경이 있으면, 카드마다 기억해 둔 필드 내용의 체크섬으로
+바뀐 카드만 다시 색인합니다.
+카드를 고치거나 지우면 예전 항목은 지워진 것으로 표시만 하고(tombstone), 지워진 항목이 많아지면
+색인을 새 번호로 다시 짭니다. 색인은 덱 옆(data/search_index.npz)에 저장해 두고 프로세스가
+새로 뜰 때 읽으며, 읽은 뒤에는 체크섬으로 덱과 한 번 맞춥니다.
+
+토픽, 정의/개념, 핵심키워드, 두음은 짧고 조사가 붙은 한글이 많아 단어 단위로는 찾기 어려우므로
+글자 2-gram/3-gram과 초성(예: "옵저버 패턴" -> "ㅇㅈㅂㅍㅌ")의 3-gram도 따로 색인합니다.
+"저버"처럼 단어 중간의 음절이나 "ㅇㅍㅌ" 같은 초성 검색도 이 색인만 찾아보고 답합니다.
+
+점수는 필드별 BM25에 필드 가중치(정의/개념 > 핵심키워드 > 두음 > 토픽 > 내용)를 곱해 더합니다.
+영문 약어는 오타를 한 글자까지 허용하며(OWSAP -> OWASP), 이를 위해 영문 토큰마다 한 글자를
+뺀 형태를 미리 모아 둔 표(symmetric delete)를 두어 질의마다 어휘 전체를 비교하지 않습니다.
+
+스트림릿은 app.py를 rerun마다 다시 실행하므로 색인은 이 모듈에 프로세스 단위로 둡니다.
+"""
+import io
+import os
+import re
+import html
+import json
+import math
+import zlib
+import array
+import atexit
+import bisect
+import threading
+
+import numpy as np
+
+import storage
+
+INDEX_FILE_NAME = "search_index.npz"
+# 저장 형식이 바뀌면 올림 (다른 형식의 파일은 버리고 새로 색인)
+INDEX_FORMAT = 2
+FIELDS = ("topic", "term", "keyword", "rhyming", "content")
+# 글자 n-gram과 초성 n-gram을 만드는 필드 (짧은 필드만, 내용은 단어 단위로만 색인)
+GRAM_FIELDS = ("topic", "term", "keyword", "rhyming")
+# 필드별 단어 색인 + 글자 n-gram 색인 + 초성 n-gram 색인
+POSTING_NAMES = FIELDS + ("gram", "chosung")
+GRAM_SIZES = (2, 3)
+# 지워진 항목이 이 비율을 넘으면 색인을 다시 짬
+COMPACT_DEAD_RATIO = 0.3
+# 질의 토큰 하나가 앞부분 일치로 펼쳐질 최대 토큰 수
+PREFIX_EXPANSION_LIMIT = 200
+# 앞부분만 일치한 토큰의 점수 비율
+PREFIX_MATCH_WEIGHT = 0.5
+# 단어 중간에서 n-gram으로 찾은 경우의 점수 비율
+GRAM_MATCH_WEIGHT = 0.5
+# 오타를 허용해 찾은 경우의 점수 비율
+FUZZY_MATCH_WEIGHT = 0.3
+# 오타를 허용할 영문 토큰의 최소 길이 (짧은 약어는 한 글자만 바뀌어도 다른 말이 되기 쉬움)
+FUZZY_MIN_LENGTH = 3
+# BM25 매개변수와 필드 가중치
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_BOOSTS = {"term": 3.0, "keyword": 2.5, "rhyming": 2.0, "topic": 1.5, "content": 1.0}
+# 검색 결과에 보여 줄 내용 발췌 길이
+SNIPPET_CHARS = 160
+# 연속된 변경을 한 번의 저장으로 합치는 대기 시간
+SAVE_DELAY_SECONDS = 2.0
+
+_TOKEN_RE = re.compile(r"\w+")
+_FUZZY_TOKEN_RE = re.compile(r"[a-z][a-z0-9]*")
+# 한글 초성 (호환용 자모)
+CHOSUNG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_CHOSUNG_SET = frozenset(CHOSUNG)
+
+
+def tokenize(text):
+    """소문자로 바꾼 뒤 글자/숫자 묶음으로 나눕니다."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def chosung(text):
+    """한글 음절은 초성으로 바꾸고 자음은 그대로 두며, 나머지 글자(공백, 영문 등)는 뺍니다."""
+    letters = []
+    for char in text:
+        code = ord(char)
+        if 0xAC00 <= code <= 0xD7A3:
+            letters.append(CHOSUNG[(code - 0xAC00) // 588])
+        elif char in _CHOSUNG_SET:
+            letters.append(char)
+    return "".join(letters)
+
+
+def is_chosung(token):
+    return all(char in _CHOSUNG_SET for char in token)
+
+
+def is_fuzzy_candidate(token):
+    """오타를 허용해 찾을 토큰 (영문자로 시작하는 영문/숫자 토큰)"""
+    return len(token) >= FUZZY_MIN_LENGTH and _FUZZY_TOKEN_RE.fullmatch(token) is not None
+
+
+def deletes(token):
+    """한 글자를 뺀 형태들 (자기 자신 포함)"""
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def edit_distance(a, b, limit=1):
+    """
+    두 문자열의 편집 거리(삽입/삭제/치환/인접한 두 글자 교환).
+    limit을 넘는 것이 확실해지면 limit + 1을 반환합니다.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _bm25_idf(doc_count, df):
+    return math.log(1.0 + (doc_count - df + 0.5) / (df + 0.5))
+
+
+def ngrams(text):
+    return [text[i:i + size] for size in GRAM_SIZES for i in range(len(text) - size + 1)]
+
+
+def query_grams(text):
+    """질의 토큰을 찾을 때 모두 있어야 하는 n-gram (3글자까지는 그대로, 더 길면 3-gram으로 나눔)"""
+    if len(text) <= max(GRAM_SIZES):
+        return [text]
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def card_fields(topic, term, card_data):
+    return {
+        "topic": topic,
+        "term": term,
+        "keyword": card_data.get("keyword", "") or "",
+        "rhyming": card_data.get("rhyming", "") or "",
+        "content": card_data.get("content", "") or "",
+    }
+
+
+def fingerprint(fields):
+    """필드 내용의 체크섬 (프로세스가 바뀌어도 같은 값)"""
+    return zlib.crc32("\x1f".join(fields[field] for field in FIELDS).encode("utf-8"))
+
+
+def _count(tokens):
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+class CardIndex:
+    """
+    한 사용자의 카드 색인 공통 부분 (SearchIndex, related_cards.RelatedIndex, duplicate_cards.DuplicateIndex).
+
+    카드는 (도메인, 토픽, 정의/개념) 키로 구분하며 색인 안에서는 0부터 붙인 번호로 다룹니다.
+    카드마다 필드 내용의 체크섬을 기억해 sync에서는 바뀐 카드만 다시 색인하고, 지운 카드는
+    지워진 것으로 표시만 했다가(tombstone) 그런 항목이 많아지면 새 번호로 다시 짭니다.
+    모든 읽기/쓰기는 lock을 잡고 수행합니다.
+
+    하위 클래스는 카드 번호별 자료를 다루는 _add_docs, _remove_doc, _rekey_doc, _compact_docs와
+    저장/읽기용 _arrays, _load_arrays를 구현하고 index_format을 정합니다.
+    """
+
+    # 저장 형식 (다른 형식의 파일은 버리고 새로 색인)
+    index_format = None
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.RLock()
+        # 색인에 반영한 덱 버전 (None이면 다음 sync에서 체크섬으로 전체를 맞춤)
+        self.version = None
+        self._reset()
+
+    def _reset(self):
+        # 카드 번호 -> 키 (지워진 항목은 None)
+        self.keys = []
+        self.doc_ids = {}
+        self.checksums = array.array("I")
+        self.alive = bytearray()
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    # 하위 클래스별 구현
+    def _add_docs(self, doc_ids, items):
+        """새 카드 번호들(연속된 번호)에 [(키, 필드)]의 내용을 색인합니다."""
+        raise NotImplementedError
+
+    def _remove_doc(self, doc_id):
+        """지운 카드 번호의 자료를 정리합니다."""
+
+    def _rekey_doc(self, doc_id, key):
+        """카드 번호의 키가 바뀌었을 때(도메인 이름 변경) 키에 딸린 자료를 고칩니다."""
+
+    def _compact_docs(self, live):
+        """live(남길 예전 카드 번호 배열) 순서로 카드 번호별 자료를 다시 짭니다. 공통 부분보다 먼저 호출됩니다."""
+        raise NotImplementedError
+
+    def _arrays(self):
+        """저장할 하위 클래스의 배열 {이름: numpy 배열}"""
+        raise NotImplementedError
+
+    def _load_arrays(self, arrays):
+        """_arrays로 저장한 배열을 읽습니다. 형식이 맞지 않으면 ValueError를 발생시킵니다."""
+        raise NotImplementedError
+
+    # 색인 갱신
+    def add(self, key, fields, checksum=None):
+        """카드를 색인에 넣습니다. 같은 키가 있으면 예전 항목을 지우고 새로 넣습니다."""
+        return self.add_many([(key, fields, checksum)])[0]
+
+    def add_many(self, items):
+        """
+        여러 카드를 한 번에 색인에 넣습니다.
+
+        Parameters:
+        -----------
+        items : list
+            [(키, 필드, 체크섬)] (체크섬이 None이면 필드로 계산, 같은 키가 여러 번 있으면 마지막 것)
+
+        Returns:
+        --------
+        list
+            새 카드 번호
+        """
+        items = list({key: (key, fields, checksum) for key, fields, checksum in items}.values())
+        for key, _, _ in items:
+            self.remove(key)
+        doc_ids = list(range(len(self.keys), len(self.keys) + len(items)))
+        for doc_id, (key, fields, checksum) in zip(doc_ids, items):
+            self.keys.append(key)
+            self.doc_ids[key] = doc_id
+            self.checksums.append(fingerprint(fields) if checksum is None else checksum)
+            self.alive.append(1)
+        if items:
+            self._add_docs(doc_ids, [(key, fields) for key, fields, _ in items])
+        return doc_ids
+
+    def remove(self, key):
+        doc_id = self.doc_ids.pop(key, None)
+        if doc_id is None:
+            return False
+        self.keys[doc_id] = None
+        self.alive[doc_id] = 0
+        self.dead += 1
+        self._remove_doc(doc_id)
+        return True
+
+    def sync(self, data, version=None):
+        """
+        덱({도메인: {토픽: {정의/개념: 카드}}})과 색인을 맞춥니다.
+        체크섬이 달라진 카드만 다시 색인하고 덱에 없는 카드는 지웁니다.
+
+        Returns:
+        --------
+        int
+            다시 색인하거나 지운 카드 수
+        """
+        items = []
+        seen = set()
+        for domain, topics in data.items():
+            for topic, cards in topics.items():
+                for term, card_data in cards.items():
+                    key = (domain, topic, term)
+                    seen.add(key)
+                    fields = card_fields(topic, term, card_data)
+                    checksum = fingerprint(fields)
+                    doc_id = self.doc_ids.get(key)
+                    if doc_id is not None and self.checksums[doc_id] == checksum:
+                        continue
+                    items.append((key, fields, checksum))
+        self.add_many(items)
+        removed = [key for key in self.doc_ids if key not in seen]
+        for key in removed:
+            self.remove(key)
+
+        self._compact_if_needed()
+        self.version = version
+        return len(items) + len(removed)
+
+    def apply_op(self, op, **args):
+        """
+        덱 변경 연산 하나를 덱을 다시 읽지 않고 색인에 반영합니다.
+        op와 args는 storage.JOURNAL_OPS의 연산 이름, 인자와 같습니다.
+        """
+        getattr(self, f"_apply_{op}")(**args)
+        self._compact_if_needed()
+
+    def _update_card(self, key, card_data):
+        fields = card_fields(key[1], key[2], card_data)
+        checksum = fingerprint(fields)
+        doc_id = self.doc_ids.get(key)
+        if doc_id is None or self.checksums[doc_id] != checksum:
+            self.add(key, fields, checksum)
+
+    def _remove_prefix(self, prefix):
+        for key in [key for key in self.doc_ids if key[:len(prefix)] == prefix]:
+            self.remove(key)
+
+    def _apply_add_domain(self, domain):
+        pass
+
+    def _apply_rename_domain(self, old_domain, new_domain):
+        if old_domain == new_domain:
+            return
+        # 새 이름의 도메인이 있었으면 덱에서와 같이 통째로 바뀜
+        self._remove_prefix((new_domain,))
+        for key in [key for key in self.doc_ids if key[0] == old_domain]:
+            doc_id = self.doc_ids.pop(key)
+            new_key = (new_domain,) + key[1:]
+            self.keys[doc_id] = new_key
+            self.doc_ids[new_key] = doc_id
+            self._rekey_doc(doc_id, new_key)
+
+    def _apply_delete_domain(self, domain):
+        self._remove_prefix((domain,))
+
+    def _apply_save_card(self, domain, topic, term, card_data):
+        self._update_card((domain, topic, term), card_data)
+
+    def _apply_move_card(self, domain, topic, term, new_topic, new_term, card_data):
+        # storage.apply_move_card와 같은 순서 (새 자리에 저장한 뒤 예전 자리를 지움)
+        self._update_card((domain, new_topic, new_term), card_data)
+        self.remove((domain, topic, term))
+
+    def _apply_delete_card(self, domain, topic, term):
+        self.remove((domain, topic, term))
+
+    def _apply_delete_topic(self, domain, topic):
+        self._remove_prefix((domain, topic))
+
+    def _compact_if_needed(self):
+        if self.dead > COMPACT_DEAD_RATIO * max(len(self.keys), 1):
+            self.compact()
+
+    def compact(self):
+        """지워진 항목을 빼고 카드 번호를 다시 붙입니다."""
+        live = np.flatnonzero(np.frombuffer(bytes(self.alive), dtype=np.uint8))
+        self._compact_docs(live)
+        self.keys = [self.keys[i] for i in live.tolist()]
+        self.doc_ids = {key: i for i, key in enumerate(self.keys)}
+        self.checksums = array.array("I", np.frombuffer(self.checksums, dtype=np.uint32)[live].tobytes())
+        self.alive = bytearray(b"\x01" * len(self.keys))
+        self.dead = 0
+
+    # 저장/읽기
+    def to_bytes(self):
+        arrays = {
+            "format": np.array(self.index_format),
+            "keys": np.frombuffer(json.dumps(self.keys, ensure_ascii=False).encode("utf-8"), dtype=np.uint8),
+            "checksums": np.frombuffer(self.checksums, dtype=np.uint32),
+            "alive": np.frombuffer(bytes(self.alive), dtype=np.uint8),
+        }
+        arrays.update(self._arrays())
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    def load_bytes(self, payload):
+        with np.load(io.BytesIO(payload), allow_pickle=False) as arrays:
+            if int(arrays["format"]) != self.index_format:
+                raise ValueError("지원하지 않는 색인 형식")
+            self._reset()
+            self.keys = [tuple(key) if key is not None else None
+                         for key in json.loads(arrays["keys"].tobytes().decode("utf-8"))]
+            self.doc_ids = {key: i for i, key in enumerate(self.keys) if key is not None}
+            self.checksums = array.array("I", arrays["checksums"].tobytes())
+            self.alive = bytearray(arrays["alive"].tobytes())
+            self.dead = len(self.keys) - len(self.doc_ids)
+            self._load_arrays(arrays)
+        # 파일을 쓴 뒤 덱이 바뀌었을 수 있으므로 다음 sync에서 체크섬으로 맞춤
+        self.version = None
+
+    def save(self):
+        with self.lock:
+            payload = self.to_bytes()
+        storage.replace_file(self.path, payload)
+
+
+class SearchIndex(CardIndex):
+    """한 사용자의 카드 검색 색인."""
+
+    index_format = INDEX_FORMAT
+
+    def _reset(self):
+        super()._reset()
+        # 카드 번호 -> 도메인 번호 (도메인 필터용)
+        self.doc_domains = array.array("I")
+        self.domain_ids = {}
+        # 필드 -> 카드 번호 -> 토큰 수
+        self.lengths = {field: array.array("I") for field in FIELDS}
+        # 색인 이름(필드, gram, chosung) -> 토큰 -> (카드 번호 배열, 출현 횟수 배열)
+        self.postings = {name: {} for name in POSTING_NAMES}
+        self._vocab = {name: None for name in POSTING_NAMES}
+        # 영문 토큰에서 한 글자를 뺀 형태 -> 원래 토큰들 (오타 허용 검색용)
+        self.fuzzy = {}
+
+    # 색인 갱신
+    def _add_docs(self, doc_ids, items):
+        for doc_id, (key, fields) in zip(doc_ids, items):
+            self.doc_domains.append(self.domain_ids.setdefault(key[0], len(self.domain_ids)))
+            for field in FIELDS:
+                tokens = tokenize(fields[field])
+                self.lengths[field].append(len(tokens))
+                self._add_postings(field, doc_id, _count(tokens))
+
+            grams = []
+            chosung_grams = []
+            for field in GRAM_FIELDS:
+                for token in tokenize(fields[field]):
+                    grams.extend(ngrams(token))
+                chosung_grams.extend(ngrams(chosung(fields[field])))
+            self._add_postings("gram", doc_id, _count(grams))
+            self._add_postings("chosung", doc_id, _count(chosung_grams))
+
+    def _add_postings(self, name, doc_id, counts):
+        postings = self.postings[name]
+        for token, count in counts.items():
+            entry = postings.get(token)
+            if entry is None:
+                entry = postings[token] = (array.array("I"), array.array("H"))
+                self._vocab[name] = None
+                if name in FIELDS:
+                    self._add_fuzzy(token)
+            entry[0].append(doc_id)
+            entry[1].append(min(count, 0xFFFF))
+
+    def _add_fuzzy(self, token):
+        if is_fuzzy_candidate(token):
+            for form in deletes(token):
+                self.fuzzy.setdefault(form, set()).add(token)
+
+    def _rebuild_fuzzy(self):
+        self.fuzzy = {}
+        for field in FIELDS:
+            for token in self.postings[field]:
+                self._add_fuzzy(token)
+
+    def _rekey_doc(self, doc_id, key):
+        self.doc_domains[doc_id] = self.domain_ids.setdefault(key[0], len(self.domain_ids))
+
+    def _compact_docs(self, live):
+        remap = np.full(len(self.keys), -1, dtype=np.int64)
+        remap[live] = np.arange(len(live))
+
+        self.doc_domains = array.array("I", np.frombuffer(self.doc_domains, dtype=np.uint32)[live].tobytes())
+        for field in FIELDS:
+            self.lengths[field] = array.array("I", np.frombuffer(self.lengths[field], dtype=np.uint32)[live].tobytes())
+        for name in POSTING_NAMES:
+            postings = {}
+            for token, (ids, counts) in self.postings[name].items():
+                new_ids = remap[np.frombuffer(ids, dtype=np.uint32)]
+                keep = new_ids >= 0
+                if not keep.any():
+                    continue
+                postings[token] = (array.array("I", new_ids[keep].astype(np.uint32).tobytes()),
+                                   array.array("H", np.frombuffer(counts, dtype=np.uint16)[keep].tobytes()))
+            self.postings[name] = postings
+            self._vocab[name] = None
+        self._rebuild_fuzzy()
+
+    # 검색
+    def _vocabulary(self, field):
+        if self._vocab[field] is None:
+            self._vocab[field] = sorted(self.postings[field])
+        return self._vocab[field]
+
+    def _expand(self, field, query_token):
+        """질의 토큰과 같거나 질의 토큰으로 시작하는 색인 토큰 [(토큰, 가중치)]"""
+        vocab = self._vocabulary(field)
+        matches = []
+        start = bisect.bisect_left(vocab, query_token)
+        for token in vocab[start:start + PREFIX_EXPANSION_LIMIT]:
+            if not token.startswith(query_token):
+                break
+            matches.append((token, 1.0 if token == query_token else PREFIX_MATCH_WEIGHT))
+        return matches
+
+    def _fuzzy_matches(self, query_token):
+        """질의 토큰과 편집 거리가 1인 색인 토큰 (질의 토큰으로 시작하는 토큰은 앞부분 일치로 찾으므로 뺌)"""
+        if not is_fuzzy_candidate(query_token):
+            return []
+        candidates = set()
+        for form in deletes(query_token):
+            candidates.update(self.fuzzy.get(form, ()))
+        return sorted(token for token in candidates
+                      if not token.startswith(query_token) and edit_distance(query_token, token) <= 1)
+
+    def _field_norms(self, field, alive):
+        """BM25 길이 보정값 k1 * (1 - b + b * 길이 / 평균 길이) (카드 번호별)"""
+        lengths = np.frombuffer(self.lengths[field], dtype=np.uint32).astype(np.float32)
+        average = float(lengths[alive].mean()) if alive.any() else 0.0
+        if average <= 0:
+            return np.full(len(lengths), BM25_K1, dtype=np.float32)
+        return BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / average)
+
+    def _score_grams(self, name, query_token, scores, token_hits, weight, alive_count):
+        """질의 토큰의 n-gram이 모두 나오는 카드를 token_hits에 표시하고 점수를 더합니다."""
+        postings = self.postings[name]
+        grams = query_grams(query_token)
+        gram_hits = None
+        gram_scores = np.zeros(len(scores), dtype=np.float32)
+        for gram in grams:
+            entry = postings.get(gram)
+            if entry is None:
+                return
+            ids = np.frombuffer(entry[0], dtype=np.uint32)
+            counts = np.frombuffer(entry[1], dtype=np.uint16).astype(np.float32)
+            present = np.zeros(len(scores), dtype=bool)
+            present[ids] = True
+            gram_hits = present if gram_hits is None else gram_hits & present
+            gram_scores[ids] += _bm25_idf(alive_count, len(ids)) * counts * (BM25_K1 + 1) / (counts + BM25_K1)
+        scores += np.where(gram_hits, gram_scores * (weight / len(grams)), 0)
+        token_hits |= gram_hits
+
+    def search(self, query, domains=None, limit=None):
+        """
+        질의의 모든 토큰이 (어느 필드에서든) 나오는 카드를 점수 순으로 반환합니다.
+        토큰은 앞부분만 일치해도 찾으며, 점수는 필드별 BM25에 FIELD_BOOSTS를 곱한 값의 합입니다.
+        두 글자 이상인 토큰은 토픽, 정의/개념, 핵심키워드, 두음의 단어 중간에서도 찾고,
+        초성으로만 된 토큰(예: "ㅇㅍㅌ")은 초성 색인에서 찾습니다.
+        영문 토큰은 편집 거리 1(한 글자 추가/삭제/변경, 이웃한 두 글자 바뀜)까지 낮은 점수로 찾습니다.
+
+        Parameters:
+        -----------
+        query : str
+            검색어
+        domains : list, optional
+            이 도메인의 카드만 찾음 (생략하면 전체)
+        limit : int, optional
+            최대 결과 수
+
+        Returns:
+        --------
+        list
+            [((도메인, 토픽, 정의/개념), 점수)] (점수 내림차순)
+        """
+        query_tokens = list(dict.fromkeys(tokenize(query)))
+        if not query_tokens or not self.doc_ids:
+            return []
+
+        doc_count = len(self.keys)
+        alive_count = len(self.doc_ids)
+        scores = np.zeros(doc_count, dtype=np.float32)
+        matched = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        if domains is not None:
+            wanted = [self.domain_ids[domain] for domain in domains if domain in self.domain_ids]
+            matched &= np.isin(np.frombuffer(self.doc_domains, dtype=np.uint32), wanted)
+
+        alive = np.frombuffer(bytes(self.alive), dtype=np.uint8).astype(bool)
+        norms = {}
+        for query_token in query_tokens:
+            token_hits = np.zeros(doc_count, dtype=bool)
+            if len(query_token) >= 2 and is_chosung(query_token):
+                self._score_grams("chosung", query_token, scores, token_hits, 1.0, alive_count)
+            else:
+                fuzzy_tokens = self._fuzzy_matches(query_token)
+                for field in FIELDS:
+                    postings = self.postings[field]
+                    matches = self._expand(field, query_token)
+                    matches += [(token, FUZZY_MATCH_WEIGHT) for token in fuzzy_tokens if token in postings]
+                    for token, weight in matches:
+                        if field not in norms:
+                            norms[field] = self._field_norms(field, alive)
+                        ids, counts = postings[token]
+                        ids = np.frombuffer(ids, dtype=np.uint32)
+                        counts = np.frombuffer(counts, dtype=np.uint16).astype(np.float32)
+                        boost = weight * FIELD_BOOSTS[field] * _bm25_idf(alive_count, len(ids))
+                        scores[ids] += boost * counts * (BM25_K1 + 1) / (counts + norms[field][ids])
+                        token_hits[ids] = True
+                if len(query_token) >= 2:
+                    self._score_grams("gram", query_token, scores, token_hits, GRAM_MATCH_WEIGHT, alive_count)
+            matched &= token_hits
+            if not matched.any():
+                return []
+
+        hits = np.flatnonzero(matched)
+        order = hits[np.argsort(-scores[hits], kind="stable")]
+        if limit is not None:
+            order = order[:limit]
+        return list(zip(map(self.keys.__getitem__, order.tolist()), scores[order].tolist()))
+
+    def highlight_terms(self, query):
+        """검색 결과에서 강조할 말 (질의 토큰과 오타를 허용해 찾은 색인 토큰)"""
+        terms = []
+        for query_token in dict.fromkeys(tokenize(query)):
+            terms.append(query_token)
+            if not is_chosung(query_token):
+                terms.extend(self._fuzzy_matches(query_token))
+        return terms
+
+    # 저장/읽기
+    def _arrays(self):
+        arrays = {}
+        for field in FIELDS:
+            arrays[f"{field}_lengths"] = np.frombuffer(self.lengths[field], dtype=np.uint32)
+        for name in POSTING_NAMES:
+            vocab = self._vocabulary(name)
+            entries = [self.postings[name][token] for token in vocab]
+            arrays[f"{name}_vocab"] = np.frombuffer("\n".join(vocab).encode("utf-8"), dtype=np.uint8)
+            arrays[f"{name}_offsets"] = np.cumsum([0] + [len(ids) for ids, _ in entries], dtype=np.uint64)
+            arrays[f"{name}_ids"] = np.frombuffer(b"".join(ids.tobytes() for ids, _ in entries), dtype=np.uint32)
+            arrays[f"{name}_counts"] = np.frombuffer(b"".join(counts.tobytes() for _, counts in entries), dtype=np.uint16)
+        return arrays
+
+    def _load_arrays(self, arrays):
+        for key in self.keys:
+            domain = key[0] if key is not None else None
+            self.doc_domains.append(self.domain_ids.setdefault(domain, len(self.domain_ids)))
+        for field in FIELDS:
+            self.lengths[field] = array.array("I", arrays[f"{field}_lengths"].tobytes())
+        for name in POSTING_NAMES:
+            raw_vocab = arrays[f"{name}_vocab"].tobytes().decode("utf-8")
+            vocab = raw_vocab.split("\n") if raw_vocab else []
+            offsets = arrays[f"{name}_offsets"]
+            ids = arrays[f"{name}_ids"]
+            counts = arrays[f"{name}_counts"]
+            self.postings[name] = {
+                token: (array.array("I", ids[offsets[i]:offsets[i + 1]].tobytes()),
+                        array.array("H", counts[offsets[i]:offsets[i + 1]].tobytes()))
+                for i, token in enumerate(vocab)
+            }
+            self._vocab[name] = vocab
+        self._rebuild_fuzzy()
+
+
+# 색인 파일 경로 -> 색인 (CardIndex 하위 클래스)
+_indexes = {}
+# 색인 파일 경로 -> 예약된 저장 타이머
+_pending_saves = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index_file(deck_storage, username, file_name=INDEX_FILE_NAME):
+    return os.path.join(deck_storage.get_data_folder(username), file_name)
+
+
+def _get_index(path, factory=SearchIndex):
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = factory(path)
+            try:
+                with open(path, "rb") as f:
+                    index.load_bytes(f.read())
+            except (OSError, ValueError, KeyError):
+                # 파일이 없거나 형식이 다르면 다음 sync에서 새로 색인
+                index._reset()
+        return index
+
+
+def _save_later(index):
+    with _indexes_lock:
+        if index.path in _pending_saves:
+            return
+        timer = threading.Timer(SAVE_DELAY_SECONDS, _flush_index, args=(index.path,))
+        timer.daemon = True
+        _pending_saves[index.path] = timer
+        timer.start()
+
+
+def _flush_index(path):
+    with _indexes_lock:
+        timer = _pending_saves.pop(path, None)
+        index = _indexes.get(path)
+    if timer is None or index is None:
+        return
+    timer.cancel()
+    try:
+        index.save()
+    except OSError:
+        # 저장하지 못해도 다음 실행 때 덱에서 다시 색인하면 됨
+        pass
+
+
+def flush_all():
+    """예약된 색인 저장을 바로 수행합니다. 프로세스 종료 시 자동으로 호출됩니다."""
+    with _indexes_lock:
+        paths = list(_pending_saves)
+    for path in paths:
+        _flush_index(path)
+
+
+atexit.register(flush_all)
+
+
+def get_synced_index(deck_storage, username, file_name, factory):
+    """
+    사용자의 색인을 덱의 현재 내용에 맞춰 반환합니다.
+    덱 버전이 색인에 반영한 버전과 같으면 덱을 읽지 않습니다.
+
+    색인은 factory(path)로 만드는 CardIndex 하위 클래스입니다.
+    """
+    index = _get_index(get_index_file(deck_storage, username, file_name), factory)
+    with index.lock:
+        version = deck_storage.get_version(username)
+        if index.version != version:
+            data, version = deck_storage.load_versioned(username)
+            if index.sync(data, version):
+                _save_later(index)
+    return index
+
+
+def apply_op(deck_storage, username, base_version, op, **args):
+    """
+    덱 변경 연산(storage.JOURNAL_OPS의 이름과 인자)을 마친 직후 호출해, 이 프로세스에 불러 둔
+    사용자의 색인에 바뀐 카드만 반영합니다. 덱을 다시 읽어 모든 카드의 체크섬을 구하지 않습니다.
+
+    색인이 base_version(연산 전에 읽은 덱 버전)을 반영하고 있고 연산 뒤 덱 버전이 정확히 하나 늘었을 때만
+    반영합니다. 그 사이 다른 세션이나 프로세스가 덱을 바꿨으면 그대로 두어 다음 조회 때 sync로 맞춥니다.
+    """
+    folder = deck_storage.get_data_folder(username)
+    with _indexes_lock:
+        indexes = [index for path, index in _indexes.items() if os.path.dirname(path) == folder]
+    if not indexes or deck_storage.get_version(username) != base_version + 1:
+        return
+    for index in indexes:
+        with index.lock:
+            if index.version != base_version:
+                continue
+            index.apply_op(op, **args)
+            index.version = base_version + 1
+            _save_later(index)
+
+
+def get_user_index(deck_storage, username):
+    """사용자의 검색 색인을 덱의 현재 내용에 맞춰 반환합니다."""
+    return get_synced_index(deck_storage, username, INDEX_FILE_NAME, SearchIndex)
+
+
+def search(deck_storage, username, query, domains=None, limit=None):
+    """사용자의 카드를 검색합니다. (SearchIndex.search 참고)"""
+    index = get_user_index(deck_storage, username)
+    with index.lock:
+        return index.search(query, domains, limit)
+
+
+def highlight_terms(deck_storage, username, query):
+    """검색 결과에서 강조할 말 (SearchIndex.highlight_terms 참고)"""
+    index = get_user_index(deck_storage, username)
+    with index.lock:
+        return index.highlight_terms(query)
+
+
+def _match_spans(text, terms):
+    """text에서 terms가 나오는 [시작, 끝) 구간 (겹치면 합침)"""
+    lowered = text.lower()
+    # 초성 질의는 음절마다 초성을 구한 문자열에서 찾고 원래 위치로 되돌림
+    projected = None
+    spans = []
+    for term in terms:
+        if len(term) >= 2 and is_chosung(term):
+            if projected is None:
+                projected = [(i, chosung(char)) for i, char in enumerate(text)]
+                projected = [(i, letter) for i, letter in projected if letter]
+                projected_text = "".join(letter for _, letter in projected)
+            start = projected_text.find(term)
+            while start >= 0:
+                spans.append((projected[start][0], projected[start + len(term) - 1][0] + 1))
+                start = projected_text.find(term, start + 1)
+        else:
+            start = lowered.find(term)
+            while start >= 0:
+                spans.append((start, start + len(term)))
+                start = lowered.find(term, start + 1)
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def highlight(text, terms, width=None):
+    """
+    text에서 terms가 나오는 부분을 <mark>로 감싼 HTML을 반환합니다.
+
+    Parameters:
+    -----------
+    text : str
+        카드 필드 내용
+    terms : list
+        강조할 말 (highlight_terms의 결과)
+    width : int, optional
+        주어지면 처음 강조한 부분 근처를 이 길이만큼 잘라 발췌로 만듦
+
+    Returns:
+    --------
+    str
+        HTML 이스케이프한 문자열
+    """
+    spans = _match_spans(text, terms)
+    begin, finish = 0, len(text)
+    if width is not None and len(text) > width:
+        begin = max(0, min(spans[0][0] - width // 4, len(text) - width)) if spans else 0
+        finish = begin + width
+    parts = ["…" if begin > 0 else ""]
+    position = begin
+    for start, end in spans:
+        start, end = max(start, begin), min(end, finish)
+        if start >= end:
+            continue
+        parts.append(html.escape(text[position:start]))
+        parts.append(f"<mark>{html.escape(text[start:end])}</mark>")
+        position = end
+    parts.append(html.escape(text[position:finish]))
+    parts.append("…" if finish < len(text) else "")
+    return "".join(parts)
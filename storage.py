@@ -0,0 +1,1651 @@
+"""
+플래시카드 덱 저장소
+
+스트림릿은 app.py를 rerun마다 처음부터 다시 실행하므로 app.py의 전역 변수는
+버튼 클릭 한 번에도 초기화됩니다. 프로세스가 살아 있는 동안 유지되어야 하는
+캐시와 같은 상태는 이 모듈에 둡니다.
+"""
+import os
+import json
+import time
+import uuid
+import atexit
+import random
+import datetime
+import sqlite3
+import argparse
+import threading
+import contextlib
+
+try:
+    import msgpack
+except ImportError:
+    # 선택 의존성 - msgpack 직렬화 형식을 쓸 때만 필요
+    msgpack = None
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+def copy_deck(data):
+    """
+    도메인/토픽/카드 3단계 구조의 덱을 복사합니다.
+    호출하는 쪽에서 반환된 딕셔너리를 자유롭게 수정하므로 캐시 원본과 분리해야 하며,
+    deepcopy보다 훨씬 빠르고 JSON 재파싱보다도 가볍습니다.
+    """
+    return {
+        domain: {
+            topic: {term: dict(card_data) for term, card_data in cards.items()}
+            for topic, cards in topics.items()
+        }
+        for domain, topics in data.items()
+    }
+
+
+def copy_topics(topics):
+    """한 도메인({토픽: {정의/개념: 카드}})만 복사합니다."""
+    return {topic: {term: dict(card_data) for term, card_data in cards.items()} for topic, cards in topics.items()}
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def signature_text(path):
+    """파일 시그니처를 문자열로 반환합니다. 파일이 없으면 빈 문자열."""
+    try:
+        return "%d:%d" % file_signature(path)
+    except FileNotFoundError:
+        return ""
+
+
+# ---------------------------------------------------------------------------
+# 직렬화 형식
+# ---------------------------------------------------------------------------
+
+# json: 들여쓰기한 JSON (기존 파일과 같은 형식, 기본값)
+# compact: 공백 없는 JSON - 파일이 작고 쓰기가 빠름
+# msgpack: MessagePack 바이너리 - 가장 작고 빠름 (msgpack 패키지 필요)
+SERIALIZATION_FORMATS = ("json", "compact", "msgpack")
+
+
+def check_serialization(fmt):
+    """사용할 수 없는 직렬화 형식이면 ValueError를 발생시킵니다."""
+    if fmt not in SERIALIZATION_FORMATS:
+        raise ValueError(f"지원하지 않는 직렬화 형식입니다: {fmt} (사용 가능: {', '.join(SERIALIZATION_FORMATS)})")
+    if fmt == "msgpack" and msgpack is None:
+        raise ValueError("msgpack 직렬화 형식을 사용하려면 msgpack 패키지를 설치하세요: pip install msgpack")
+
+
+def dump_bytes(data, fmt="json"):
+    if fmt == "msgpack":
+        check_serialization(fmt)
+        return msgpack.packb(data, use_bin_type=True)
+    if fmt == "compact":
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def is_msgpack(raw):
+    # 덱/매니페스트의 최상위 값은 항상 딕셔너리이므로 MessagePack 맵 헤더(fixmap, map16, map32)로 판별.
+    # JSON은 '{', 공백, UTF-8 BOM 중 하나로 시작하므로 겹치지 않음
+    return bool(raw) and (0x80 <= raw[0] <= 0x8F or raw[0] in (0xDE, 0xDF))
+
+
+def load_bytes(raw):
+    """파일 내용으로 형식을 판별해 읽습니다. 파일 확장자나 현재 설정과는 무관합니다."""
+    if is_msgpack(raw):
+        check_serialization("msgpack")
+        try:
+            return msgpack.unpackb(raw, raw=False)
+        except Exception as e:
+            raise ValueError(f"MessagePack 데이터를 읽을 수 없습니다: {e}") from e
+    return json.loads(raw)
+
+
+def read_data_file(path):
+    with open(path, "rb") as f:
+        return load_bytes(f.read())
+
+
+def fsync_directory(path):
+    """이름 변경(os.replace)이 디스크에 반영되도록 폴더를 fsync합니다. Windows에서는 지원되지 않아 건너뜁니다."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def replace_data_file(path, data, fmt="json"):
+    """
+    임시 파일에 먼저 쓰고 fsync한 뒤 os.replace로 교체합니다.
+    쓰는 도중 중단되거나 전원이 꺼져도 기존 파일 또는 새 파일 중 하나가 온전히 남으며,
+    동시에 읽는 쪽이 반쯤 쓰인 파일을 보는 일이 없습니다.
+    """
+    replace_file(path, dump_bytes(data, fmt))
+
+
+def replace_file(path, payload):
+    """바이트 내용으로 파일을 원자적으로 교체합니다. (replace_data_file 참고)"""
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    temp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        fsync_directory(folder)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class InterProcessLock:
+    """
+    같은 사용자의 덱을 여러 세션/프로세스가 동시에 고칠 때 쓰는 잠금.
+
+    스레드 잠금(RLock)과 잠금 파일에 대한 advisory 파일 잠금(fcntl.flock / msvcrt.locking)을
+    함께 잡으므로 같은 프로세스의 다른 세션과 다른 프로세스를 모두 막습니다.
+    같은 스레드에서 중첩해서 잡을 수 있습니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = self._acquire_file()
+            except BaseException:
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            file, self._file = self._file, None
+            try:
+                self._release_file(file)
+            finally:
+                self._lock.release()
+        else:
+            self._lock.release()
+
+    def _acquire_file(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        file = open(self.path, "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            else:
+                file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK은 약 10초 동안 재시도한 뒤 실패하므로 계속 대기
+                        pass
+        except BaseException:
+            file.close()
+            raise
+        return file
+
+    @staticmethod
+    def _release_file(file):
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            file.close()
+
+
+class VersionConflictError(Exception):
+    """저장하려는 덱의 기준 버전이 저장소의 현재 버전과 다를 때 발생합니다."""
+
+    def __init__(self, current_version):
+        super().__init__(f"덱이 다른 세션에서 변경되었습니다 (현재 버전: {current_version})")
+        self.current_version = current_version
+
+
+def merge_decks(base, mine, theirs):
+    """
+    3-way 병합. base에서 mine으로 바뀐 도메인/토픽/카드만 theirs에 반영한 새 덱을 반환합니다.
+    같은 카드를 양쪽에서 고쳤으면 mine이 이기고, mine이 건드리지 않은 theirs의 변경은 그대로 남습니다.
+    """
+    merged = copy_deck(theirs)
+    for domain in list(base) + [domain for domain in mine if domain not in base]:
+        if domain not in mine:
+            merged.pop(domain, None)
+            continue
+        base_topics, mine_topics = base.get(domain, {}), mine[domain]
+        merged_topics = merged.setdefault(domain, {})
+        for topic in list(base_topics) + [topic for topic in mine_topics if topic not in base_topics]:
+            if topic not in mine_topics:
+                merged_topics.pop(topic, None)
+                continue
+            base_cards, mine_cards = base_topics.get(topic, {}), mine_topics[topic]
+            merged_cards = merged_topics.setdefault(topic, {})
+            for term in list(base_cards) + [term for term in mine_cards if term not in base_cards]:
+                if base_cards.get(term) == mine_cards.get(term):
+                    continue
+                if term in mine_cards:
+                    merged_cards[term] = dict(mine_cards[term])
+                else:
+                    merged_cards.pop(term, None)
+    return merged
+
+
+# ---------------------------------------------------------------------------
+# 저장소 백엔드
+# ---------------------------------------------------------------------------
+
+DECK_FILE_NAME = "flashcards.json"
+SQLITE_FILE_NAME = "flashcards.db"
+# 세분화된 변경이 다른 세션의 저장과 계속 충돌할 때 다시 시도하는 횟수와 첫 대기 시간(초, 시도마다 두 배)
+UPDATE_RETRIES = 8
+UPDATE_BACKOFF = 0.005
+
+
+class DeckStorage:
+    """
+    사용자 덱 저장소 공통 인터페이스.
+
+    덱은 항상 {도메인: {토픽: {정의/개념: 카드}}} 형태의 딕셔너리로 주고받습니다.
+    카드 수정/삭제, 토픽 이동 같은 세분화된 연산은 기본적으로 전체 덱을 읽어 고친 뒤
+    다시 저장하며, 더 싸게 처리할 수 있는 백엔드는 이를 재정의합니다.
+
+    덱마다 변경될 때마다 1씩 늘어나는 버전이 있으며, save에 expected_version을 주면
+    현재 버전이 같을 때만 저장하고 다르면 VersionConflictError를 발생시킵니다(compare-and-swap).
+    """
+
+    name = None
+
+    def __init__(self, users_folder, serialization="json"):
+        check_serialization(serialization)
+        self.users_folder = users_folder
+        # 파일에 쓸 때의 직렬화 형식 (읽을 때는 형식을 자동 판별)
+        self.serialization = serialization
+
+    def get_data_folder(self, username):
+        return os.path.join(self.users_folder, username, "data")
+
+    def get_deck_file(self, username):
+        return os.path.join(self.get_data_folder(username), DECK_FILE_NAME)
+
+    # 백엔드별 구현 필요
+    def exists(self, username):
+        raise NotImplementedError
+
+    def load(self, username):
+        raise NotImplementedError
+
+    def load_versioned(self, username):
+        """(덱, 버전)을 함께 반환합니다."""
+        raise NotImplementedError
+
+    def save(self, username, data, expected_version=None):
+        """덱 전체를 저장하고 새 버전을 반환합니다."""
+        raise NotImplementedError
+
+    def get_version(self, username):
+        return self.load_versioned(username)[1]
+
+    def invalidate(self, username):
+        """외부에서 데이터 파일이 바뀌었을 때(임포트 등) 호출합니다."""
+
+    def flush(self, username=None):
+        """미뤄 둔 쓰기가 있으면 바로 디스크에 씁니다. username이 없으면 모든 사용자."""
+
+    # 읽기 도우미
+    def list_domains(self, username):
+        return list(self.load(username).keys())
+
+    def load_domain(self, username, domain):
+        return self.load(username).get(domain, {})
+
+    # 세분화된 변경 연산
+    def _update(self, username, mutate):
+        # 읽은 뒤 다른 세션이 먼저 저장했으면 잠시 기다렸다가 최신 덱에 다시 적용
+        # UPDATE_RETRIES번 모두 충돌하면 VersionConflictError를 그대로 올림
+        for attempt in range(UPDATE_RETRIES):
+            data, version = self.load_versioned(username)
+            result = mutate(data)
+            try:
+                self.save(username, data, expected_version=version)
+                return result
+            except VersionConflictError:
+                if attempt == UPDATE_RETRIES - 1:
+                    raise
+                time.sleep(random.uniform(0, UPDATE_BACKOFF * 2 ** attempt))
+
+    def add_domain(self, username, domain):
+        self._update(username, lambda data: apply_add_domain(data, domain))
+
+    def rename_domain(self, username, old_domain, new_domain):
+        self._update(username, lambda data: apply_rename_domain(data, old_domain, new_domain))
+
+    def delete_domain(self, username, domain):
+        self._update(username, lambda data: apply_delete_domain(data, domain))
+
+    def save_card(self, username, domain, topic, term, card_data):
+        card_data = touch_card(card_data)
+        self._update(username, lambda data: apply_save_card(data, domain, topic, term, card_data))
+
+    def move_card(self, username, domain, topic, term, new_topic, new_term, card_data):
+        card_data = touch_card(card_data)
+        self._update(username, lambda data: apply_move_card(data, domain, topic, term, new_topic, new_term, card_data))
+
+    def delete_card(self, username, domain, topic, term):
+        self._update(username, lambda data: apply_delete_card(data, domain, topic, term))
+
+    def delete_topic(self, username, domain, topic):
+        self._update(username, lambda data: apply_delete_topic(data, domain, topic))
+
+
+# 카드 생성/수정 시각 - 각 카드에 created_at/updated_at으로 함께 저장
+# (샤드 매니페스트의 updated_at과 같은 형식이라 문자열 비교로 정렬됨)
+CARD_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def now_timestamp():
+    return datetime.datetime.now().strftime(CARD_TIMESTAMP_FORMAT)
+
+
+def touch_card(card_data, timestamp=None):
+    """
+    수정 시각을 기록한 카드 사본을 반환합니다.
+    저널에 기록하기 전에 한 번만 호출하므로 저널을 다시 적용해도 같은 시각이 됩니다.
+    """
+    return {**card_data, "updated_at": timestamp or now_timestamp()}
+
+
+def inherit_created_at(card_data, previous):
+    """기존 카드의 생성 시각을 이어받습니다. 새 카드면 수정 시각을 생성 시각으로 씁니다."""
+    if card_data.get("created_at"):
+        return card_data
+    created_at = (previous or {}).get("created_at") or card_data.get("updated_at")
+    if not created_at:
+        return card_data
+    return {**card_data, "created_at": created_at}
+
+
+def summarize_topic(cards):
+    """
+    토픽의 카드 수와 생성/최종 수정 시각을 카드에 저장된 시각으로 구합니다.
+    시각이 없는 예전 카드는 제외하며, 하나도 없으면 시각은 None입니다.
+    """
+    created = [card_data["created_at"] for card_data in cards.values() if card_data.get("created_at")]
+    updated = [card_data["updated_at"] for card_data in cards.values() if card_data.get("updated_at")]
+    return {
+        "card_count": len(cards),
+        "created_at": min(created, default=None),
+        "updated_at": max(updated, default=None),
+    }
+
+
+# 덱 딕셔너리에 대한 변경 연산 (백엔드 공통)
+def apply_add_domain(data, domain):
+    data.setdefault(domain, {})
+
+
+def apply_rename_domain(data, old_domain, new_domain):
+    if old_domain in data:
+        data[new_domain] = data.pop(old_domain)
+
+
+def apply_delete_domain(data, domain):
+    data.pop(domain, None)
+
+
+def apply_save_card(data, domain, topic, term, card_data):
+    cards = data.setdefault(domain, {}).setdefault(topic, {})
+    cards[term] = inherit_created_at(card_data, cards.get(term))
+
+
+def apply_move_card(data, domain, topic, term, new_topic, new_term, card_data):
+    topics = data.setdefault(domain, {})
+    previous = topics.get(topic, {}).get(term)
+    topics.setdefault(new_topic, {})[new_term] = inherit_created_at(card_data, previous)
+    apply_delete_card(data, domain, topic, term)
+
+
+def apply_delete_card(data, domain, topic, term):
+    topics = data.get(domain, {})
+    cards = topics.get(topic)
+    if cards is None:
+        return
+    cards.pop(term, None)
+    # 토픽에 카드가 없으면 토픽도 삭제
+    if not cards:
+        del topics[topic]
+
+
+def apply_delete_topic(data, domain, topic):
+    data.get(domain, {}).pop(topic, None)
+
+
+# 저널에 기록되는 연산 이름 -> 덱 변경 함수
+JOURNAL_OPS = {
+    "add_domain": apply_add_domain,
+    "rename_domain": apply_rename_domain,
+    "delete_domain": apply_delete_domain,
+    "save_card": apply_save_card,
+    "move_card": apply_move_card,
+    "delete_card": apply_delete_card,
+    "delete_topic": apply_delete_topic,
+}
+
+
+class _JsonDeckState:
+    def __init__(self, snapshot_signature, data, version=0):
+        self.snapshot_signature = snapshot_signature
+        self.data = data
+        self.version = version
+        # 저널에서 지금까지 반영한 위치(바이트)
+        self.journal_offset = 0
+        # 저널 첫 줄의 스냅샷 시그니처가 현재 스냅샷과 같은지 여부
+        self.journal_valid = True
+        # 저널에서 반영한 연산 수 (0이면 합칠 필요 없음)
+        self.journal_ops = 0
+
+
+class JsonDeckStorage(DeckStorage):
+    """
+    사용자별 flashcards.json 하나에 덱 전체를 저장하는 기본 백엔드.
+
+    카드 추가/수정/삭제 같은 세분화된 변경은 스냅샷(flashcards.json)을 다시 쓰지 않고
+    옆의 flashcards.journal에 한 줄씩 덧붙이므로 덱 크기와 무관하게 빠릅니다.
+    읽을 때는 스냅샷에 저널을 순서대로 다시 적용하며, 저널이 커지면 백그라운드에서
+    새 스냅샷으로 합치고(compaction) 저널을 비웁니다.
+
+    저널 첫 줄에는 기준이 되는 스냅샷의 시그니처(mtime:size)와 그 스냅샷의 버전을 적어 두고,
+    이후 연산 한 줄마다 버전이 1씩 늘어납니다. 스냅샷이 새로 쓰인 뒤 남아 있는 예전 저널은
+    시그니처가 달라 적용되지 않습니다.
+
+    덱 전체 저장(save)은 바로 쓰지 않고 SAVE_DELAY_SECONDS 동안 모았다가 한 번만 씁니다.
+    그동안의 읽기와 세분화된 변경은 메모리의 최신 상태를 사용하고, 프로세스 종료 시에는
+    남은 쓰기를 모두 내보냅니다. 그 사이 다른 프로세스가 덱을 바꿨으면 쓰기 직전에 병합합니다.
+
+    모든 읽기/쓰기는 flashcards.lock 파일 잠금을 잡고 수행하므로 여러 프로세스가
+    같은 사용자의 저널에 동시에 덧붙여도 서로의 기록을 덮어쓰지 않습니다.
+    """
+
+    name = "json"
+
+    JOURNAL_FILE_NAME = "flashcards.journal"
+    LOCK_FILE_NAME = "flashcards.lock"
+    # 저널이 이 크기를 넘으면 백그라운드에서 스냅샷으로 합침
+    COMPACT_THRESHOLD_BYTES = 256 * 1024
+    # 연속된 저장을 한 번의 쓰기로 합치는 대기 시간
+    SAVE_DELAY_SECONDS = 0.5
+
+    def __init__(self, users_folder, serialization="json"):
+        super().__init__(users_folder, serialization)
+        # 스냅샷 경로 -> _JsonDeckState
+        self._states = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._compacting = set()
+        # 스냅샷 경로 -> (저널 경로, 예약된 타이머, 미루기 전 상태) - 아직 디스크에 쓰지 않은 저장
+        self._pending = {}
+
+    def get_journal_file(self, username):
+        return os.path.join(self.get_data_folder(username), self.JOURNAL_FILE_NAME)
+
+    def _lock_for(self, path):
+        with self._locks_lock:
+            if path not in self._locks:
+                self._locks[path] = InterProcessLock(os.path.join(os.path.dirname(path), self.LOCK_FILE_NAME))
+            return self._locks[path]
+
+    def _refresh(self, path, journal_path):
+        """디스크 상태에 맞게 메모리 상태를 갱신합니다. 잠금을 잡은 상태에서 호출해야 합니다."""
+        if path in self._pending:
+            # 아직 쓰지 않은 저장이 디스크보다 최신
+            return self._states[path]
+
+        snapshot_signature = signature_text(path)
+        if not snapshot_signature:
+            self._states.pop(path, None)
+            raise FileNotFoundError(path)
+
+        try:
+            journal_size = os.path.getsize(journal_path)
+        except FileNotFoundError:
+            journal_size = 0
+
+        state = self._states.get(path)
+        # 스냅샷이 바뀌었거나, 다른 프로세스가 저널을 합쳐서 저널이 줄어든 경우 처음부터 다시 읽기
+        if (state is None or state.snapshot_signature != snapshot_signature
+                or journal_size < state.journal_offset):
+            state = _JsonDeckState(snapshot_signature, read_data_file(path))
+            self._states[path] = state
+
+        if journal_size > state.journal_offset:
+            self._replay_journal(state, journal_path)
+        return state
+
+    def _replay_journal(self, state, journal_path):
+        with open(journal_path, "rb") as f:
+            f.seek(state.journal_offset)
+            chunk = f.read()
+
+        offset = state.journal_offset
+        if offset == 0:
+            # 첫 줄(기준 스냅샷 시그니처)을 확인하기 전까지는 적용하지 않음
+            state.journal_valid = False
+        for line in chunk.splitlines(keepends=True):
+            # 기록 도중 중단된 마지막 줄은 다음 기록 시 덮어씀
+            if not line.endswith(b"\n"):
+                break
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            offset += len(line)
+
+            if "snapshot" in entry:
+                state.journal_valid = entry["snapshot"] == state.snapshot_signature
+                state.version = max(state.version, entry.get("version", 0))
+                continue
+            # 적용하지 않는 예전 저널의 연산도 버전은 올려서 버전이 되돌아가지 않게 함
+            state.version += 1
+            if state.journal_valid and entry.get("op") in JOURNAL_OPS:
+                state.journal_ops += 1
+                try:
+                    JOURNAL_OPS[entry["op"]](state.data, **entry.get("args", {}))
+                except (KeyError, TypeError):
+                    # 이미 반영된 연산(예: 사라진 도메인 이름 변경)은 무시
+                    pass
+        state.journal_offset = offset
+
+    def exists(self, username):
+        path = self.get_deck_file(username)
+        return path in self._pending or os.path.exists(path)
+
+    def load(self, username):
+        return self.load_versioned(username)[0]
+
+    def load_versioned(self, username):
+        path = self.get_deck_file(username)
+        with self._lock_for(path):
+            state = self._refresh(path, self.get_journal_file(username))
+            return copy_deck(state.data), state.version
+
+    def get_version(self, username):
+        path = self.get_deck_file(username)
+        with self._lock_for(path):
+            return self._refresh(path, self.get_journal_file(username)).version
+
+    def list_domains(self, username):
+        path = self.get_deck_file(username)
+        with self._lock_for(path):
+            return list(self._refresh(path, self.get_journal_file(username)).data.keys())
+
+    def load_domain(self, username, domain):
+        # 덱 전체가 아니라 해당 도메인만 복사
+        path = self.get_deck_file(username)
+        with self._lock_for(path):
+            state = self._refresh(path, self.get_journal_file(username))
+            return copy_topics(state.data.get(domain, {}))
+
+    def save(self, username, data, expected_version=None):
+        path = self.get_deck_file(username)
+        journal_path = self.get_journal_file(username)
+        with self._lock_for(path):
+            try:
+                previous = self._refresh(path, journal_path)
+            except FileNotFoundError:
+                previous = None
+            current_version = previous.version if previous else 0
+            if expected_version is not None and expected_version != current_version:
+                raise VersionConflictError(current_version)
+
+            self._states[path] = _JsonDeckState(
+                previous.snapshot_signature if previous else "", copy_deck(data), current_version + 1)
+            if path in self._pending:
+                # 이미 예약된 쓰기가 이 내용까지 함께 씀
+                return current_version + 1
+            timer = threading.Timer(self.SAVE_DELAY_SECONDS, self._flush_path, args=(path,))
+            timer.daemon = True
+            self._pending[path] = (journal_path, timer, previous)
+            timer.start()
+            return current_version + 1
+
+    def _flush_path(self, path):
+        with self._lock_for(path):
+            pending = self._pending.pop(path, None)
+            if pending is None:
+                return
+            journal_path, timer, base = pending
+            timer.cancel()
+            state = self._states[path]
+            data, version = state.data, state.version
+
+            # 미뤄 두는 동안 다른 프로세스가 덱을 바꿨으면 그 변경 위에 병합
+            if base is not None and self._changed_on_disk(base, path, journal_path):
+                self._states.pop(path, None)
+                try:
+                    theirs = self._refresh(path, journal_path)
+                except FileNotFoundError:
+                    theirs = None
+                if theirs is not None:
+                    data = merge_decks(base.data, data, theirs.data)
+                    version = max(version, theirs.version + 1)
+            self._write_snapshot(path, journal_path, data, version)
+
+    @staticmethod
+    def _changed_on_disk(state, path, journal_path):
+        try:
+            journal_size = os.path.getsize(journal_path)
+        except FileNotFoundError:
+            journal_size = 0
+        return signature_text(path) != state.snapshot_signature or journal_size != state.journal_offset
+
+    def flush(self, username=None):
+        if username is not None:
+            self._flush_path(self.get_deck_file(username))
+            return
+        for path in list(self._pending):
+            self._flush_path(path)
+
+    def _write_snapshot(self, path, journal_path, data, version):
+        replace_data_file(path, data, self.serialization)
+        # 새 스냅샷이 저널 내용을 모두 포함하므로 저널을 새 스냅샷 기준의 첫 줄만 남기고 비움
+        # (교체 전에 중단되어도 예전 저널 첫 줄의 시그니처가 달라 적용되지 않음)
+        state = _JsonDeckState(signature_text(path), data, version)
+        header = (json.dumps({"snapshot": state.snapshot_signature, "version": version}) + "\n").encode("utf-8")
+        replace_file(journal_path, header)
+        state.journal_offset = len(header)
+        self._states[path] = state
+
+    def invalidate(self, username):
+        path = self.get_deck_file(username)
+        with self._lock_for(path):
+            # 파일이 외부에서 통째로 바뀌었으므로 미뤄 둔 쓰기도 버림
+            pending = self._pending.pop(path, None)
+            if pending is not None:
+                pending[1].cancel()
+            self._states.pop(path, None)
+
+    def _append(self, username, op, **args):
+        path = self.get_deck_file(username)
+        journal_path = self.get_journal_file(username)
+
+        with self._lock_for(path):
+            state = self._refresh(path, journal_path)
+            if path in self._pending:
+                # 예약된 스냅샷 쓰기에 함께 포함되므로 저널에 남기지 않음
+                JOURNAL_OPS[op](state.data, **args)
+                state.version += 1
+                return
+
+            lines = []
+            if state.journal_offset == 0 or not state.journal_valid:
+                # 새 저널 시작 (예전 저널이 남아 있으면 버림)
+                lines.append(json.dumps({"snapshot": state.snapshot_signature, "version": state.version}))
+                mode = "wb"
+            else:
+                mode = "r+b"
+            lines.append(json.dumps({"op": op, "args": args}, ensure_ascii=False))
+            payload = ("\n".join(lines) + "\n").encode("utf-8")
+
+            with open(journal_path, mode) as f:
+                if mode == "r+b":
+                    # 중단된 마지막 줄이 있으면 그 위치부터 덮어씀
+                    f.seek(state.journal_offset)
+                    f.truncate()
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if mode == "wb":
+                state.journal_offset = 0
+                state.journal_valid = True
+            state.journal_offset += len(payload)
+            state.journal_ops += 1
+            state.version += 1
+            JOURNAL_OPS[op](state.data, **args)
+
+            needs_compaction = state.journal_offset > self.COMPACT_THRESHOLD_BYTES
+
+        if needs_compaction:
+            self._schedule_compaction(username)
+
+    def _schedule_compaction(self, username):
+        path = self.get_deck_file(username)
+        with self._locks_lock:
+            if path in self._compacting:
+                return
+            self._compacting.add(path)
+
+        def run():
+            try:
+                self.compact(username)
+            except Exception:
+                # 합치기에 실패해도 저널이 남아 있으므로 데이터는 안전함
+                pass
+            finally:
+                with self._locks_lock:
+                    self._compacting.discard(path)
+
+        threading.Thread(target=run, name=f"deck-compaction-{username}", daemon=True).start()
+
+    def compact(self, username):
+        """저널을 반영한 새 스냅샷을 쓰고 저널을 비웁니다."""
+        path = self.get_deck_file(username)
+        journal_path = self.get_journal_file(username)
+        with self._lock_for(path):
+            if path in self._pending:
+                self._flush_path(path)
+                return
+            state = self._refresh(path, journal_path)
+            if state.journal_ops == 0:
+                return
+            self._write_snapshot(path, journal_path, state.data, state.version)
+
+    # 세분화된 변경 연산 - 저널에 한 줄 추가
+    def add_domain(self, username, domain):
+        self._append(username, "add_domain", domain=domain)
+
+    def rename_domain(self, username, old_domain, new_domain):
+        self._append(username, "rename_domain", old_domain=old_domain, new_domain=new_domain)
+
+    def delete_domain(self, username, domain):
+        self._append(username, "delete_domain", domain=domain)
+
+    def save_card(self, username, domain, topic, term, card_data):
+        self._append(username, "save_card", domain=domain, topic=topic, term=term, card_data=touch_card(card_data))
+
+    def move_card(self, username, domain, topic, term, new_topic, new_term, card_data):
+        self._append(username, "move_card", domain=domain, topic=topic, term=term,
+                     new_topic=new_topic, new_term=new_term, card_data=touch_card(card_data))
+
+    def delete_card(self, username, domain, topic, term):
+        self._append(username, "delete_card", domain=domain, topic=topic, term=term)
+
+    def delete_topic(self, username, domain, topic):
+        self._append(username, "delete_topic", domain=domain, topic=topic)
+
+
+class SqliteDeckStorage(DeckStorage):
+    """
+    사용자별 flashcards.db(SQLite)에 도메인/토픽/카드를 행 단위로 저장하는 백엔드.
+    카드 수정/삭제와 토픽 이동은 해당 행만 갱신하므로 덱 크기와 무관하게 비용이 일정합니다.
+    같은 폴더의 flashcards.json이 마지막으로 가져온 뒤 바뀌었으면(최초 실행, 백업 임포트 등)
+    자동으로 다시 가져옵니다.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS domains (
+        name TEXT PRIMARY KEY
+    );
+    CREATE TABLE IF NOT EXISTS topics (
+        domain TEXT NOT NULL,
+        name TEXT NOT NULL,
+        PRIMARY KEY (domain, name)
+    );
+    CREATE TABLE IF NOT EXISTS cards (
+        domain TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        term TEXT NOT NULL,
+        data TEXT NOT NULL,
+        PRIMARY KEY (domain, topic, term)
+    );
+    CREATE INDEX IF NOT EXISTS idx_topics_domain ON topics (domain);
+    CREATE INDEX IF NOT EXISTS idx_cards_domain ON cards (domain);
+    CREATE INDEX IF NOT EXISTS idx_cards_topic ON cards (domain, topic);
+    """
+
+    def __init__(self, users_folder, serialization="json"):
+        super().__init__(users_folder, serialization)
+        # db 경로 -> (버전, data)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def get_db_file(self, username):
+        return os.path.join(self.get_data_folder(username), SQLITE_FILE_NAME)
+
+    def _connect(self, username):
+        db_path = self.get_db_file(username)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(self.SCHEMA)
+        self._sync_from_json(conn, username)
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self, username):
+        conn = self._connect(username)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                self._bump_version(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _get_meta(conn, key, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(conn, key, value):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    def _bump_version(self, conn):
+        version = int(self._get_meta(conn, "version", 0)) + 1
+        self._set_meta(conn, "version", version)
+        return version
+
+    def _sync_from_json(self, conn, username):
+        # flashcards.json(과 저널)이 마지막으로 가져온 시점과 다르면 다시 가져오기
+        json_storage = get_deck_storage(JsonDeckStorage.name, self.users_folder)
+        if not json_storage.exists(username):
+            return
+        signature = "%s|%s" % (
+            signature_text(json_storage.get_deck_file(username)),
+            signature_text(json_storage.get_journal_file(username)),
+        )
+        if self._get_meta(conn, "json_signature") == signature:
+            return
+
+        data = json_storage.load(username)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._replace_all(conn, data)
+            self._set_meta(conn, "json_signature", signature)
+            self._bump_version(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _replace_all(conn, data):
+        conn.execute("DELETE FROM cards")
+        conn.execute("DELETE FROM topics")
+        conn.execute("DELETE FROM domains")
+        conn.executemany("INSERT INTO domains (name) VALUES (?)", [(domain,) for domain in data])
+        conn.executemany(
+            "INSERT INTO topics (domain, name) VALUES (?, ?)",
+            [(domain, topic) for domain, topics in data.items() for topic in topics],
+        )
+        conn.executemany(
+            "INSERT INTO cards (domain, topic, term, data) VALUES (?, ?, ?, ?)",
+            [
+                (domain, topic, term, json.dumps(card_data, ensure_ascii=False))
+                for domain, topics in data.items()
+                for topic, cards in topics.items()
+                for term, card_data in cards.items()
+            ],
+        )
+
+    @staticmethod
+    def _read_rows(conn, domain=None):
+        where, params = ("WHERE domain = ?", (domain,)) if domain is not None else ("", ())
+        data = {}
+        if domain is None:
+            for (name,) in conn.execute("SELECT name FROM domains ORDER BY rowid"):
+                data[name] = {}
+        for topic_domain, topic in conn.execute(f"SELECT domain, name FROM topics {where} ORDER BY rowid", params):
+            data.setdefault(topic_domain, {})[topic] = {}
+        for card_domain, topic, term, card_json in conn.execute(
+                f"SELECT domain, topic, term, data FROM cards {where} ORDER BY rowid", params):
+            data.setdefault(card_domain, {}).setdefault(topic, {})[term] = json.loads(card_json)
+        return data
+
+    def exists(self, username):
+        return os.path.exists(self.get_db_file(username)) or os.path.exists(self.get_deck_file(username))
+
+    def load(self, username):
+        return self.load_versioned(username)[0]
+
+    def load_versioned(self, username):
+        if not self.exists(username):
+            raise FileNotFoundError(self.get_db_file(username))
+
+        db_path = self.get_db_file(username)
+        conn = self._connect(username)
+        try:
+            # 버전과 행을 같은 읽기 트랜잭션에서 읽음
+            conn.execute("BEGIN")
+            try:
+                version = int(self._get_meta(conn, "version", 0))
+                with self._cache_lock:
+                    cached = self._cache.get(db_path)
+                if cached and cached[0] == version:
+                    return copy_deck(cached[1]), version
+
+                data = self._read_rows(conn)
+            finally:
+                conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        with self._cache_lock:
+            self._cache[db_path] = (version, data)
+        return copy_deck(data), version
+
+    def get_version(self, username):
+        conn = self._connect(username)
+        try:
+            return int(self._get_meta(conn, "version", 0))
+        finally:
+            conn.close()
+
+    def save(self, username, data, expected_version=None):
+        with self._transaction(username) as conn:
+            # BEGIN IMMEDIATE로 쓰기 잠금을 잡은 뒤 비교하므로 비교와 저장 사이에 끼어들 수 없음
+            current_version = int(self._get_meta(conn, "version", 0))
+            if expected_version is not None and expected_version != current_version:
+                raise VersionConflictError(current_version)
+            self._replace_all(conn, data)
+        return current_version + 1
+
+    def invalidate(self, username):
+        with self._cache_lock:
+            self._cache.pop(self.get_db_file(username), None)
+
+    def list_domains(self, username):
+        conn = self._connect(username)
+        try:
+            return [name for (name,) in conn.execute("SELECT name FROM domains ORDER BY rowid")]
+        finally:
+            conn.close()
+
+    def load_domain(self, username, domain):
+        conn = self._connect(username)
+        try:
+            return self._read_rows(conn, domain).get(domain, {})
+        finally:
+            conn.close()
+
+    # 세분화된 변경 연산 - 해당 행만 갱신
+    @staticmethod
+    def _ensure_topic(conn, domain, topic):
+        conn.execute("INSERT OR IGNORE INTO domains (name) VALUES (?)", (domain,))
+        conn.execute("INSERT OR IGNORE INTO topics (domain, name) VALUES (?, ?)", (domain, topic))
+
+    @staticmethod
+    def _drop_topic_if_empty(conn, domain, topic):
+        conn.execute(
+            "DELETE FROM topics WHERE domain = ? AND name = ? "
+            "AND NOT EXISTS (SELECT 1 FROM cards WHERE domain = ? AND topic = ?)",
+            (domain, topic, domain, topic),
+        )
+
+    def add_domain(self, username, domain):
+        with self._transaction(username) as conn:
+            conn.execute("INSERT OR IGNORE INTO domains (name) VALUES (?)", (domain,))
+
+    def rename_domain(self, username, old_domain, new_domain):
+        with self._transaction(username) as conn:
+            # 기존 동작과 같이 이름이 바뀐 도메인은 목록 맨 뒤로 이동
+            conn.execute("DELETE FROM domains WHERE name = ?", (old_domain,))
+            conn.execute("INSERT OR IGNORE INTO domains (name) VALUES (?)", (new_domain,))
+            conn.execute("UPDATE topics SET domain = ? WHERE domain = ?", (new_domain, old_domain))
+            conn.execute("UPDATE cards SET domain = ? WHERE domain = ?", (new_domain, old_domain))
+
+    def delete_domain(self, username, domain):
+        with self._transaction(username) as conn:
+            conn.execute("DELETE FROM cards WHERE domain = ?", (domain,))
+            conn.execute("DELETE FROM topics WHERE domain = ?", (domain,))
+            conn.execute("DELETE FROM domains WHERE name = ?", (domain,))
+
+    @staticmethod
+    def _read_card(conn, domain, topic, term):
+        row = conn.execute(
+            "SELECT data FROM cards WHERE domain = ? AND topic = ? AND term = ?",
+            (domain, topic, term),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_card(self, username, domain, topic, term, card_data):
+        with self._transaction(username) as conn:
+            card_data = inherit_created_at(touch_card(card_data), self._read_card(conn, domain, topic, term))
+            self._ensure_topic(conn, domain, topic)
+            conn.execute(
+                "INSERT INTO cards (domain, topic, term, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (domain, topic, term) DO UPDATE SET data = excluded.data",
+                (domain, topic, term, json.dumps(card_data, ensure_ascii=False)),
+            )
+
+    def move_card(self, username, domain, topic, term, new_topic, new_term, card_data):
+        with self._transaction(username) as conn:
+            card_data = inherit_created_at(touch_card(card_data), self._read_card(conn, domain, topic, term))
+            self._ensure_topic(conn, domain, new_topic)
+            conn.execute(
+                "DELETE FROM cards WHERE domain = ? AND topic = ? AND term = ?",
+                (domain, new_topic, new_term),
+            )
+            cursor = conn.execute(
+                "UPDATE cards SET topic = ?, term = ?, data = ? "
+                "WHERE domain = ? AND topic = ? AND term = ?",
+                (new_topic, new_term, json.dumps(card_data, ensure_ascii=False), domain, topic, term),
+            )
+            if cursor.rowcount == 0:
+                conn.execute(
+                    "INSERT INTO cards (domain, topic, term, data) VALUES (?, ?, ?, ?)",
+                    (domain, new_topic, new_term, json.dumps(card_data, ensure_ascii=False)),
+                )
+            self._drop_topic_if_empty(conn, domain, topic)
+
+    def delete_card(self, username, domain, topic, term):
+        with self._transaction(username) as conn:
+            conn.execute(
+                "DELETE FROM cards WHERE domain = ? AND topic = ? AND term = ?",
+                (domain, topic, term),
+            )
+            self._drop_topic_if_empty(conn, domain, topic)
+
+    def delete_topic(self, username, domain, topic):
+        with self._transaction(username) as conn:
+            conn.execute("DELETE FROM cards WHERE domain = ? AND topic = ?", (domain, topic))
+            conn.execute("DELETE FROM topics WHERE domain = ? AND name = ?", (domain, topic))
+
+
+class ShardedDeckStorage(DeckStorage):
+    """
+    도메인마다 파일 하나(data/domains/<id>.json)와 작은 매니페스트(data/domains/manifest.json)에
+    나누어 저장하는 백엔드.
+
+    매니페스트에는 도메인 순서와 이름, 샤드 파일명, 토픽/카드 수, 최종 수정 시각만 들어 있으므로
+    도메인 목록은 매니페스트만 읽고, 한 도메인만 다루는 화면은 해당 샤드만 읽습니다.
+    카드 변경은 해당 도메인의 샤드만 다시 쓰며, 도메인 이름 변경은 매니페스트만 고칩니다.
+    flashcards.json(과 저널)이 마지막으로 가져온 뒤 바뀌었으면 자동으로 다시 가져옵니다.
+    덱 버전은 매니페스트에 저장하며, 모든 변경은 domains.lock 파일 잠금 안에서 수행합니다.
+    """
+
+    name = "sharded"
+
+    SHARD_FOLDER_NAME = "domains"
+    MANIFEST_FILE_NAME = "manifest.json"
+    LOCK_FILE_NAME = "domains.lock"
+
+    def __init__(self, users_folder, serialization="json"):
+        super().__init__(users_folder, serialization)
+        # 파일 경로 -> (시그니처, 파싱된 내용)
+        self._cache = {}
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def get_shard_folder(self, username):
+        return os.path.join(self.get_data_folder(username), self.SHARD_FOLDER_NAME)
+
+    def get_manifest_file(self, username):
+        return os.path.join(self.get_shard_folder(username), self.MANIFEST_FILE_NAME)
+
+    def _lock_for(self, username):
+        with self._locks_lock:
+            if username not in self._locks:
+                self._locks[username] = InterProcessLock(
+                    os.path.join(self.get_data_folder(username), self.LOCK_FILE_NAME))
+            return self._locks[username]
+
+    def _read_file(self, path, default=None):
+        signature = signature_text(path)
+        if not signature:
+            self._cache.pop(path, None)
+            if default is not None:
+                return default
+            raise FileNotFoundError(path)
+        cached = self._cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        value = read_data_file(path)
+        self._cache[path] = (signature, value)
+        return value
+
+    def _write_file(self, path, value):
+        replace_data_file(path, value, self.serialization)
+        self._cache[path] = (signature_text(path), value)
+
+    @staticmethod
+    def _summarize(entry, topics):
+        entry["topic_count"] = len(topics)
+        entry["card_count"] = sum(len(cards) for cards in topics.values())
+        entry["updated_at"] = now_timestamp()
+        return entry
+
+    def _load_manifest(self, username):
+        """매니페스트를 읽습니다. 잠금을 잡은 상태에서 호출해야 합니다."""
+        self._sync_from_json(username)
+        return self._read_file(self.get_manifest_file(username))
+
+    def _sync_from_json(self, username):
+        json_storage = get_deck_storage(JsonDeckStorage.name, self.users_folder)
+        if not json_storage.exists(username):
+            return
+        signature = "%s|%s" % (
+            signature_text(json_storage.get_deck_file(username)),
+            signature_text(json_storage.get_journal_file(username)),
+        )
+        manifest = self._read_file(self.get_manifest_file(username), default={})
+        if manifest.get("json_signature") == signature:
+            return
+        self._write_all(username, json_storage.load(username), json_signature=signature)
+
+    def _find_entry(self, manifest, domain):
+        for entry in manifest["domains"]:
+            if entry["name"] == domain:
+                return entry
+        return None
+
+    def _shard_path(self, username, entry):
+        return os.path.join(self.get_shard_folder(username), entry["file"])
+
+    def _write_all(self, username, data, json_signature=None):
+        manifest = self._read_file(self.get_manifest_file(username), default={"domains": []})
+        old_entries = {entry["name"]: entry for entry in manifest.get("domains", [])}
+
+        entries = []
+        for domain, topics in data.items():
+            entry = dict(old_entries.pop(domain, None) or {"name": domain, "file": f"{uuid.uuid4().hex}.json"})
+            shard_path = self._shard_path(username, entry)
+            # 내용이 바뀐 도메인의 샤드만 다시 씀
+            if self._read_file(shard_path, default={"__missing__": True}) != topics:
+                self._write_file(shard_path, copy_topics(topics))
+                self._summarize(entry, topics)
+            entries.append(entry)
+
+        new_manifest = {"domains": entries, "version": manifest.get("version", 0) + 1}
+        if json_signature is not None:
+            new_manifest["json_signature"] = json_signature
+        elif "json_signature" in manifest:
+            new_manifest["json_signature"] = manifest["json_signature"]
+        self._write_file(self.get_manifest_file(username), new_manifest)
+
+        # 삭제된 도메인의 샤드 정리
+        for entry in old_entries.values():
+            self._remove_shard(username, entry)
+
+    def _write_manifest(self, username, manifest, entries):
+        self._write_file(self.get_manifest_file(username),
+                         {**manifest, "domains": entries, "version": manifest.get("version", 0) + 1})
+
+    def _remove_shard(self, username, entry):
+        shard_path = self._shard_path(username, entry)
+        self._cache.pop(shard_path, None)
+        try:
+            os.remove(shard_path)
+        except FileNotFoundError:
+            pass
+
+    def exists(self, username):
+        json_storage = get_deck_storage(JsonDeckStorage.name, self.users_folder)
+        return os.path.exists(self.get_manifest_file(username)) or json_storage.exists(username)
+
+    def load(self, username):
+        return self.load_versioned(username)[0]
+
+    def load_versioned(self, username):
+        with self._lock_for(username):
+            manifest = self._load_manifest(username)
+            data = {
+                entry["name"]: copy_topics(self._read_file(self._shard_path(username, entry), default={}))
+                for entry in manifest["domains"]
+            }
+            return data, manifest.get("version", 0)
+
+    def get_version(self, username):
+        with self._lock_for(username):
+            return self._load_manifest(username).get("version", 0)
+
+    def save(self, username, data, expected_version=None):
+        with self._lock_for(username):
+            self._sync_from_json(username)
+            current_version = self._read_file(self.get_manifest_file(username), default={}).get("version", 0)
+            if expected_version is not None and expected_version != current_version:
+                raise VersionConflictError(current_version)
+            self._write_all(username, data)
+            return current_version + 1
+
+    def invalidate(self, username):
+        prefix = self.get_shard_folder(username) + os.sep
+        with self._lock_for(username):
+            for path in [path for path in self._cache if path.startswith(prefix)]:
+                self._cache.pop(path, None)
+
+    def list_domains(self, username):
+        with self._lock_for(username):
+            return [entry["name"] for entry in self._load_manifest(username)["domains"]]
+
+    def get_manifest(self, username):
+        """도메인별 토픽/카드 수와 최종 수정 시각 목록을 반환합니다."""
+        with self._lock_for(username):
+            return [dict(entry) for entry in self._load_manifest(username)["domains"]]
+
+    def load_domain(self, username, domain):
+        with self._lock_for(username):
+            entry = self._find_entry(self._load_manifest(username), domain)
+            if entry is None:
+                return {}
+            return copy_topics(self._read_file(self._shard_path(username, entry), default={}))
+
+    # 세분화된 변경 연산 - 해당 도메인의 샤드와 매니페스트만 갱신
+    def _update_domain(self, username, domain, mutate):
+        with self._lock_for(username):
+            manifest = self._load_manifest(username)
+            entry = self._find_entry(manifest, domain)
+            if entry is None:
+                entry = {"name": domain, "file": f"{uuid.uuid4().hex}.json"}
+                manifest = {**manifest, "domains": manifest["domains"] + [entry]}
+                topics = {}
+            else:
+                topics = copy_topics(self._read_file(self._shard_path(username, entry), default={}))
+
+            data = {domain: topics}
+            mutate(data)
+            topics = data[domain]
+
+            self._write_file(self._shard_path(username, entry), topics)
+            entries = [self._summarize(dict(entry), topics) if item is entry else item for item in manifest["domains"]]
+            self._write_manifest(username, manifest, entries)
+
+    def add_domain(self, username, domain):
+        with self._lock_for(username):
+            if domain not in self.list_domains(username):
+                self._update_domain(username, domain, lambda data: None)
+
+    def rename_domain(self, username, old_domain, new_domain):
+        with self._lock_for(username):
+            manifest = self._load_manifest(username)
+            entry = self._find_entry(manifest, old_domain)
+            if entry is None:
+                return
+            # 기존 동작과 같이 이름이 바뀐 도메인은 목록 맨 뒤로 이동 (샤드 파일은 그대로)
+            entries = [item for item in manifest["domains"] if item is not entry]
+            entries.append({**entry, "name": new_domain})
+            self._write_manifest(username, manifest, entries)
+
+    def delete_domain(self, username, domain):
+        with self._lock_for(username):
+            manifest = self._load_manifest(username)
+            entry = self._find_entry(manifest, domain)
+            if entry is None:
+                return
+            entries = [item for item in manifest["domains"] if item is not entry]
+            self._write_manifest(username, manifest, entries)
+            self._remove_shard(username, entry)
+
+    def save_card(self, username, domain, topic, term, card_data):
+        card_data = touch_card(card_data)
+        self._update_domain(username, domain, lambda data: apply_save_card(data, domain, topic, term, card_data))
+
+    def move_card(self, username, domain, topic, term, new_topic, new_term, card_data):
+        card_data = touch_card(card_data)
+        self._update_domain(username, domain, lambda data: apply_move_card(data, domain, topic, term, new_topic, new_term, card_data))
+
+    def delete_card(self, username, domain, topic, term):
+        self._update_domain(username, domain, lambda data: apply_delete_card(data, domain, topic, term))
+
+    def delete_topic(self, username, domain, topic):
+        self._update_domain(username, domain, lambda data: apply_delete_topic(data, domain, topic))
+
+
+STORAGE_BACKENDS = {
+    JsonDeckStorage.name: JsonDeckStorage,
+    SqliteDeckStorage.name: SqliteDeckStorage,
+    ShardedDeckStorage.name: ShardedDeckStorage,
+}
+
+# (백엔드 이름, users 폴더) -> 저장소 인스턴스
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_deck_storage(backend, users_folder, serialization=None):
+    """
+    백엔드 이름(json | sqlite | sharded)에 해당하는 저장소를 프로세스 단위로 하나씩 만들어 반환합니다.
+    serialization을 지정하면 이후 그 저장소가 파일을 쓸 때 해당 형식을 사용합니다.
+    """
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"지원하지 않는 저장소 백엔드입니다: {backend} (사용 가능: {', '.join(STORAGE_BACKENDS)})")
+    if serialization is not None:
+        check_serialization(serialization)
+
+    key = (backend, os.path.abspath(users_folder))
+    with _storages_lock:
+        if key not in _storages:
+            _storages[key] = STORAGE_BACKENDS[backend](users_folder)
+        if serialization is not None:
+            _storages[key].serialization = serialization
+        return _storages[key]
+
+
+# ---------------------------------------------------------------------------
+# 사용자 목록 (users.json)
+# ---------------------------------------------------------------------------
+
+class UserStore:
+    """
+    users.json({아이디: 사용자 정보})을 다루는 저장소.
+
+    파싱한 내용과 이름 -> 아이디 목록 색인을 파일 시그니처(mtime:size)가 바뀔 때까지 메모리에 두므로
+    로그인/아이디 찾기가 파일을 다시 읽거나 전체 사용자를 훑지 않습니다.
+    변경은 파일 잠금 안에서 최신 내용을 다시 확인한 뒤 원자적으로 교체하므로,
+    동시에 가입해도 서로의 항목을 덮어쓰지 않습니다.
+    """
+
+    def __init__(self, users_file):
+        self.users_file = users_file
+        self._lock = InterProcessLock(f"{users_file}.lock")
+        self._signature = None
+        self._users = {}
+        self._name_index = {}
+
+    def _refresh(self):
+        """잠금을 잡은 상태에서 호출해야 합니다."""
+        signature = signature_text(self.users_file)
+        if signature == self._signature:
+            return
+        try:
+            users = read_data_file(self.users_file) if signature else {}
+        except ValueError:
+            # 손상된 파일은 빈 목록으로 취급 (기존 동작과 동일)
+            users = {}
+        self._set_users(users, signature)
+
+    def _set_users(self, users, signature):
+        name_index = {}
+        for username, user_data in users.items():
+            name_index.setdefault(user_data.get("name"), []).append(username)
+        self._users = users
+        self._name_index = name_index
+        self._signature = signature
+
+    def ensure_file(self):
+        with self._lock:
+            if not os.path.exists(self.users_file):
+                replace_data_file(self.users_file, {})
+
+    def get(self, username):
+        """사용자 정보 사본을 반환합니다. 없으면 None."""
+        with self._lock:
+            self._refresh()
+            user_data = self._users.get(username)
+            return dict(user_data) if user_data is not None else None
+
+    def find_by_name(self, name):
+        with self._lock:
+            self._refresh()
+            return list(self._name_index.get(name, []))
+
+    def _modify(self, mutate):
+        with self._lock:
+            self._refresh()
+            users = dict(self._users)
+            result = mutate(users)
+            if result is False:
+                return False
+            replace_data_file(self.users_file, users)
+            self._set_users(users, signature_text(self.users_file))
+            return True
+
+    def add(self, username, user_data):
+        """새 사용자를 추가합니다. 이미 있는 아이디면 False."""
+        def mutate(users):
+            if username in users:
+                return False
+            users[username] = dict(user_data)
+        return self._modify(mutate)
+
+    def update(self, username, **fields):
+        def mutate(users):
+            if username not in users:
+                return False
+            users[username] = {**users[username], **fields}
+        return self._modify(mutate)
+
+    def delete(self, username):
+        def mutate(users):
+            if username not in users:
+                return False
+            del users[username]
+        return self._modify(mutate)
+
+
+# users.json 절대 경로 -> UserStore
+_user_stores = {}
+
+
+def get_user_store(users_file):
+    """users.json 하나당 프로세스 단위로 하나의 UserStore를 반환합니다."""
+    key = os.path.abspath(users_file)
+    with _storages_lock:
+        if key not in _user_stores:
+            _user_stores[key] = UserStore(users_file)
+        return _user_stores[key]
+
+
+def flush_all():
+    """모든 저장소의 미뤄 둔 쓰기를 디스크에 씁니다. 프로세스 종료 시 자동으로 호출됩니다."""
+    with _storages_lock:
+        storages = list(_storages.values())
+    for deck_storage in storages:
+        deck_storage.flush()
+
+
+atexit.register(flush_all)
+
+
+def migrate_user(users_folder, username, target="sqlite", source="json", serialization=None):
+    """
+    한 사용자의 덱을 source 백엔드에서 target 백엔드로 옮깁니다.
+    원본 파일은 삭제하지 않으므로 설정을 되돌리면 이전 백엔드를 그대로 쓸 수 있습니다.
+    source와 target이 같으면 serialization 형식으로 다시 저장하는 변환이 됩니다.
+
+    Returns:
+    --------
+    int
+        옮긴 카드 수
+    """
+    data = get_deck_storage(source, users_folder).load(username)
+    target_storage = get_deck_storage(target, users_folder, serialization)
+    target_storage.save(username, data)
+    target_storage.flush(username)
+    return sum(len(cards) for topics in data.values() for cards in topics.values())
+
+
+def backfill_timestamps(users_folder, username, backend="json"):
+    """
+    생성/수정 시각이 없는 예전 카드에 시각을 채웁니다.
+    토픽 이미지 폴더가 있으면 그 수정 시각을, 없으면 덱 데이터 폴더의 수정 시각을 씁니다.
+
+    Returns:
+    --------
+    int
+        시각을 채운 카드 수
+    """
+    deck_storage = get_deck_storage(backend, users_folder)
+    images_folder = os.path.join(users_folder, username, "images")
+
+    def folder_timestamp(path):
+        return datetime.datetime.fromtimestamp(os.path.getmtime(path)).strftime(CARD_TIMESTAMP_FORMAT)
+
+    fallback = folder_timestamp(deck_storage.get_data_folder(username))
+
+    def mutate(data):
+        stamped = 0
+        for domain, topics in data.items():
+            for topic, cards in topics.items():
+                missing = [term for term, card_data in cards.items()
+                           if not card_data.get("created_at") or not card_data.get("updated_at")]
+                if not missing:
+                    continue
+                topic_folder = os.path.join(images_folder, domain, topic)
+                timestamp = folder_timestamp(topic_folder) if os.path.isdir(topic_folder) else fallback
+                for term in missing:
+                    card_data = cards[term]
+                    card_data.setdefault("updated_at", timestamp)
+                    card_data.setdefault("created_at", card_data["updated_at"])
+                    stamped += 1
+        return stamped
+
+    stamped = deck_storage._update(username, mutate)
+    deck_storage.flush(username)
+    return stamped
+
+
+def list_usernames(users_folder):
+    if not os.path.isdir(users_folder):
+        return []
+    return sorted(
+        name for name in os.listdir(users_folder)
+        if os.path.isdir(os.path.join(users_folder, name, "data"))
+    )
+
+
+def make_sample_deck(card_count, seed=0):
+    """벤치마크용 임의 덱. 기본 도메인 9개에 토픽당 카드 20장씩 나누어 담습니다."""
+    rng = random.Random(seed)
+    words = ["데이터", "모델", "보안", "테스트", "아키텍처", "품질", "프로세스", "네트워크", "알고리즘", "거버넌스",
+             "API", "CI/CD", "MSA", "OWASP", "ISO/IEC 25010", "DevOps", "LLM", "RAG"]
+    domains = ["SW공학", "SW테스트", "IT경영/전력", "DB", "빅데이터분석", "인공지능", "보안", "신기술", "법/제도"]
+    data = {domain: {} for domain in domains}
+    for i in range(card_count):
+        domain = domains[i % len(domains)]
+        topic = f"토픽 {i // (20 * len(domains))}"
+        term = f"{rng.choice(words)} {i}"
+        data[domain].setdefault(topic, {})[term] = {
+            "subject": term,
+            "keyword": ", ".join(rng.sample(words, 3)),
+            "rhyming": "".join(rng.choice("가나다라마바사아자차카타파하") for _ in range(4)),
+            "content": "\n".join(
+                f"{j + 1}. " + " ".join(rng.choice(words) for _ in range(12)) for j in range(6)
+            ),
+        }
+    return data
+
+
+def benchmark_serialization(card_counts=(1000, 10000, 50000), formats=None, repeat=3):
+    """
+    직렬화 형식별로 덱 쓰기(dump)/읽기(parse) 시간과 크기를 잽니다. 시간은 repeat번 중 최소값입니다.
+
+    Returns:
+    --------
+    list of dict
+        cards, format, bytes, dump_ms, parse_ms
+    """
+    if formats is None:
+        formats = [fmt for fmt in SERIALIZATION_FORMATS if fmt != "msgpack" or msgpack is not None]
+    results = []
+    for card_count in card_counts:
+        data = make_sample_deck(card_count)
+        for fmt in formats:
+            dump_times, parse_times = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                payload = dump_bytes(data, fmt)
+                dump_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                load_bytes(payload)
+                parse_times.append(time.perf_counter() - start)
+            results.append({
+                "cards": card_count,
+                "format": fmt,
+                "bytes": len(payload),
+                "dump_ms": min(dump_times) * 1000,
+                "parse_ms": min(parse_times) * 1000,
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="플래시카드 저장소 관리 도구")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="사용자 덱을 다른 저장소 백엔드로 옮깁니다")
+    migrate_parser.add_argument("usernames", nargs="*", help="대상 사용자 (생략하면 전체 사용자)")
+    migrate_parser.add_argument("--users-folder", default=os.path.join("flashcard_data", "users"))
+    migrate_parser.add_argument("--source", default="json", choices=sorted(STORAGE_BACKENDS))
+    migrate_parser.add_argument("--target", default="sqlite", choices=sorted(STORAGE_BACKENDS))
+    migrate_parser.add_argument("--format", dest="serialization", choices=SERIALIZATION_FORMATS,
+                                help="target 백엔드가 파일을 쓸 직렬화 형식 (json/sharded 백엔드)")
+
+    stamp_parser = subparsers.add_parser("stamp", help="생성/수정 시각이 없는 예전 카드에 시각을 채웁니다")
+    stamp_parser.add_argument("usernames", nargs="*", help="대상 사용자 (생략하면 전체 사용자)")
+    stamp_parser.add_argument("--users-folder", default=os.path.join("flashcard_data", "users"))
+    stamp_parser.add_argument("--backend", default=os.environ.get("FLASHCARD_STORAGE_BACKEND", "json"),
+                              choices=sorted(STORAGE_BACKENDS))
+
+    bench_parser = subparsers.add_parser("bench", help="직렬화 형식별 읽기/쓰기 시간과 파일 크기를 비교합니다")
+    bench_parser.add_argument("--cards", type=int, nargs="+", default=[1000, 10000, 50000])
+    bench_parser.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        usernames = args.usernames or list_usernames(args.users_folder)
+        for username in usernames:
+            try:
+                count = migrate_user(args.users_folder, username, args.target, args.source, args.serialization)
+                print(f"{username}: 카드 {count}개를 {args.source} -> {args.target}로 옮겼습니다.")
+            except (FileNotFoundError, ValueError) as e:
+                print(f"{username}: 건너뜀 ({e})")
+
+    elif args.command == "stamp":
+        usernames = args.usernames or list_usernames(args.users_folder)
+        for username in usernames:
+            try:
+                count = backfill_timestamps(args.users_folder, username, args.backend)
+                print(f"{username}: 카드 {count}개에 생성/수정 시각을 채웠습니다.")
+            except (FileNotFoundError, ValueError) as e:
+                print(f"{username}: 건너뜀 ({e})")
+
+    elif args.command == "bench":
+        if msgpack is None:
+            print("msgpack 패키지가 없어 msgpack 형식은 제외합니다. (pip install msgpack)")
+        print(f"{'카드 수':>8} {'형식':>8} {'크기(KB)':>10} {'쓰기(ms)':>10} {'읽기(ms)':>10}")
+        for row in benchmark_serialization(args.cards, repeat=args.repeat):
+            print(f"{row['cards']:>10} {row['format']:>10} {row['bytes'] / 1024:>12.1f} "
+                  f"{row['dump_ms']:>12.1f} {row['parse_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()